@@ -0,0 +1,148 @@
+import logging
+import threading
+from concurrent.futures import Future
+from PySide6.QtCore import QObject, QMimeData, QThread, Signal
+from PySide6.QtGui import QClipboard
+
+logger = logging.getLogger(__name__)
+
+class _GuiInvoker(QObject):
+    """Runs callables on the thread it lives in (the GUI thread)."""
+    call = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        # Emitted from other threads, so the connection is queued to this object's thread
+        self.call.connect(self._run)
+
+    def _run(self, fn):
+        fn()
+
+class _FetchedMimeData(QMimeData):
+    """
+    Clipboard text that sets `fetched` whenever its contents are read. On X11
+    Qt only reads it to serve another application's selection request.
+    """
+    def __init__(self, text):
+        super().__init__()
+        self.fetched = threading.Event()
+        self.setText(text)
+
+    def retrieveData(self, mime_type, preferred_type):
+        self.fetched.set()
+        return super().retrieveData(mime_type, preferred_type)
+
+# Qt platforms without a real clipboard; copies then go through pyperclip
+HEADLESS_PLATFORMS = ("offscreen", "minimal")
+
+class QtClipboard:
+    """
+    The application's QClipboard, usable from any thread. QClipboard may only
+    be touched on the GUI thread, so calls from the output thread are
+    marshalled there and their result awaited (bounded by `timeout`).
+
+    The app owns the selection itself, so a copy is a call into the running
+    process instead of an xclip/xsel/wl-copy subprocess. With use_primary the
+    PRIMARY selection (middle-click paste) is set as well, where supported.
+    """
+    def __init__(self, app, timeout: float = 2.0, use_primary: bool = False):
+        self._app = app
+        self._invoker = _GuiInvoker()
+        self.timeout = timeout
+        self.use_primary = use_primary
+
+    def _on_gui(self, fn):
+        if QThread.currentThread() == self._app.thread():
+            return fn()
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+
+        self._invoker.call.emit(run)
+        return future.result(self.timeout)
+
+    def text(self) -> str:
+        return self._on_gui(lambda: self._app.clipboard().text())
+
+    def set_text(self, text: str):
+        def write():
+            clipboard = self._app.clipboard()
+            clipboard.setText(text, QClipboard.Clipboard)
+            if self.use_primary and clipboard.supportsSelection():
+                clipboard.setText(text, QClipboard.Selection)
+        self._on_gui(write)
+
+    def offer(self, text: str) -> threading.Event:
+        """
+        Like set_text(), but returns an Event that is set when another
+        application fetches the text (clear it to wait for the next fetch).
+        Only meaningful where can_track_fetches().
+        """
+        def write():
+            clipboard = self._app.clipboard()
+            mime = _FetchedMimeData(text)
+            clipboard.setMimeData(mime, QClipboard.Clipboard)
+            if self.use_primary and clipboard.supportsSelection():
+                clipboard.setText(text, QClipboard.Selection)
+            return mime.fetched
+        return self._on_gui(write)
+
+    def snapshot(self) -> dict:
+        """The clipboard's contents in every MIME type it offers (format -> bytes)."""
+        def read():
+            mime = self._app.clipboard().mimeData()
+            if mime is None:
+                return {}
+            return {fmt: bytes(mime.data(fmt)) for fmt in mime.formats()}
+        return self._on_gui(read)
+
+    def restore(self, snapshot: dict):
+        """Puts a snapshot() back, with all its formats."""
+        def write():
+            clipboard = self._app.clipboard()
+            if not snapshot:
+                clipboard.clear()
+                return
+            mime = QMimeData()
+            for fmt, data in snapshot.items():
+                mime.setData(fmt, data)
+            clipboard.setMimeData(mime)
+        self._on_gui(write)
+
+_clipboard = None
+
+def install(app, use_primary: bool = False):
+    """
+    Sets up the shared clipboard bridge; call once on the GUI thread. Returns
+    None when running headless, in which case copies fall back to pyperclip.
+    """
+    global _clipboard
+    platform = app.platformName()
+    if platform in HEADLESS_PLATFORMS:
+        logger.info(f"Qt platform '{platform}' has no clipboard, using pyperclip")
+        return None
+    _clipboard = QtClipboard(app, use_primary=use_primary)
+    return _clipboard
+
+def get_clipboard():
+    """The shared QtClipboard, or None when headless or outside the tray app."""
+    return _clipboard
+
+def can_own():
+    """
+    True when copies can go through Qt. Wayland only lets the focused window set
+    the clipboard, and our tray app rarely is, so wl-copy (via pyperclip) is used there.
+    """
+    return _clipboard is not None and _clipboard._app.platformName() != "wayland"
+
+def can_track_fetches():
+    """
+    True when QtClipboard.offer() can tell that the text was pasted: on X11 the
+    target fetches it from us through a selection request. Elsewhere Qt hands
+    the text over when it is set, so there is nothing to wait for.
+    """
+    return can_own() and _clipboard._app.platformName() == "xcb"
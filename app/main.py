@@ -58,9 +58,31 @@ def main():
     parser.add_argument("--mode", type=str, help="Switch running instance to specific mode ID")
     parser.add_argument("--record-test", action="store_true", help="Test audio recording only")
     parser.add_argument("--gui", action="store_true", help="Start the GUI/Tray")
+    parser.add_argument("--stats", nargs="?", const=50, type=int, metavar="N",
+                        help="Print p50/p95/p99 stage timings over the last N dictations (default 50)")
     
     args = parser.parse_args()
     
+    if args.stats is not None:
+        from core.tracing import TraceLog, format_stats, format_provider_stats
+        trace_log = TraceLog()
+        sessions = trace_log.read_recent(args.stats)
+        print(format_stats(trace_log.stage_stats(args.stats), len(sessions)))
+        races = format_provider_stats(trace_log.provider_stats(args.stats))
+        if races:
+            print(f"\n{races}")
+
+        from core.llm_cache import LLMResponseCache
+        cache = LLMResponseCache()
+        if os.path.exists(cache.path):
+            cache_stats = cache.stats()
+            lookups = cache_stats.get("hits", 0) + cache_stats.get("misses", 0)
+            if lookups:
+                rate = 100.0 * cache_stats["hits"] / lookups
+                print(f"\nLLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                      f"({rate:.0f}% hit rate), {cache_stats['entries']} entries")
+        return
+
     config_manager = ConfigManager()
     config = config_manager.get()
 
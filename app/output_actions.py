@@ -6,9 +6,25 @@ import time
 import shutil
 import sys
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from core.tracing import span
+from app.clipboard import can_own, can_track_fetches, get_clipboard
+from core.x11 import get_focus_watcher, get_xtest_typer, wait_for_focus
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds of the paste waits; they are cut short once X11 reports the condition
+CLIPBOARD_SETTLE = 0.3
+KEY_SETTLE = 0.1
+# Clipboard swap: how long the target app gets to fetch the pasted text; if it hasn't by
+# then, the text stays on the clipboard rather than risk pasting the previous contents
+SWAP_FETCH_TIMEOUT = 2.0
+# After the first fetch, the target may still ask for the text in other formats
+SWAP_FETCH_GRACE = 0.05
+
+def _applescript_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
 class OutputAction(ABC):
     @abstractmethod
     def execute(self, text: str, **kwargs):
@@ -16,26 +32,128 @@ class OutputAction(ABC):
 
 class ClipboardAction(OutputAction):
     def execute(self, text: str, **kwargs):
+        self.copy(text)
+
+    def copy(self, text: str):
+        """
+        Copies text, in-process through Qt when possible, else through pyperclip.
+        Returns the backend used ("qt" or "pyperclip"), or None on failure.
+        """
+        if can_own():
+            try:
+                get_clipboard().set_text(text)
+                logger.info("Copied to clipboard.")
+                return "qt"
+            except Exception as e:
+                logger.warning(f"Qt clipboard copy failed, trying pyperclip: {e}")
         try:
             pyperclip.copy(text)
             logger.info("Copied to clipboard.")
+            return "pyperclip"
         except Exception as e:
             logger.error(f"Clipboard copy failed: {e}")
+            return None
 
 class PasteAction(OutputAction):
     def execute(self, text: str, **kwargs):
         method = kwargs.get("paste_method", "auto")
+        trace = kwargs.get("trace")
+        target_window = kwargs.get("target_window")
+        watcher = get_focus_watcher()
+
+        # Clipboard swap: remember what the user had copied, to put it back after the paste.
+        # That is only safe when we can see the target fetch the text (X11).
+        if method == "swap" and not can_track_fetches():
+            logger.warning("Clipboard swap needs X11; pasting with Ctrl+V without restoring the clipboard")
+            method = "ctrl_v"
+        clipboard = get_clipboard() if method == "swap" else None
+        saved = None
+        fetched = None
+        if clipboard:
+            with span(trace, "output.clipboard_save"):
+                try:
+                    saved = clipboard.snapshot()
+                except Exception as e:
+                    logger.warning(f"Could not save the clipboard, it won't be restored: {e}")
+        previous_owner = watcher.clipboard_owner()
         
         # Always copy to clipboard first
-        ClipboardAction().execute(text)
+        with span(trace, "output.clipboard"):
+            if saved is not None:
+                try:
+                    fetched = clipboard.offer(text)
+                    backend = "qt"
+                except Exception as e:
+                    logger.warning(f"Qt clipboard copy failed, the clipboard won't be restored: {e}")
+            if fetched is None:
+                backend = ClipboardAction().copy(text)
         
-        # Give clipboard time to settle/sync (critical for Wayland)
-        time.sleep(0.3)
+        # Give clipboard time to settle/sync (critical for Wayland); on X11, until it has a new owner.
+        # Qt has taken ownership by the time setText returns, so no wait is needed then.
+        if backend != "qt":
+            with span(trace, "output.clipboard_settle"):
+                if watcher.wait_for_clipboard_owner(previous_owner, CLIPBOARD_SETTLE) is None:
+                    time.sleep(CLIPBOARD_SETTLE)
         
         if method == "copy_only":
-            self._notify("Text copied to clipboard.")
+            with span(trace, "output.notify"):
+                self._notify("Text copied to clipboard.")
+            return
+
+        if method == "swap":
+            # Clipboard managers may have fetched the text already; only the paste counts
+            if fetched is not None:
+                fetched.clear()
+            with span(trace, "output.inject", method=method):
+                pasted = self._send_paste_key(trace, target_window)
+            if not pasted:
+                self._notify("Paste failed. Text in clipboard.")
+            elif fetched is not None:
+                with span(trace, "output.clipboard_restore"):
+                    self._restore_clipboard(clipboard, saved, text, fetched)
+            return
+
+        with span(trace, "output.inject", method=method):
+            self._inject(text, method, trace, target_window)
+
+    def _restore_clipboard(self, clipboard, saved, text, fetched):
+        """
+        Puts the user's clipboard back once the target app has fetched the pasted
+        text, unless they copied something else in the meantime.
+        """
+        if not fetched.wait(SWAP_FETCH_TIMEOUT):
+            logger.warning(f"The pasted text wasn't fetched within {SWAP_FETCH_TIMEOUT}s; "
+                           "leaving it on the clipboard")
             return
+        time.sleep(SWAP_FETCH_GRACE)
+        try:
+            if clipboard.text() != text:
+                return
+            clipboard.restore(saved)
+            logger.info("Previous clipboard restored.")
+        except Exception as e:
+            logger.warning(f"Clipboard restore failed: {e}")
+
+    def _send_paste_key(self, trace=None, target_window=None) -> bool:
+        """Sends a single paste keystroke (Ctrl+V / Cmd+V) to the focused window; returns success."""
+        if os.environ.get("XDG_SESSION_TYPE") == "wayland":
+            return self._try_wtype()
+        elif sys.platform == "darwin":
+            return self._osascript('tell application "System Events" to keystroke "v" using command down')
+        try:
+            with span(trace, "output.key_settle"):
+                wait_for_focus(target_window, KEY_SETTLE)
+            typer = self._xtest()
+            if typer:
+                typer.key_combo("Control_L", "v")
+            else:
+                subprocess.run(["xdotool", "key", "ctrl+v"], check=True)
+            return True
+        except Exception as e:
+            logger.error(f"X11 paste failed: {e}")
+            return False
 
+    def _inject(self, text, method, trace=None, target_window=None):
         session_type = os.environ.get("XDG_SESSION_TYPE")
         
         if session_type == "wayland":
@@ -64,31 +182,65 @@ class PasteAction(OutputAction):
         elif sys.platform == "darwin":
             # macOS
             if method == "type":
-                self._osascript(f'tell application "System Events" to keystroke "{text}"')
+                self._osascript(f'tell application "System Events" to keystroke "{_applescript_escape(text)}"')
             else:
                 # Command+V
-                self._osascript('tell application "System Events" to keystroke "v" using command down')
+                self._send_paste_key(trace, target_window)
                 
         else:
             # X11 or other
+            # X11 doesn't distinguish much, usually ctrl+v is best; "type" injects the text itself.
+            # Keys go through XTEST in-process when possible, otherwise through xdotool.
+            if method == "type":
+                try:
+                    typer = self._xtest()
+                    if typer:
+                        typer.type_text(text)
+                    else:
+                        subprocess.run(["xdotool", "type", "--delay", "1", text], check=True)
+                except Exception as e:
+                    logger.error(f"X11 paste failed: {e}")
+                    self._notify("Paste failed. Text in clipboard.")
+            elif not self._send_paste_key(trace, target_window):
+                self._notify("Paste failed. Text in clipboard.")
+
+    def _xtest(self):
+        typer = get_xtest_typer()
+        return typer if typer and typer.ready() else None
+
+    def type_text(self, text: str) -> bool:
+        """
+        Types text into the focused window without touching the clipboard.
+        Used for incremental output (e.g. streamed LLM tokens); returns success.
+        """
+        if not text:
+            return True
+
+        session_type = os.environ.get("XDG_SESSION_TYPE")
+        if session_type == "wayland":
+            return self._try_ydotool(text)
+        elif sys.platform == "darwin":
+            return self._osascript(f'tell application "System Events" to keystroke "{_applescript_escape(text)}"')
+        else:
             try:
-                # X11 doesn't distinguish much, usually xdotool key ctrl+v is best
-                # forcing type could be done via xdotool type
-                if method == "type":
-                    subprocess.run(["xdotool", "type", "--delay", "1", text], check=True)
+                typer = self._xtest()
+                if typer:
+                    typer.type_text(text)
                 else:
-                    time.sleep(0.1)
-                    subprocess.run(["xdotool", "key", "ctrl+v"], check=True)
+                    subprocess.run(["xdotool", "type", "--delay", "1", text], check=True)
+                return True
             except Exception as e:
-                logger.error(f"X11 paste failed: {e}")
-                self._notify("Paste failed. Text in clipboard.")
+                logger.error(f"X11 type failed: {e}")
+                return False
 
     def _osascript(self, script):
         try:
             subprocess.run(["osascript", "-e", script], check=True)
+            return True
         except Exception as e:
             logger.error(f"osascript failed: {e}")
             self._notify("Paste failed. Check Accessibility permissions.")
+            return False
 
     def _try_wtype(self):
         try:
@@ -159,3 +311,28 @@ class ActionFactory:
 def execute(action_type: str, text: str, **kwargs):
     action = ActionFactory.get_action(action_type)
     action.execute(text, **kwargs)
+
+class OutputExecutor:
+    """
+    Runs output actions on a single dedicated thread, one after another in
+    submission order. Pastes sleep and spawn xdotool/wtype/notify-send, so
+    they must never run on the GUI thread.
+    """
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vocalis-output")
+
+    def submit(self, func, *args, on_done=None, **kwargs):
+        """
+        Queues func(*args, **kwargs). on_done(error) is called on the output thread
+        when it has run, with the exception it raised or None.
+        """
+        future = self._executor.submit(func, *args, **kwargs)
+        if on_done:
+            future.add_done_callback(lambda f: on_done(None if f.cancelled() else f.exception()))
+        return future
+
+    def execute(self, action_type: str, text: str, on_done=None, **kwargs):
+        return self.submit(execute, action_type, text, on_done=on_done, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,28 +1,38 @@
 import sys
 import os
 import math
+import time
+import asyncio
+import functools
+import threading
 import logging
+from collections import deque
+from dataclasses import asdict
 from PySide6.QtWidgets import (QApplication, QSystemTrayIcon, QMenu, QDialog, 
                                QVBoxLayout, QLabel, QComboBox, QDialogButtonBox, 
                                QFormLayout, QLineEdit, QCheckBox, QWidget, QProgressBar,
                                QTabWidget, QTextEdit, QListWidget, QPushButton, QHBoxLayout,
-                               QMessageBox, QDoubleSpinBox)
+                               QMessageBox, QDoubleSpinBox, QSpinBox)
 from PySide6.QtGui import (QIcon, QAction, QPainter, QColor, QPen, QPainterPath, 
                          QKeySequence, QFont, QPixmap, QPalette)
-from PySide6.QtCore import Slot, QThread, Signal, Qt, QTimer, QPoint, QObject
+from PySide6.QtCore import Slot, Signal, Qt, QTimer, QPoint, QObject
 from core.config import ConfigManager, AppConfig
 from core.audio import AudioRecorder
 from core.history import HistoryManager
-from core.transcription import TranscriberFactory
+from core.transcription import TranscriberFactory, RemoteTranscriber
+from core.ratelimit import RateLimited
 from core.prompt_engine import PromptEngine
 from core.processing import TextProcessor
 from core.dictionary import DictionaryManager
 from core.snippets import SnippetManager
-from core.profiles import ProfileManager
+from core.profiles import ProfileIndex, ProfileManager, parse_rule
 from app.hotkeys import get_manager
-from app import output_actions
+from app import output_actions, clipboard
 from core.ipc import IPCServer
 from core.sounds import SoundManager
+from core.tracing import DictationTrace, TraceLog, span
+from core.pipeline import AsyncRunner, LatencyBudget, run_in_thread
+from core.x11 import get_focus_watcher, wait_for_focus
 import sounddevice as sd
 import numpy as np
 
@@ -222,109 +232,343 @@ from core.processing import TextProcessor
 
 logger = logging.getLogger(__name__)
 
-class WorkerThread(QThread):
-    finished = Signal(str, dict)
-    error = Signal(str)
+# Longest a finished job holds the queue while the GUI applies its output
+OUTPUT_ACK_TIMEOUT = 120.0
+
+class DictationJob:
+    """One dictation: the mode it was started in, its recording and its result."""
+    def __init__(self, config, mode_name, mode_data):
+        self.config = config
+        self.mode_name = mode_name
+        self.mode_data = mode_data
+        self.trace = DictationTrace(mode=mode_name)
+        self.text = ""
+        self.recorder = None
+        self.cancelled = False
+        self.future = None
+        self.applied = asyncio.Event() # Set once the GUI has applied the output
+        self.cancel_event = threading.Event() # Checked by blocking steps (local decode)
+        self.should_stop_recording = False
+        self.target_window = None # X11 window the text goes to (focused when recording started)
+
+    def cancel(self):
+        self.cancelled = True
+        self.trace.status = "cancelled"
+        self.cancel_event.set()
+        if self.recorder:
+            self.recorder.stop()
+        if self.future:
+            self.future.cancel()
+
+class DictationService(QObject):
+    """
+    Long-lived dictation pipeline on the asyncio loop. Each hotkey press records
+    a job; once its recording stops, the job joins the processing queue and the
+    next recording can start right away. Jobs are transcribed, processed and
+    output one at a time in recording order. Blocking steps are offloaded to
+    the runner's executor; cancel_all() cancels the tasks, which aborts
+    in-flight HTTP requests and stops local decoding at the next segment.
+    """
+    finished = Signal(object) # DictationJob, text in job.text
+    error = Signal(str, object) # message, DictationJob
+    dropped = Signal(object) # DictationJob discarded because the queue was full
     status_update = Signal(str)
-    audio_amplitude = Signal(float) # Keep this for visualizer if needed elsewhere, though recording is moved
+    audio_amplitude = Signal(float)
 
-    def __init__(self, config_manager, prompt_engine, text_processor):
+    QUEUE_POLICIES = ("drop_oldest", "drop_newest", "reject")
+
+    def __init__(self, runner, config_manager, prompt_engine, text_processor):
         super().__init__()
+        self.runner = runner
         self.config_manager = config_manager
         self.prompt_engine = prompt_engine
         self.text_processor = text_processor
-        self.recorder = None
-        self._should_stop_recording = False # Flag for thread movement
-
-    def run(self):
-        try:
-            config = self.config_manager.get()
-            
-            # Determine current mode settings
-            mode_name = config.current_mode
-            mode_data = config.modes.get(mode_name, config.modes["quick"])
-            
-            # 1. Record
-            self.status_update.emit(f"Listening ({mode_name})...")
-            
-            # Helper to emit amplitude
-            def stream_callback(data):
-                rms = np.sqrt(np.mean(data**2))
-                # logger.debug(f"RMS: {rms}") 
-                self.audio_amplitude.emit(float(rms))
-            
-            # Initialize Recorder HERE (Background Thread)
-            logger.info("Initializing AudioRecorder...")
-            from core.audio import AudioRecorder
-            self.recorder = AudioRecorder(device_index=config.input_device)
-            
-            # Check if stop was pressed during init
-            if self._should_stop_recording:
-                logger.info("Stop flag set during init, aborting.")
-                self.recorder.stop() # Ensure it knows it's stopped
-                self.finished.emit("", mode_data)
-                return
-
-            logger.info("Starting record_once...")
-            # We need to act on self._should_stop_recording if it flips AFTER we start recording but BEFORE we enter the loop?
-            # record_once blocks. We rely on stop_recording() calling self.recorder.stop() from the MAIN thread.
-            # But there is a race: if stop_recording is called while we are in AudioRecorder.__init__ or just before record_once.
-            
-            # Since record_once is blocking, the other thread calls recorder.stop(). 
-            # We just need to ensure self.recorder is reachable. It is assigned above.
-            
-            path = self.recorder.record_once(max_duration=3600, stream_callback=stream_callback)
-            logger.info(f"record_once returned: {path}")
-            
-            if not path or not os.path.exists(path):
-                logger.error("Recording failed: no file created.")
-                self.error.emit("Recording failed. Check microphone.")
-                self.finished.emit("", mode_data)
-                return
-
-            file_size = os.path.getsize(path)
-            logger.info(f"Recorded file size: {file_size} bytes")
-            if file_size < 1000: # Less than 1KB is basically empty/header only
-                logger.warning("Recorded audio is too short or empty. Check microphone permissions.")
-                # We can try to transcribe, but it will likely be empty.
-                # Use a specific error signal?
-                self.error.emit("No audio recorded. Please check Mic permissions.")
-                self.finished.emit("", mode_data)
-                if os.path.exists(path): os.unlink(path)
-                return
-
-            # 2. Transcribe
-            self.status_update.emit("Transcribing...")
-            from core.transcription import TranscriberFactory
-            transcriber = TranscriberFactory.get_transcriber(config)
-            text = transcriber.transcribe(path, language=(None if config.language == 'auto' else config.language))
-            
-            # 3. Process (AI + Dictionary + Snippets)
-            self.status_update.emit("Processing text...")
-            # Ensure mode_data is dict
-            if hasattr(mode_data, "name"): mode_data = asdict(mode_data)
-                
-            final_text = self.text_processor.process(text, mode_data)
-                
-            if os.path.exists(path):
-                os.unlink(path)
+        self.recording = None # Job currently recording
+        self.active = None # Job being processed
+        self._waiting = deque() # Recorded jobs queued behind the active one
+        self._waiting_lock = threading.Lock() # _waiting is changed on the loop and read on the GUI thread
+        self._turn = asyncio.Lock() # FIFO: jobs are processed in the order they stopped recording
+
+    def is_recording(self):
+        return self.recording is not None
+
+    def is_busy(self):
+        with self._waiting_lock:
+            waiting = bool(self._waiting)
+        return self.recording is not None or self.active is not None or waiting
+
+    def can_record(self):
+        """False when the queue is full and the policy is to refuse new recordings."""
+        config = self.config_manager.get()
+        if getattr(config, "job_queue_policy", "drop_oldest") != "reject":
+            return True
+        with self._waiting_lock:
+            return len(self._waiting) < self._depth(config)
 
-            # 4. Finish
-            self.finished.emit(final_text, mode_data)
-            
-        except Exception as e:
-            logger.error(f"Worker failed: {e}")
-            self.error.emit(str(e))
+    def start_recording(self, target_window=None):
+        config = self.config_manager.get()
+        mode_name = config.current_mode
+        mode_data = config.modes.get(mode_name, config.modes["quick"])
+        # Ensure mode_data is dict
+        if hasattr(mode_data, "name"): mode_data = asdict(mode_data)
+        job = DictationJob(config, mode_name, mode_data)
+        job.target_window = target_window
+        self.recording = job
+        job.future = self.runner.submit(self._run(job))
+        return job
 
     def stop_recording(self):
-        logger.info("WorkerThread stop_recording called")
-        self._should_stop_recording = True
-        if self.recorder:
+        job = self.recording
+        logger.info("DictationService stop_recording called")
+        if not job:
+            return
+        job.should_stop_recording = True
+        if job.recorder:
             logger.info("Calling recorder.stop()")
-            self.recorder.stop()
+            job.recorder.stop()
         else:
             logger.warning("Recorder not yet ready, set flag.")
 
+    def cancel_all(self):
+        """Aborts the recording and every queued job; returns immediately, cleanup happens on the loop."""
+        with self._waiting_lock:
+            waiting = list(self._waiting)
+        jobs = [self.recording, self.active, *waiting]
+        for job in jobs:
+            if job:
+                job.cancel()
+
+    def complete(self, job):
+        """Called by the GUI once job's output is applied, letting the next job output."""
+        self.runner.loop.call_soon_threadsafe(job.applied.set)
+
+    def _depth(self, config):
+        return max(1, getattr(config, "job_queue_depth", 3))
+
+    def _status(self, job, message):
+        # A recording in progress owns the status display
+        if self.recording is None or self.recording is job:
+            self.status_update.emit(message)
+
+    async def _run(self, job):
+        path = None
+        try:
+            path = await self._record(job)
+            if self.recording is job:
+                self.recording = None
+            if not path or not self._admit(job):
+                return
+            try:
+                async with self._turn:
+                    self._unqueue(job)
+                    self.active = job
+                    try:
+                        await self._process(job, path)
+                    finally:
+                        self.active = None
+            finally:
+                self._unqueue(job)
+
+        except asyncio.CancelledError:
+            logger.info("Dictation cancelled.")
+            if job.trace.status == "ok":
+                job.trace.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Dictation failed: {e}")
+            job.trace.fail(str(e))
+            self.error.emit(str(e), job)
+        finally:
+            if self.recording is job:
+                self.recording = None
+            _discard_file(path)
+
+    async def _record(self, job):
+        """Records until stop_recording(); returns the audio file, or None when there is nothing to process."""
+        config = job.config
+        self._status(job, f"Listening ({job.mode_name})...")
+
+        # Helper to emit amplitude
+        def stream_callback(data):
+            rms = np.sqrt(np.mean(data**2))
+            self.audio_amplitude.emit(float(rms))
+
+        logger.info("Initializing AudioRecorder...")
+        job.recorder = AudioRecorder(device_index=config.input_device)
+
+        # Check if stop was pressed during init
+        if job.should_stop_recording:
+            logger.info("Stop flag set during init, aborting.")
+            job.recorder.stop() # Ensure it knows it's stopped
+            self.finished.emit(job)
+            return None
+
+        # record_once blocks until stop_recording()/cancel() calls recorder.stop()
+        # from the GUI thread; if we're cancelled meanwhile, its file is discarded.
+        logger.info("Starting record_once...")
+        path = await run_in_thread(
+            functools.partial(job.recorder.record_once, max_duration=3600,
+                              stream_callback=stream_callback, trace=job.trace),
+            cleanup=_discard_file
+        )
+        logger.info(f"record_once returned: {path}")
+
+        if not path or not os.path.exists(path):
+            logger.error("Recording failed: no file created.")
+            job.trace.fail("recording: no file created")
+            self.error.emit("Recording failed. Check microphone.", job)
+            return None
+
+        file_size = os.path.getsize(path)
+        logger.info(f"Recorded file size: {file_size} bytes")
+        if file_size < 1000: # Less than 1KB is basically empty/header only
+            logger.warning("Recorded audio is too short or empty. Check microphone permissions.")
+            job.trace.fail(f"recording: only {file_size} bytes of audio")
+            self.error.emit("No audio recorded. Please check Mic permissions.", job)
+            _discard_file(path)
+            return None
+        return path
+
+    def _admit(self, job):
+        """Queues a recorded job, applying the drop policy when the queue is full."""
+        config = job.config
+        policy = getattr(config, "job_queue_policy", "drop_oldest")
+        with self._waiting_lock:
+            dropped = None
+            if len(self._waiting) >= self._depth(config):
+                dropped = self._waiting.popleft() if policy == "drop_oldest" else job
+            if dropped is not job:
+                self._waiting.append(job)
+            ahead = len(self._waiting) - 1 + (self.active is not None)
+        if dropped is job:
+            logger.warning("Dictation queue full, dropping the new dictation")
+            self._drop(job)
+            return False
+        if dropped:
+            logger.warning("Dictation queue full, dropping the oldest queued dictation")
+            self._drop(dropped)
+        if ahead:
+            self._status(job, f"Queued ({ahead} ahead)...")
+        return True
+
+    def _unqueue(self, job):
+        with self._waiting_lock:
+            if job in self._waiting:
+                self._waiting.remove(job)
+
+    def _drop(self, job):
+        job.cancel()
+        job.trace.status = "dropped"
+        self.dropped.emit(job)
+
+    async def _process(self, job, path):
+        config = job.config
+        mode_data = job.mode_data
+
+        # The latency budget starts when the job's turn comes, not while it waits in the queue
+        self._status(job, "Transcribing...")
+        budget = LatencyBudget(self._latency_budget(config, mode_data))
+        with span(job.trace, "transcribe.model_load"):
+            transcriber = await run_in_thread(TranscriberFactory.get_transcriber, config)
+        with span(job.trace, "transcribe.decode"):
+            text = await self._transcribe(job, transcriber, path, budget)
+
+        # Process (AI + Dictionary + Snippets)
+        self._status(job, "Processing text...")
+        if self._should_stream(config, mode_data):
+            job.text = await self._process_streaming(job, text, budget)
+            job.mode_data = dict(mode_data, streamed=True)
+        else:
+            job.text = await self.text_processor.process(text, mode_data, trace=job.trace,
+                                                         timeout=budget.remaining("prompt"))
+
+        # Hold the turn until the output is applied, so outputs land in recording order
+        self.finished.emit(job)
+        try:
+            await asyncio.wait_for(job.applied.wait(), OUTPUT_ACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Output of the previous dictation was not confirmed, continuing with the queue")
+
+    def _latency_budget(self, config, mode_data):
+        budget = mode_data.get("latency_budget")
+        return getattr(config, "latency_budget", 0) if budget is None else budget
+
+    async def _transcribe(self, job, transcriber, path, budget):
+        """
+        Transcribes within the stage's budget. Cloud transcription that runs over,
+        or that the provider keeps throttling, is aborted and redone with the
+        smallest local model. Local decoding is never interrupted: there's
+        nothing faster to fall back to.
+        """
+        config = job.config
+        language = None if config.language == 'auto' else config.language
+        if not isinstance(transcriber, RemoteTranscriber):
+            if config.transcription_provider != "local":
+                # The factory skipped a provider whose circuit is open
+                job.trace.degrade("transcribe", "local_model", reason=f"{config.transcription_provider} throttling")
+            return await transcriber.atranscribe(path, language=language, cancel_event=job.cancel_event)
+
+        timeout = budget.remaining("transcribe")
+        try:
+            return await asyncio.wait_for(transcriber.atranscribe(path, language=language), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Cloud transcription exceeded its {timeout:.1f}s budget, using the fast local model")
+            job.trace.degrade("transcribe", "fast_local_model", reason=f"no result within {timeout:.1f}s")
+        except RateLimited as e:
+            logger.warning(f"{e}, using the fast local model")
+            job.trace.degrade("transcribe", "local_model", reason=str(e))
+        fallback = await run_in_thread(TranscriberFactory.get_fallback_transcriber, config)
+        return await fallback.atranscribe(path, language=language, cancel_event=job.cancel_event)
+
+    def _should_stream(self, config, mode_data):
+        # Only typed output can show text incrementally; clipboard/file output needs the whole result
+        return (getattr(config, "llm_streaming", True)
+                and bool(mode_data.get("prompt_id"))
+                and mode_data.get("output_action") == "paste"
+                and mode_data.get("paste_method") == "type")
+
+    async def _process_streaming(self, job, text, budget):
+        """
+        Streams the AI output straight into the focused window. The focus-restore
+        delay runs concurrently with the LLM request instead of after it.
+        """
+        typer = output_actions.PasteAction()
+        ready_at = time.monotonic() + max(job.config.paste_delay, 0.5)
+        failed = []
+        focused = []
+
+        async def on_output(piece):
+            if failed:
+                return
+            if not focused:
+                with span(job.trace, "output.paste_delay"):
+                    focus = await run_in_thread(wait_for_focus, job.target_window, ready_at - time.monotonic())
+                job.trace.set("focus", focus)
+                focused.append(True)
+            if not await run_in_thread(typer.type_text, piece):
+                failed.append(piece)
+
+        self._status(job, "Typing...")
+        final_text = await self.text_processor.process_stream(text, job.mode_data, on_output, trace=job.trace,
+                                                              timeout=budget.remaining("prompt"))
+
+        # Same as a regular paste: the result also ends up in the clipboard
+        await run_in_thread(output_actions.ClipboardAction().execute, final_text)
+        if failed:
+            # The GUI tells the user, like it does for degraded stages
+            job.trace.set("typing_failed", True)
+        return final_text
+
+DEGRADATION_MESSAGES = {
+    "raw_transcript": "AI formatting skipped: it took too long. Raw transcript used.",
+    "fast_local_model": "Cloud transcription was too slow: used the fast local model.",
+    "local_model": "Cloud transcription is rate limited: used the fast local model.",
+}
+
+def _discard_file(path):
+    if path and os.path.exists(path):
+        os.unlink(path)
+
 class HotkeyEdit(QLineEdit):
     def __init__(self, text="", parent=None):
         super().__init__(text, parent)
@@ -368,7 +612,9 @@ class SettingsDialog(QDialog):
         self.setWindowTitle("Vocalis Settings")
         self.resize(500, 400)
         self.config_manager = config_manager
-        self.config = config_manager.get()
+        # Edited copy; on accept only the changes made here are committed (Cancel discards them)
+        self._base = config_manager.get()
+        self.config = self._base.edit()
         self.profile_manager = ProfileManager(config_manager)
         self.setup_ui()
 
@@ -411,9 +657,24 @@ class SettingsDialog(QDialog):
         self.delay_spin.setSingleStep(0.1)
         self.delay_spin.setValue(self.config.paste_delay)
         self.delay_spin.setSuffix(" sec")
-        self.delay_spin.setToolTip("Delay before pasting to ensure headers/focus are correct.")
+        self.delay_spin.setToolTip("Longest wait for the target window to regain focus before pasting.\nOn X11 the paste happens as soon as it has.")
         general_layout.addRow("Paste Delay:", self.delay_spin)
 
+        # Dictation queue
+        self.queue_depth_spin = QSpinBox()
+        self.queue_depth_spin.setRange(1, 20)
+        self.queue_depth_spin.setValue(getattr(self.config, "job_queue_depth", 3))
+        self.queue_depth_spin.setToolTip("Dictations that may wait while an earlier one is still being processed.")
+        general_layout.addRow("Queue Depth:", self.queue_depth_spin)
+
+        self.queue_policy_combo = QComboBox()
+        self.queue_policy_combo.addItem("Drop oldest queued dictation", "drop_oldest")
+        self.queue_policy_combo.addItem("Drop newest dictation", "drop_newest")
+        self.queue_policy_combo.addItem("Don't start a new recording", "reject")
+        index = self.queue_policy_combo.findData(getattr(self.config, "job_queue_policy", "drop_oldest"))
+        self.queue_policy_combo.setCurrentIndex(max(0, index))
+        general_layout.addRow("When Queue Is Full:", self.queue_policy_combo)
+
         # Autostart
         self.autostart_check = QCheckBox("Run on Startup")
         self.autostart_check.setChecked(self._check_autostart())
@@ -430,6 +691,11 @@ class SettingsDialog(QDialog):
         self.allow_clipboard_check.setChecked(getattr(self.config, "allow_clipboard_access", True))
         self.allow_clipboard_check.setToolTip("Enables {clipboard} placeholder in prompts.")
         general_layout.addRow("", self.allow_clipboard_check)
+
+        self.primary_check = QCheckBox("Also Set Middle-Click Selection")
+        self.primary_check.setChecked(getattr(self.config, "clipboard_primary", False))
+        self.primary_check.setToolTip("Copied text can also be pasted with the middle mouse button (X11 PRIMARY selection).")
+        general_layout.addRow("", self.primary_check)
         
         # Wayland Warning (Linux only)
         if sys.platform == "linux" and os.environ.get("XDG_SESSION_TYPE") == "wayland":
@@ -468,6 +734,28 @@ class SettingsDialog(QDialog):
         self.preset_combo.addItems(["fast", "balanced", "high_quality"])
         self.preset_combo.setCurrentText(self.config.model_preset)
         model_layout.addRow(self.preset_label, self.preset_combo)
+
+        # AI post-processing backends (raced in order)
+        self.llm_providers_edit = QLineEdit(", ".join(getattr(self.config, "llm_providers", None) or []))
+        self.llm_providers_edit.setPlaceholderText("e.g. groq, openai (empty = use Provider above)")
+        self.llm_providers_edit.setToolTip("AI prompts go to the first provider; the next one is also asked if it is slow.\n"
+                                           "Keys come from llm_api_keys in config.toml or the provider's environment variable.")
+        model_layout.addRow("AI Providers:", self.llm_providers_edit)
+
+        self.hedge_spin = QSpinBox()
+        self.hedge_spin.setRange(0, 10000)
+        self.hedge_spin.setSingleStep(100)
+        self.hedge_spin.setValue(getattr(self.config, "llm_hedge_ms", 800))
+        self.hedge_spin.setSuffix(" ms")
+        self.hedge_spin.setToolTip("Ask the next AI provider too if no response has started after this long.")
+        model_layout.addRow("Hedge After:", self.hedge_spin)
+
+        # Offline AI prompts
+        self.local_llm_edit = QLineEdit(getattr(self.config, "local_llm_model_path", None) or "")
+        self.local_llm_edit.setPlaceholderText("~/models/qwen2.5-1.5b-instruct-q4_k_m.gguf")
+        self.local_llm_edit.setToolTip("GGUF model run on the CPU (needs llama-cpp-python).\n"
+                                       "Used for AI prompts when no cloud API key is set, or as provider 'llama'.")
+        model_layout.addRow("Local AI Model:", self.local_llm_edit)
         
         self._on_provider_changed(self.config.transcription_provider)
         
@@ -503,14 +791,24 @@ class SettingsDialog(QDialog):
         editor_layout.addRow("Action:", self.m_action_combo)
         
         self.m_paste_method = QComboBox()
-        self.m_paste_method.addItems(["auto", "ctrl_v", "type", "copy_only"])
-        self.m_paste_method.setToolTip("Auto: Tries best method. Ctrl+V: Standard paste. Type: Types characters. Copy Only: No output.")
+        self.m_paste_method.addItems(["auto", "ctrl_v", "swap", "type", "copy_only"])
+        self.m_paste_method.setToolTip("Auto: Tries best method. Ctrl+V: Standard paste. Swap: Paste, then restore your previous clipboard. Type: Types characters. Copy Only: No output.")
         editor_layout.addRow("Paste Method:", self.m_paste_method)
         
         self.m_path_edit = QLineEdit()
         self.m_path_edit.setPlaceholderText("/path/to/file.md (optional)")
         editor_layout.addRow("File Path:", self.m_path_edit)
 
+        self.m_budget_spin = QDoubleSpinBox()
+        self.m_budget_spin.setRange(0.0, 120.0)
+        self.m_budget_spin.setSingleStep(0.5)
+        self.m_budget_spin.setSuffix(" sec")
+        self.m_budget_spin.setSpecialValueText("Default")
+        self.m_budget_spin.setToolTip("Max wait after you stop speaking. Slow steps are skipped or swapped\n"
+                                      "for faster ones (e.g. the raw transcript instead of AI formatting).\n"
+                                      "Default uses latency_budget from config.toml, which is off (0) unless set.")
+        editor_layout.addRow("Latency Budget:", self.m_budget_spin)
+
         btn_layout = QHBoxLayout()
         self.set_active_btn = QPushButton("Set as Active")
         self.set_active_btn.clicked.connect(self._set_active_from_list)
@@ -570,6 +868,11 @@ class SettingsDialog(QDialog):
         self.p_template_edit.setPlaceholderText("{text}")
         self.p_template_edit.setFixedHeight(60)
         editor_layout.addRow("User Template:", self.p_template_edit)
+
+        self.p_cache_check = QCheckBox("Cache AI responses")
+        self.p_cache_check.setChecked(True)
+        self.p_cache_check.setToolTip("Reuse the stored answer when the same text is processed again.")
+        editor_layout.addRow("", self.p_cache_check)
         
         btn_layout = QHBoxLayout()
         self.add_prompt_btn = QPushButton("New")
@@ -622,6 +925,18 @@ class SettingsDialog(QDialog):
         btn_layout.addWidget(self.save_dict_btn)
         btn_layout.addWidget(self.del_dict_btn)
         editor_layout.addRow(btn_layout)
+
+        # Fuzzy Matching
+        self.dict_fuzzy_check = QCheckBox("Fuzzy matching")
+        self.dict_fuzzy_check.setChecked(getattr(self.config, "dictionary_fuzzy", False))
+        self.dict_fuzzy_check.setToolTip("Also replace near-miss spellings of longer phrases (e.g. 'kubernetis').")
+        editor_layout.addRow("", self.dict_fuzzy_check)
+
+        self.dict_edits_spin = QSpinBox()
+        self.dict_edits_spin.setRange(1, 2)
+        self.dict_edits_spin.setValue(getattr(self.config, "dictionary_max_edits", 1))
+        self.dict_edits_spin.setToolTip("Maximum typos tolerated. Phrases under 6 letters are never fuzzy-matched.")
+        editor_layout.addRow("Max Edits:", self.dict_edits_spin)
         
         dict_layout.addWidget(editor_widget, stretch=2)
         
@@ -680,6 +995,9 @@ class SettingsDialog(QDialog):
         
         self.p_rule_edit = QLineEdit()
         self.p_rule_edit.setPlaceholderText("Window Title (e.g., 'Firefox')")
+        self.p_rule_edit.setToolTip("Part of the window title or class, ignoring case.\n"
+                                    "Prefix 'title:' or 'class:' to match only that, and 're:' for a regular expression,\n"
+                                    "e.g. class:re:^(code|codium)$")
         prof_edit_layout.addRow("App/Title:", self.p_rule_edit)
 
         # Help Label
@@ -693,6 +1011,11 @@ class SettingsDialog(QDialog):
             name = mdata.get("name") if isinstance(mdata, dict) else mdata.name
             self.p_mode_combo.addItem(name, mid)
         prof_edit_layout.addRow("Target Mode:", self.p_mode_combo)
+
+        self.p_priority_spin = QSpinBox()
+        self.p_priority_spin.setRange(-100, 100)
+        self.p_priority_spin.setToolTip("When several rules match, the highest priority wins,\nthen the rule matching the longest text.")
+        prof_edit_layout.addRow("Priority:", self.p_priority_spin)
         
         prof_btns = QHBoxLayout()
         add_prof_btn = QPushButton("Save Rule")
@@ -784,6 +1107,7 @@ class SettingsDialog(QDialog):
         self.p_desc_edit.setText(data.get("description") if is_dict else data.description)
         self.p_system_edit.setPlainText(data.get("system_prompt", "") if is_dict else getattr(data, "system_prompt", ""))
         self.p_template_edit.setPlainText(data.get("template", "") if is_dict else data.template)
+        self.p_cache_check.setChecked(data.get("cache", True) if is_dict else getattr(data, "cache", True))
 
     def _new_prompt(self):
         self.prompt_list.clearSelection()
@@ -793,6 +1117,7 @@ class SettingsDialog(QDialog):
         self.p_desc_edit.clear()
         self.p_system_edit.clear()
         self.p_template_edit.setText("{text}")
+        self.p_cache_check.setChecked(True)
 
     def _save_prompt(self):
         pid = self.p_id_edit.text().strip()
@@ -803,7 +1128,8 @@ class SettingsDialog(QDialog):
             "name": self.p_name_edit.text(),
             "description": self.p_desc_edit.text(),
             "system_prompt": self.p_system_edit.toPlainText(),
-            "template": self.p_template_edit.toPlainText()
+            "template": self.p_template_edit.toPlainText(),
+            "cache": self.p_cache_check.isChecked()
         }
         
         self.config.prompts[pid] = new_data
@@ -880,6 +1206,7 @@ class SettingsDialog(QDialog):
         self.m_paste_method.setCurrentIndex(index if index >= 0 else 0)
         
         self.m_path_edit.setText(data.get("file_path") or "")
+        self.m_budget_spin.setValue(data.get("latency_budget") or 0.0)
 
     def _new_mode(self):
         self.mode_list.clearSelection()
@@ -890,6 +1217,7 @@ class SettingsDialog(QDialog):
         self.m_prompt_combo.setCurrentIndex(0)
         self.m_action_combo.setCurrentIndex(0)
         self.m_paste_method.setCurrentIndex(0) # Auto
+        self.m_budget_spin.setValue(0.0) # Default
 
     def _save_mode(self):
         mid = self.m_id_edit.text().strip()
@@ -900,7 +1228,8 @@ class SettingsDialog(QDialog):
             "prompt_id": self.m_prompt_combo.currentData(),
             "output_action": self.m_action_combo.currentText(),
             "paste_method": self.m_paste_method.currentText(),
-            "file_path": self.m_path_edit.text() or None
+            "file_path": self.m_path_edit.text() or None,
+            "latency_budget": self.m_budget_spin.value() or None
         }
         
         self.config.modes[mid] = new_data
@@ -928,16 +1257,7 @@ class SettingsDialog(QDialog):
             self._refresh_mode_list()
 
     def accept(self):
-        # ... (Previous accept logic, make sure to add dict/snp saving if needed? No, logic is in-place)
-        # But wait, config.modes is managed in-place? 
-        # Yes, existing logic for modes/prompts modifies self.config.modes/prompts directly.
-        # Dictionary/Snippets should do the same.
-        
-        # We need to capture changes if we only modified self.config.dictionary/snippets
-        # But wait, self.config is the object from ConfigManager?
-        # Yes. AppConfig object.
-        # So modifications are already in memory.
-        
+        # Prompts/Modes/Dict/Snip/Profiles were edited in self.config (a copy) by their tabs
         self.config.input_device = self.device_combo.currentData()
         self.config.hotkey = self.hotkey_edit.text()
         
@@ -945,16 +1265,25 @@ class SettingsDialog(QDialog):
         self.config.api_key = self.api_key_edit.text()
         self.config.remote_model_name = self.remote_model_edit.text()
         self.config.model_preset = self.preset_combo.currentText()
+        self.config.llm_providers = [p.strip().lower() for p in self.llm_providers_edit.text().split(",") if p.strip()]
+        self.config.llm_hedge_ms = self.hedge_spin.value()
+        self.config.local_llm_model_path = self.local_llm_edit.text().strip() or None
         self.config.show_visualizer = self.visualizer_check.isChecked()
         self.config.allow_clipboard_access = self.allow_clipboard_check.isChecked()
+        self.config.clipboard_primary = self.primary_check.isChecked()
         self.config.paste_delay = self.delay_spin.value()
+        self.config.job_queue_depth = self.queue_depth_spin.value()
+        self.config.job_queue_policy = self.queue_policy_combo.currentData()
+        self.config.dictionary_fuzzy = self.dict_fuzzy_check.isChecked()
+        self.config.dictionary_max_edits = self.dict_edits_spin.value()
         
         new_mode = self.mode_selector.currentData()
         logger.info(f"Settings calling accept. Selected mode: {new_mode}")
         
         self.config.current_mode = new_mode
-        # Prompts/Modes/Dict/Snip are modified in-place
-        self.config_manager.save()
+        # Changes made meanwhile elsewhere (hot reload, mode switches) are kept
+        changed = self.config_manager.merge(self._base, self.config)
+        logger.info(f"Changed settings: {', '.join(sorted(changed)) or 'none'}")
         
         # Verify save
         logger.info(f"Config saved. Current mode in config: {self.config_manager.get().current_mode}")
@@ -1037,12 +1366,14 @@ class SettingsDialog(QDialog):
     # --- Profile Helpers ---
     def _refresh_prof_list(self):
         self.prof_list.clear()
-        for rule, mode_id in self.config.app_profiles.items():
-            mode_name = mode_id
-            if mode_id in self.config.modes:
-                mdata = self.config.modes[mode_id]
+        for rule, value in self.config.app_profiles.items():
+            parsed = parse_rule(rule, value)
+            mode_name = parsed.mode_id
+            if parsed.mode_id in self.config.modes:
+                mdata = self.config.modes[parsed.mode_id]
                 mode_name = mdata.get("name") if isinstance(mdata, dict) else mdata.name
-            self.prof_list.addItem(f"{rule} -> {mode_name}")
+            suffix = f" (priority {parsed.priority})" if parsed.priority else ""
+            self.prof_list.addItem(f"{rule} -> {mode_name}{suffix}")
 
     def _on_prof_selected(self, row):
         if row < 0: return
@@ -1051,14 +1382,16 @@ class SettingsDialog(QDialog):
         
         if rule in self.config.app_profiles:
             self.p_rule_edit.setText(rule)
-            mode_id = self.config.app_profiles[rule]
-            idx = self.p_mode_combo.findData(mode_id)
+            parsed = parse_rule(rule, self.config.app_profiles[rule])
+            idx = self.p_mode_combo.findData(parsed.mode_id)
             if idx >= 0:
                 self.p_mode_combo.setCurrentIndex(idx)
+            self.p_priority_spin.setValue(parsed.priority)
 
     def _new_prof_entry(self):
         self.prof_list.clearSelection()
         self.p_rule_edit.clear()
+        self.p_priority_spin.setValue(0)
         self.p_rule_edit.setFocus()
 
     def _save_prof_entry(self):
@@ -1066,7 +1399,9 @@ class SettingsDialog(QDialog):
         mode_id = self.p_mode_combo.currentData()
         if not rule or not mode_id: return
         
-        self.config.app_profiles[rule] = mode_id
+        priority = self.p_priority_spin.value()
+        # Plain mode id unless a priority is set, so existing configs stay as they are
+        self.config.app_profiles[rule] = {"mode": mode_id, "priority": priority} if priority else mode_id
         self._refresh_prof_list()
         self._new_prof_entry()
 
@@ -1083,8 +1418,12 @@ class SettingsDialog(QDialog):
         
     def _perform_test_detection(self):
         try:
-            detected = self.profile_manager.detect_active_app()
-            QMessageBox.information(self, "Detection Result", f"Detected App Identifier:\n'{detected}'")
+            title, wm_class = self.profile_manager.detect_window()
+            # Rules edited in this dialog aren't saved yet, so match against them directly
+            rule = ProfileIndex(self.config.app_profiles).match(title or "", wm_class)
+            matched = f"{rule.rule} -> {rule.mode_id}" if rule else "none"
+            QMessageBox.information(self, "Detection Result",
+                                    f"Title: '{title}'\nClass: '{wm_class}'\nMatching rule: {matched}")
         except Exception as e:
             QMessageBox.warning(self, "Detection Failed", f"Error: {e}")
 
@@ -1125,6 +1464,12 @@ class CommandSignals(QObject):
     trigger = Signal()
     set_mode = Signal(str)
 
+class OutputSignals(QObject):
+    done = Signal(object, object) # DictationJob, exception or None
+
+class ConfigSignals(QObject):
+    changed = Signal(object, object) # ConfigSnapshot, names of the changed fields
+
 class SystemTrayApp:
     def __init__(self):
         self.app = QApplication(sys.argv)
@@ -1190,9 +1535,25 @@ class SystemTrayApp:
         # self.main_window.show()
 
         self.config_manager = ConfigManager()
+        # Copies are owned in-process; also the clipboard access of the output thread
+        clipboard.install(self.app, getattr(self.config_manager.get(), "clipboard_primary", False))
         self.history_manager = HistoryManager()
+        self.trace_log = TraceLog()
+        self.runner = AsyncRunner() # Event loop for the dictation pipeline
         self.prompt_engine = PromptEngine(self.config_manager)
         self.text_processor = TextProcessor(self.config_manager, self.prompt_engine)
+        self.dictation = DictationService(self.runner, self.config_manager, self.prompt_engine, self.text_processor)
+        self.dictation.finished.connect(self.on_transcription_finished)
+        self.dictation.error.connect(self.on_error)
+        self.dictation.dropped.connect(self.on_job_dropped)
+        self.dictation.status_update.connect(self.on_status_update)
+        self.dictation.audio_amplitude.connect(self._on_audio_amplitude)
+        # Output actions (clipboard, paste, file) run here, never on the GUI thread
+        self.output_executor = output_actions.OutputExecutor()
+        self.output_signals = OutputSignals()
+        self.output_signals.done.connect(self.on_output_done)
+        # Keep the {clipboard} snapshot current without reading it on the hot path
+        self.app.clipboard().dataChanged.connect(self._on_clipboard_changed)
         self.profile_manager = ProfileManager(self.config_manager)
         
         # Initialize Audio Manager for Sounds
@@ -1222,7 +1583,6 @@ class SystemTrayApp:
         self.tray_icon.setVisible(True)
         self.tray_icon.setToolTip("Vocalis")
         
-        self.worker = None
         self.visualizer = None 
 
         self.command_signals = CommandSignals()
@@ -1237,6 +1597,12 @@ class SystemTrayApp:
         self.setup_menu()
         self.tray_icon.show()
 
+        # Config changes (settings dialog, or config.toml edited outside the app) are applied on the GUI thread
+        self.config_signals = ConfigSignals()
+        self.config_signals.changed.connect(self.on_config_changed)
+        self.config_manager.subscribe(self.config_signals.changed.emit)
+        self.config_manager.watch()
+
         # Start Hotkeys
         try:
             self.hotkey_manager.start()
@@ -1304,10 +1670,8 @@ class SystemTrayApp:
     def set_mode(self, mode_key):
         logger.info(f"Switching to mode: {mode_key}")
         try:
-            config = self.config_manager.get()
-            config.current_mode = mode_key
-            self.config_manager.save()
-            self._refresh_mode_menu()
+            # The mode menu is refreshed by on_config_changed
+            self.config_manager.update(current_mode=mode_key)
             
             # Show a tooltip/message to confirm
             self.tray_icon.showMessage("Vocalis", f"Switched to {mode_key} mode", QSystemTrayIcon.Information, 1000)
@@ -1330,25 +1694,43 @@ class SystemTrayApp:
             self.history_menu.addAction(action)
 
     def _copy_history(self, text):
-        output_actions.execute("clipboard", text)
+        self.output_executor.execute("clipboard", text)
         self.tray_icon.showMessage("Vocalis", "Copied from history!", QSystemTrayIcon.Information, 1000)
 
+    def _on_clipboard_changed(self):
+        context = self.prompt_engine.context_manager
+        if not context.tracks_clipboard():
+            # Reading is a blocking selection conversion on X11 and may pull in a password
+            context.forget_clipboard()
+            return
+        # Wayland only notifies while we have focus; recording start also samples it
+        context.update_clipboard(self.app.clipboard().text())
+
+    def _on_audio_amplitude(self, amplitude):
+        if self.visualizer:
+            self.visualizer.update_audio(amplitude)
+
     def start_listening(self):
-        logger.info(f"start_listening called. Worker: {self.worker}, IsRunning: {self.worker.isRunning() if self.worker else 'None'}")
-        if self.worker and self.worker.isRunning():
+        logger.info(f"start_listening called. Recording: {self.dictation.is_recording()}, Busy: {self.dictation.is_busy()}")
+        if self.dictation.is_recording():
             self.status_action.setText("Stopping...")
             self.listen_action.setEnabled(False)
-            self.worker.stop_recording()
+            self.dictation.stop_recording()
+            return
+
+        if not self.dictation.can_record():
+            # Queue policy "reject": finish the backlog first
+            self.tray_icon.showMessage("Vocalis", "Still processing previous dictations.", QSystemTrayIcon.Warning, 1500)
             return
 
         logger.info("Starting listening flow...")
         
         # --- Auto-Switch Profile ---
         try:
-            active_app = self.profile_manager.detect_active_app() # e.g. "Vocalis - VS Code"
-            logger.info(f"Detected Active App: {active_app}")
+            title, wm_class = self.profile_manager.detect_window() # e.g. ("main.py - Visual Studio Code", "Code")
+            logger.info(f"Detected Active App: {title} ({wm_class})")
             
-            target_mode = self.profile_manager.get_profile(active_app)
+            target_mode = self.profile_manager.get_profile(title, wm_class)
             if target_mode and target_mode != self.config_manager.get().current_mode:
                 logger.info(f"Auto-switching to mode: {target_mode}")
                 self.set_mode(target_mode)
@@ -1356,6 +1738,14 @@ class SystemTrayApp:
             logger.warning(f"Profile switch failed: {e}")
         # ---------------------------
 
+        # Pre-connect the LLM client and snapshot {clipboard} context while the user speaks
+        try:
+            config = self.config_manager.get()
+            mode_data = config.modes.get(config.current_mode, {})
+            self.runner.submit(self.prompt_engine.prewarm(mode_data.get("prompt_id")))
+        except Exception as e:
+            logger.debug(f"Prompt prewarm skipped: {e}")
+
         self.sound_manager.play_start()
         self.status_action.setText("Starting...") 
         self.listen_action.setText("Stop Listening")
@@ -1372,22 +1762,19 @@ class SystemTrayApp:
         else:
              self.visualizer.show()
         
-        # Start Worker
-        self.worker = WorkerThread(self.config_manager, self.prompt_engine, self.text_processor)
-        self.worker.status_update.connect(self.visualizer.set_status)
-        self.worker.finished.connect(self.on_transcription_finished)
-        self.worker.error.connect(self.on_error)
-        self.worker.status_update.connect(self.on_status_update) 
-        self.worker.audio_amplitude.connect(self.visualizer.update_audio)
-        self.worker.start()
+        # Remember where the text should go; output waits for that window to be focused again
+        target_window = None
+        if not self.main_window.isActiveWindow():
+            window = self.profile_manager.active_window()
+            target_window = window.id if window else get_focus_watcher().active_window()
 
-    # start_processing removed as it is merged back into worker
+        # Record; processing of earlier dictations carries on meanwhile
+        self.dictation.start_recording(target_window=target_window)
 
     def cancel_processing(self):
         logger.warning("User cancelled processing.")
-        if self.worker and self.worker.isRunning():
-            self.worker.terminate() # Force kill for now
-            self.worker.wait()
+        # Cancels the recording and queued jobs; in-flight requests are aborted and temp files removed
+        self.dictation.cancel_all()
             
         self.status_action.setText("Ready (Cancelled)")
         self.listen_action.setEnabled(True)
@@ -1397,6 +1784,7 @@ class SystemTrayApp:
 
     def on_status_update(self, status):
         config = self.config_manager.get()
+        was_listening = self.status_action.text().startswith(("Listening", "Stopping"))
         self.status_action.setText(status)
         
         # Update Main Window UI
@@ -1421,15 +1809,16 @@ class SystemTrayApp:
             else:
                 self.visualizer.hide() # Ensure hidden if previously shown
                 
-        elif "Transcribing" in status or "Processing" in status:
-            if "Transcribing" in status: self.sound_manager.play_stop() # Play stop sound when recording ends
-            self.listen_action.setEnabled(False) 
-            self.listen_action.setText("Processing...")
+        elif "Transcribing" in status or "Processing" in status or "Queued" in status:
+            if was_listening: self.sound_manager.play_stop() # Play stop sound when recording ends
+            # The next dictation can be recorded while this one is processed
+            self.listen_action.setEnabled(True)
+            self.listen_action.setText("Start Listening")
             
             # Update Button
             if hasattr(self, 'btn_toggle'):
-                self.btn_toggle.setText("Processing...")
-                self.btn_toggle.setEnabled(False)
+                self.btn_toggle.setText("Processing... (click to record next)")
+                self.btn_toggle.setEnabled(True)
                 self.btn_toggle.setStyleSheet("background-color: #F39C12; color: white; font-size: 14px; font-weight: bold; padding: 10px;")
 
             # Orange Icon for Processing
@@ -1451,16 +1840,26 @@ class SystemTrayApp:
                 self.btn_toggle.setEnabled(True)
                 self.btn_toggle.setStyleSheet("background-color: #4A90E2; color: white; font-size: 14px; font-weight: bold; padding: 10px;")
 
-    def on_transcription_finished(self, text, mode_data):
+    def on_transcription_finished(self, job):
+        if job.cancelled:
+            # Result raced with the cancel button
+            self.dictation.complete(job)
+            return
+        text, mode_data, trace = job.text, job.mode_data, job.trace
         logger.info(f"Finished: {text}")
         if text: self.sound_manager.play_success()
         
-        # Reset UI
-        self.status_action.setText("Ready")
-        self.tray_icon.setIcon(create_placeholder_icon("#4A90E2")) # Reset to Blue
-        self.listen_action.setText("Start Listening")
-        self.listen_action.setEnabled(True)
-        if self.visualizer: self.visualizer.hide()
+        # Reset UI, unless the next dictation is already being recorded
+        if not self.dictation.is_recording():
+            self.status_action.setText("Ready")
+            self.tray_icon.setIcon(create_placeholder_icon("#4A90E2")) # Reset to Blue
+            self.listen_action.setText("Start Listening")
+            self.listen_action.setEnabled(True)
+            if self.visualizer: self.visualizer.hide()
+            if hasattr(self, 'btn_toggle'):
+                self.btn_toggle.setText("Start Listening")
+                self.btn_toggle.setEnabled(True)
+                self.btn_toggle.setStyleSheet("background-color: #4A90E2; color: white; font-size: 14px; font-weight: bold; padding: 10px;")
         
         # If the main window is active, hide/minimize it to restore focus to the user's previous app
         # This is critical for auto-paste to work (otherwise we paste into ourself).
@@ -1476,48 +1875,106 @@ class SystemTrayApp:
         QApplication.processEvents()
         
         # Add to history
-        self.history_manager.add(text, self.config_manager.get().current_mode)
-        
-        self.tray_icon.showMessage("Vocalis", "Transcription Complete", QSystemTrayIcon.Information, 1000)
+        self.history_manager.add(text, job.mode_name)
+        
+        # Tell the user when a stage was skipped or swapped to stay within the latency budget,
+        # or when streamed text couldn't be typed
+        degraded = trace.attributes.get("degraded") if trace else None
+        warnings = [DEGRADATION_MESSAGES.get(d["action"], f"{d['stage']} was too slow.") for d in degraded or ()]
+        if trace and trace.attributes.get("typing_failed"):
+            warnings.append("Typing failed. Text in clipboard.")
+        if warnings:
+            self.tray_icon.showMessage("Vocalis", " ".join(warnings), QSystemTrayIcon.Warning, 3000)
+        else:
+            self.tray_icon.showMessage("Vocalis", "Transcription Complete", QSystemTrayIcon.Information, 1000)
         
         # Delay output slightly to ensure focus is restored to target app
         # 500ms should be safer for Wayland/Window switching
-        delay_ms = int(self.config_manager.get().paste_delay * 1000)
+        delay = self.config_manager.get().paste_delay
         # Ensure at least 500ms if we just minimized a window
-        if delay_ms < 500: delay_ms = 500
-        
-        QTimer.singleShot(delay_ms, lambda: self._perform_output(text, mode_data))
+        if delay < 0.5: delay = 0.5
+        # Streamed output has already been typed by the worker; clipboard/file output needs no focus
+        if mode_data.get("streamed") or mode_data.get("output_action") != "paste": delay = 0
+
+        # Paste on the output thread, keeping the tray responsive; outputs run in order
+        self.output_executor.submit(self._perform_output, job, delay,
+                                    on_done=lambda error: self.output_signals.done.emit(job, error))
+
+    def _perform_output(self, job, delay=0):
+        """Runs on the output executor thread."""
+        text, mode_data, trace = job.text, job.mode_data, job.trace
+        if delay:
+            # Cut short once the target window has the focus again (X11)
+            with span(trace, "output.paste_delay"):
+                trace.set("focus", wait_for_focus(job.target_window, delay))
 
-    def _perform_output(self, text, mode_data):
         output_action_type = mode_data.get("output_action", "clipboard")
         file_path = mode_data.get("file_path")
-        output_actions.execute(output_action_type, text, file_path=file_path)
+        if not mode_data.get("streamed"):
+            with span(trace, "output.action", action=output_action_type):
+                output_actions.execute(output_action_type, text, file_path=file_path,
+                                       paste_method=mode_data.get("paste_method", "auto"), trace=trace,
+                                       target_window=job.target_window)
+
+    def on_output_done(self, job, error):
+        if error:
+            logger.error(f"Output failed: {error}")
+            job.trace.fail(f"output: {error}")
+            self.tray_icon.showMessage("Vocalis", "Output failed. Text is in History.", QSystemTrayIcon.Warning, 2000)
+        if job.trace:
+            job.trace.set("chars", len(job.text))
+            self.trace_log.write(job.trace)
+        # Lets the next queued dictation output
+        self.dictation.complete(job)
         
         # Open Editor (Only if text exists and explicitly requested - disabled for seamless flow)
         # if text:
         #     editor = ResultEditor(text)
         #     editor.exec()
 
-    def on_error(self, err):
+    def on_error(self, err, job=None):
         logger.error(err)
-        self.status_action.setText("Error")
-        self.listen_action.setText("Start Listening")
-        self.listen_action.setEnabled(True)
-        if self.visualizer: self.visualizer.hide()
+        # Failed sessions never reach _perform_output, so log their trace here
+        trace = job.trace if job else None
+        if trace and trace.status == "error":
+            self.trace_log.write(trace)
+        if not self.dictation.is_recording():
+            self.status_action.setText("Error")
+            self.listen_action.setText("Start Listening")
+            self.listen_action.setEnabled(True)
+            if self.visualizer: self.visualizer.hide()
         
         # Modal Error Dialog
         QMessageBox.critical(None, "Vocalis Error", f"An error occurred:\n{err}")
 
+    def on_job_dropped(self, job):
+        self.trace_log.write(job.trace)
+        self.tray_icon.showMessage("Vocalis", "Too many dictations queued: one was dropped.", QSystemTrayIcon.Warning, 2000)
+
     def open_settings(self):
         dialog = SettingsDialog(self.config_manager)
-        if dialog.exec():
-            self.hotkey_manager.update_hotkey(self.config_manager.get().hotkey)
+        # Accepting commits the settings; on_config_changed applies them
+        dialog.exec()
+
+    def on_config_changed(self, config, changed):
+        if "hotkey" in changed:
+            self.hotkey_manager.update_hotkey(config.hotkey)
+        if changed & {"modes", "current_mode"}:
             self._refresh_mode_menu()
+        if "clipboard_primary" in changed and clipboard.get_clipboard():
+            clipboard.get_clipboard().use_primary = config.clipboard_primary
+        if changed & {"allow_clipboard_access", "prompts"} and not self.prompt_engine.context_manager.tracks_clipboard():
+            self.prompt_engine.context_manager.forget_clipboard()
 
     def quit_app(self):
         if hasattr(self, 'ipc') and self.ipc:
             self.ipc.stop()
         self.hotkey_manager.stop()
+        self.config_manager.unwatch()
+        self.config_manager.flush()
+        self.dictation.cancel_all()
+        self.output_executor.shutdown()
+        self.runner.stop()
         if self.visualizer: self.visualizer.close()
         self.app.quit()
         
@@ -0,0 +1,86 @@
+"""
+Benchmark: personal dictionary replacement vs. dictionary size.
+
+Compares the legacy implementation (one re.compile + sub pass per entry on
+every utterance) with the compiled single-scan PhraseMatcher.
+
+Run from the repository root:
+    python -m benchmarks.bench_dictionary
+    python -m benchmarks.bench_dictionary --sizes 1000 50000 --legacy-max 5000
+"""
+import argparse
+import random
+import re
+import string
+import time
+from types import SimpleNamespace
+
+from core.config import AppConfig, make_snapshot
+from core.dictionary import DictionaryManager
+
+SAMPLE_TEXT = (
+    "so I was talking to the team about the super app launch and we agreed that "
+    "the vocalis dashboard needs a quick pass before friday, also ping the product "
+    "owner about the roadmap and the new billing api because customers keep asking "
+    "about it during the weekly sync with the sales team"
+)
+
+def config_manager(dictionary):
+    """Serves a real config snapshot holding `dictionary`, without touching config.toml."""
+    snapshot = make_snapshot(vars(AppConfig(dictionary=dictionary)))
+    return SimpleNamespace(get=lambda: snapshot)
+
+def make_dictionary(size, seed=42):
+    rng = random.Random(seed)
+    dictionary = {"super app": "SuperApp", "vocalis": "Vocalis", "billing api": "Billing API"}
+    while len(dictionary) < size:
+        words = rng.randint(1, 3)
+        phrase = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+            for _ in range(words)
+        )
+        dictionary[phrase] = phrase.title().replace(" ", "")
+    return dictionary
+
+def legacy_apply(dictionary, text):
+    processed_text = text
+    for key in sorted(dictionary.keys(), key=len, reverse=True):
+        pattern = re.compile(re.escape(key), re.IGNORECASE)
+        processed_text = pattern.sub(dictionary[key], processed_text)
+    return processed_text
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Dictionary matcher benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=200, help="Utterances per measurement")
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="Skip the legacy implementation above this size (it gets very slow)")
+    args = parser.parse_args()
+
+    print(f"Utterance: {len(SAMPLE_TEXT)} chars")
+    print(f"{'entries':>8}  {'build ms':>9}  {'apply ms':>9}  {'legacy ms':>10}  {'speedup':>8}")
+    for size in args.sizes:
+        dictionary = make_dictionary(size)
+        manager = DictionaryManager(config_manager(dictionary))
+
+        build_ms = timed(manager.get_matcher, 1)
+        apply_ms = timed(lambda: manager.apply(SAMPLE_TEXT), args.repeat)
+
+        if size <= args.legacy_max:
+            legacy_repeat = max(1, min(args.repeat, 20000 // size))
+            legacy_ms = timed(lambda: legacy_apply(dictionary, SAMPLE_TEXT), legacy_repeat)
+            speedup = f"{legacy_ms / apply_ms:>7.0f}x"
+            legacy = f"{legacy_ms:>10.3f}"
+        else:
+            legacy, speedup = f"{'skipped':>10}", f"{'-':>8}"
+
+        print(f"{size:>8}  {build_ms:>9.1f}  {apply_ms:>9.3f}  {legacy}  {speedup}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: X11 text injection, in-process XTEST vs. spawning xdotool.
+
+Types the same text with each backend into the focused window and reports
+characters per second. Measures injection (until the X server has accepted
+all key events), not how fast the target application renders them.
+
+Needs an X11 session. Focus a scratch window (an empty editor) during the
+countdown; every backend types its text there.
+
+Run from the repository root:
+    python -m benchmarks.bench_typing
+    python -m benchmarks.bench_typing --chars 2000 --backends xtest
+    python -m benchmarks.bench_typing --unicode   # include characters that need keycode remapping
+"""
+import argparse
+import random
+import shutil
+import subprocess
+import time
+
+from core.x11 import available, get_xtest_typer
+
+WORDS = ("the quick brown fox jumps over a lazy dog while Vocalis types "
+         "meeting notes, emails and TODO items for the team").split()
+UNICODE_WORDS = ["café", "naïve", "Größe", "über", "señor", "€5", "привет", "→"]
+
+def make_text(chars, unicode=False, seed=42):
+    rng = random.Random(seed)
+    pool = WORDS + (UNICODE_WORDS if unicode else [])
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(pool))
+    return " ".join(words)[:chars]
+
+def type_xtest(text):
+    get_xtest_typer().type_text(text)
+
+def type_xdotool(text):
+    subprocess.run(["xdotool", "type", "--delay", "1", text], check=True)
+
+BACKENDS = {"xtest": type_xtest, "xdotool": type_xdotool}
+
+def main():
+    parser = argparse.ArgumentParser(description="X11 typing backend benchmark")
+    parser.add_argument("--chars", type=int, default=500, help="Characters typed per backend")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--unicode", action="store_true", help="Mix in characters outside the keyboard layout")
+    parser.add_argument("--countdown", type=int, default=3, help="Seconds to focus the target window")
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit("Needs an X11 session (DISPLAY set, not Wayland) and python-xlib.")
+    backends = list(args.backends)
+    if "xtest" in backends and not get_xtest_typer().ready():
+        print("XTEST extension not available, skipping xtest")
+        backends.remove("xtest")
+    if "xdotool" in backends and not shutil.which("xdotool"):
+        print("xdotool not installed, skipping xdotool")
+        backends.remove("xdotool")
+
+    text = make_text(args.chars, args.unicode)
+    for remaining in range(args.countdown, 0, -1):
+        print(f"Focus a scratch window, typing in {remaining}...")
+        time.sleep(1)
+
+    print(f"{'backend':>8}  {'chars':>6}  {'seconds':>8}  {'chars/s':>9}")
+    results = {}
+    for name in backends:
+        start = time.perf_counter()
+        BACKENDS[name](text + "\n")
+        elapsed = time.perf_counter() - start
+        results[name] = len(text) / elapsed
+        print(f"{name:>8}  {len(text):>6}  {elapsed:>8.3f}  {results[name]:>9.0f}")
+        time.sleep(0.5)
+
+    if len(results) == 2:
+        print(f"XTEST is {results['xtest'] / results['xdotool']:.1f}x faster than xdotool")
+
+if __name__ == "__main__":
+    main()
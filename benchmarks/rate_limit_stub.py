@@ -0,0 +1,163 @@
+"""
+Benchmark: rate-limit scheduler against a local stub of a throttling provider.
+
+Starts an OpenAI-compatible HTTP stub on localhost that allows `--limit`
+requests per `--window` seconds, reports its budget in x-ratelimit-* headers
+and answers 429 with Retry-After once the budget is spent. A burst of
+concurrent LLM requests is then sent through LLMClient (and so through the
+shared RateLimiter), and the outcome is compared with what the server saw.
+
+Run from the repository root (needs the openai package):
+    python -m benchmarks.rate_limit_stub
+    python -m benchmarks.rate_limit_stub --burst 50 --limit 10 --window 2
+    python -m benchmarks.rate_limit_stub --serve   # only run the stub, e.g. for provider_base_urls
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.config import AppConfig, make_snapshot
+from core.llm import LLMClient
+from core.ratelimit import RateLimited, get_rate_limiter
+
+class StubState:
+    def __init__(self, limit, window, latency):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.window_start = time.monotonic()
+        self.used = 0
+        self.served = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """Returns (allowed, remaining, seconds until the window resets)."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start, self.used = now, 0
+            reset = self.window - (now - self.window_start)
+            if self.used >= self.limit:
+                self.throttled += 1
+                return False, 0, reset
+            self.used += 1
+            self.served += 1
+            return True, self.limit - self.used, reset
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body, remaining, reset):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("x-ratelimit-limit-requests", str(state.limit))
+            self.send_header("x-ratelimit-remaining-requests", str(remaining))
+            self.send_header("x-ratelimit-reset-requests", f"{reset:.3f}s")
+            if status == 429:
+                self.send_header("retry-after", f"{max(1, round(reset))}")
+                self.send_header("retry-after-ms", f"{int(reset * 1000)}")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            allowed, remaining, reset = state.admit()
+            if not allowed:
+                error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+                return self._reply(429, error, remaining, reset)
+
+            time.sleep(state.latency)
+            if self.path.endswith("/audio/transcriptions"):
+                return self._reply(200, {"text": "stub transcript"}, remaining, reset)
+            body = {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "stub completion"}}],
+            }
+            self._reply(200, body, remaining, reset)
+
+    return Handler
+
+class StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 stalls a burst's connections for a SYN retry (~1s)
+    request_queue_size = 256
+    daemon_threads = True
+
+def start_stub(state, port=0):
+    server = StubServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def stub_config(base_url):
+    return make_snapshot(vars(AppConfig(
+        transcription_provider="openai", api_key="stub-key", remote_model_name="stub",
+        request_timeout=10.0, provider_base_urls={"openai": base_url},
+    )))
+
+async def burst(client, size):
+    async def one():
+        start = time.perf_counter()
+        try:
+            await client.process("You are a stub.", "hello")
+            outcome = "ok"
+        except RateLimited:
+            outcome = "rate_limited"
+        except Exception as e:
+            outcome = type(e).__name__
+        return outcome, (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(one() for _ in range(size)))
+
+async def run_rounds(args, state, base_url):
+    # One loop for all rounds: the SDK's connection pool is bound to it
+    client = LLMClient(stub_config(base_url))
+    for round_no in range(1, args.rounds + 1):
+        throttled_before = state.throttled
+        results = await burst(client, args.burst)
+        latencies = sorted(ms for _, ms in results)
+        ok = sum(1 for outcome, _ in results if outcome == "ok")
+        limited = sum(1 for outcome, _ in results if outcome == "rate_limited")
+        circuit = "open" if not get_rate_limiter().available("openai") else "closed"
+        print(f"{round_no:>5}  {ok:>4}  {limited:>7}  {len(results) - ok - limited:>5}  "
+              f"{latencies[len(latencies) // 2]:>8.0f}  {latencies[-1]:>8.0f}  "
+              f"{state.throttled - throttled_before:>5}  {circuit:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate-limit scheduler benchmark against a local stub server")
+    parser.add_argument("--burst", type=int, default=30, help="Concurrent requests per round")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=10, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=2.0, help="Window length in seconds")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated response time in seconds")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help="Only run the stub server")
+    args = parser.parse_args()
+
+    state = StubState(args.limit, args.window, args.latency)
+    server = start_stub(state, args.port)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    if args.serve:
+        print(f"Stub provider listening on {base_url} ({args.limit} requests / {args.window}s)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    print(f"Stub: {args.limit} requests / {args.window}s, burst of {args.burst}")
+    print(f"{'round':>5}  {'ok':>4}  {'limited':>7}  {'other':>5}  {'p50 ms':>8}  {'max ms':>8}  {'429s':>5}  {'circuit':>7}")
+    asyncio.run(run_rounds(args, state, base_url))
+    print(f"Server: {state.served} served, {state.throttled} throttled")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
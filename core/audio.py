@@ -6,6 +6,7 @@ import tempfile
 import os
 import queue
 import logging
+from core.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +19,12 @@ class AudioRecorder:
         self.stop_event = threading.Event()
         self.audio_queue = queue.Queue()
 
-    def record_once(self, max_duration=30, stream_callback=None) -> str:
+    def record_once(self, max_duration=30, stream_callback=None, trace=None) -> str:
         """
         Records audio until stop() is called or max_duration is reached.
         Returns the path to the temporary .wav file.
         stream_callback: Optional function(indata) to receive live audio chunks (numpy array).
+        trace: Optional DictationTrace to record device open / capture / drain spans.
         """
         self.stop_event.clear()
         self.recording = True
@@ -42,30 +44,47 @@ class AudioRecorder:
                         logger.warning(f"Audio status: {status}")
                     self.audio_queue.put(indata.copy())
 
-                logger.info("Opening InputStream...")
-                with sd.InputStream(samplerate=self.sample_rate, device=self.device_index,
-                                    channels=self.channels, callback=callback):
+                stream = None
+                try:
+                    logger.info("Opening InputStream...")
+                    with span(trace, "record.device_open"):
+                        stream = sd.InputStream(samplerate=self.sample_rate, device=self.device_index,
+                                                channels=self.channels, callback=callback)
+                        # If start() fails (e.g. the device is busy), the finally below still closes the stream
+                        stream.start()
                     logger.info("InputStream open. Starting loop.")
                     
                     import time
                     start_ts = time.time()
                     
-                    while not self.stop_event.is_set():
-                        try:
-                            # Get data from queue
-                            data = self.audio_queue.get(timeout=0.1)
-                            file.write(data)
-                            if stream_callback:
-                                stream_callback(data)
-                        except queue.Empty:
-                            # Periodic log to show we are alive
-                            # logger.debug("Queue empty...")
-                            pass
-                        
-                        if time.time() - start_ts > max_duration:
-                            logger.info("Max duration reached")
-                            break
+                    with span(trace, "record.capture"):
+                        while not self.stop_event.is_set():
+                            try:
+                                # Get data from queue
+                                data = self.audio_queue.get(timeout=0.1)
+                                file.write(data)
+                                if stream_callback:
+                                    stream_callback(data)
+                            except queue.Empty:
+                                # Periodic log to show we are alive
+                                # logger.debug("Queue empty...")
+                                pass
+                            
+                            if time.time() - start_ts > max_duration:
+                                logger.info("Max duration reached")
+                                break
                     logger.info("Stop event set. Exiting loop.")
+                finally:
+                    if stream is not None:
+                        with span(trace, "record.drain"):
+                            stream.stop()
+                            stream.close()
+                            # Write out chunks captured between the last get() and the stream stopping
+                            while True:
+                                try:
+                                    file.write(self.audio_queue.get_nowait())
+                                except queue.Empty:
+                                    break
                             
         except Exception as e:
             logger.error(f"Recording failed: {e}")
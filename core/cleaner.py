@@ -0,0 +1,176 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Always noise, wherever they appear
+HARD_FILLERS = {"um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "ahh", "hmm", "mm", "mhm"}
+
+# Only fillers when set off by commas ("so, like, it works") or opening a sentence ("You know, ...")
+SOFT_FILLERS = [("you", "know"), ("i", "mean"), ("like",), ("basically",), ("so",), ("well",),
+                ("kind", "of"), ("sort", "of"), ("actually",)]
+
+# Doubled words that are often intended ("I had had enough", "that that", "bye bye")
+ALLOWED_REPEATS = {"had", "that", "bye", "no", "yes", "yeah", "very", "really", "so", "ha", "haha",
+                   "knock", "chop", "blah", "more", "again", "over", "far", "bla"}
+
+# Phrases where the speaker revises what they said; only an LLM can apply those
+SELF_CORRECTIONS = re.compile(r"\b(?:no wait|scratch that|i mean|sorry,? i meant|let me rephrase|actually no)\b", re.I)
+
+# Quotes, hashes, pluses and free-standing dashes are literal text ("c++", "#123", "--force",
+# 'like'); the rules can't tell how they were meant, so such utterances are left alone
+LITERAL_RE = re.compile(r"[\"“”«»#+]|(?<!\w)['‘’]|['‘’](?!\w)|(?:^|\s)-+|-{2,}")
+
+# Abbreviations whose period doesn't end the sentence ("e.g. this", "Dr. Smith")
+ABBREVIATIONS = r"(?:[^\W\d_]\.){2,}|\b(?:mr|mrs|ms|dr|prof|sr|jr|st|vs|etc|approx|cf|no)\.(?!\w)"
+
+# Words keep inner punctuation ("don't", "3.5", "well-known", "example.com");
+# a trailing hyphen marks an abandoned fragment ("wh- what")
+TOKEN_RE = re.compile(ABBREVIATIONS + r"|\w+(?:[-.'’@/:]\w+)*-?|[^\w\s]", re.I)
+SENTENCE_END = {".", "!", "?"}
+ATTACHED_PUNCTUATION = {".", ",", "!", "?", ";", ":", ")", "%"}
+
+def _is_word(token: str) -> bool:
+    return token[0].isalnum() or token[0] == "_"
+
+class TextCleaner:
+    """
+    Deterministic replacement for the "clean" LLM prompt: drops fillers and
+    word fragments, collapses stuttered repeats and fixes capitalization and
+    final punctuation, in a single pass over the tokens.
+    """
+    def __init__(self, max_repeat: int = 3):
+        self.max_repeat = max_repeat
+        self._soft = {}
+        for phrase in SOFT_FILLERS:
+            self._soft.setdefault(phrase[0], []).append(phrase)
+        for candidates in self._soft.values():
+            candidates.sort(key=len, reverse=True)
+
+    def escalation_reason(self, text: str, max_words: int):
+        """
+        Complexity heuristic: returns why the utterance should go to the LLM,
+        or None when the rules can handle it.
+        """
+        words = len(text.split())
+        if max_words and words > max_words:
+            return f"{words} words"
+        if SELF_CORRECTIONS.search(text):
+            return "self-correction"
+        if LITERAL_RE.search(text):
+            return "literal symbols"
+        return None
+
+    def clean(self, text: str) -> str:
+        """
+        Returns the cleaned text. Whitespace between the words that are kept is
+        preserved; text with literal symbols (see LITERAL_RE) is returned unchanged.
+        """
+        if LITERAL_RE.search(text):
+            return text
+        matches = list(TOKEN_RE.finditer(text))
+        tokens = [m.group() for m in matches]
+        # Whitespace before each token in the original text
+        spaces = [text[(matches[k - 1].end() if k else m.start()):m.start()] for k, m in enumerate(matches)]
+        lowered = [t.lower() for t in tokens]
+        out = [] # Emitted tokens
+        gaps = [] # Whitespace before each emitted token
+        pending = None # Whitespace of the first dropped word, used by the next emitted token
+        dropped = False # Something was removed since the last emitted token
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token, low = tokens[i], lowered[i]
+            at_start = not out or out[-1] in SENTENCE_END
+            after_comma = bool(out) and out[-1] == ","
+
+            start = i
+            if low in HARD_FILLERS:
+                i = self._skip_filler(out, gaps, lowered, i + 1)
+            else:
+                phrase = self._soft_filler_at(lowered, i)
+                end = i + len(phrase) if phrase else i
+                if phrase and (at_start or after_comma) and end < n and lowered[end] == ",":
+                    i = self._skip_filler(out, gaps, lowered, end)
+                # Fragment of an abandoned word: "wh- what"
+                elif len(token) > 1 and token.endswith("-") and token[-2].isalpha() and i + 1 < n and _is_word(tokens[i + 1]):
+                    i += 1
+                elif _is_word(token):
+                    i += self._repeat_length(out, lowered, i)
+            if i != start:
+                # "(um hello)" -> "(hello)", but "we should, uh, go" keeps the space before "go"
+                if pending is None and _is_word(tokens[start]):
+                    pending = spaces[start]
+                dropped = True
+                continue
+
+            if _is_word(token):
+                if low == "i" or low.startswith(("i'", "i’")):
+                    token = "I" + token[1:]
+                if at_start:
+                    token = token[0].upper() + token[1:]
+            elif token == "," and (not out or out[-1] in ATTACHED_PUNCTUATION):
+                i += 1
+                continue
+            elif token in SENTENCE_END and dropped and out and out[-1] in SENTENCE_END:
+                # "hello. um. world": the filler's sentence is gone, one mark is enough
+                i += 1
+                continue
+            elif token in SENTENCE_END and out and out[-1] in (",", ";"):
+                out.pop()
+                gaps.pop()
+
+            out.append(token)
+            gaps.append(spaces[i] if pending is None else pending)
+            pending = None
+            dropped = False
+            i += 1
+
+        while out and out[-1] in (",", ";"):
+            out.pop()
+            gaps.pop()
+        if out and out[-1] not in SENTENCE_END and out[-1] != ":" and not out[-1].endswith("."):
+            out.append(".")
+            gaps.append("")
+        return self._join(out, gaps)
+
+    def _skip_filler(self, out, gaps, lowered, i):
+        """
+        Returns the index after a removed filler and its trailing comma. A filler
+        wrapped in commas ("we should, uh, go", "can you, like, send it") also
+        loses the comma before it.
+        """
+        if i < len(lowered) and lowered[i] == ",":
+            i += 1
+            if out and out[-1] == ",":
+                out.pop()
+                gaps.pop()
+        return i
+
+    def _soft_filler_at(self, lowered, i):
+        for phrase in self._soft.get(lowered[i], ()):
+            if tuple(lowered[i:i + len(phrase)]) == phrase:
+                return phrase
+        return None
+
+    def _repeat_length(self, out, lowered, i):
+        """Length of an n-gram starting at i that repeats the words just emitted."""
+        recent = [w.lower() for w in out[-self.max_repeat:]]
+        for size in range(self.max_repeat, 0, -1):
+            if len(recent) < size or i + size > len(lowered):
+                continue
+            upcoming = lowered[i:i + size]
+            if upcoming == recent[-size:] and all(_is_word(w) for w in upcoming):
+                if size == 1 and upcoming[0] in ALLOWED_REPEATS:
+                    return 0
+                return size
+        return 0
+
+    def _join(self, tokens, gaps) -> str:
+        """Joins tokens with their original whitespace (none before the first, no line breaks added)."""
+        parts = []
+        for token, gap in zip(tokens, gaps):
+            if parts:
+                parts.append(gap)
+            parts.append(token)
+        return "".join(parts)
@@ -1,7 +1,11 @@
 import toml
 import os
+import copy
 import logging
-from dataclasses import dataclass, asdict
+import tempfile
+import threading
+from dataclasses import dataclass, asdict, fields
+from core.filewatch import FileWatcher
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +14,9 @@ class DictationMode:
     name: str
     prompt_id: str = None
     output_action: str = "clipboard" # clipboard, paste, file
-    paste_method: str = "auto" # auto, ctrl_v, type, copy_only
+    paste_method: str = "auto" # auto, ctrl_v, swap (restores the previous clipboard), type, copy_only
     file_path: str = None # for file output
+    latency_budget: float = None # Seconds after recording; None = AppConfig.latency_budget
 
 @dataclass
 class Prompt:
@@ -20,6 +25,7 @@ class Prompt:
     description: str
     template: str
     system_prompt: str = "You are a helpful assistant."
+    cache: bool = True # Reuse stored LLM responses for identical input
 
 @dataclass
 class AppConfig:
@@ -39,16 +45,36 @@ class AppConfig:
     # Modes & Behavior
     current_mode: str = "quick" # quick, command, note
     show_visualizer: bool = True
+    job_queue_depth: int = 3 # Recorded dictations that may wait while an earlier one is processed
+    job_queue_policy: str = "drop_oldest" # When the queue is full: drop_oldest, drop_newest or reject (no new recording)
     modes: dict = None # Dict[str, DictationMode]
     prompts: dict = None # Dict[str, Prompt]
     dictionary: dict = None # Dict[str, str] (Spoken -> Written)
+    dictionary_fuzzy: bool = False # Also replace near-miss spellings of dictionary phrases
+    dictionary_max_edits: int = 1 # Max character edits for a fuzzy match (long phrases only)
     snippets: dict = None # Dict[str, str] (Trigger -> Replacement)
-    app_profiles: dict = None # Dict[str, str] (Window Title Substring -> Mode ID)
+    app_profiles: dict = None # Dict[str, str | dict] (Rule -> Mode ID or {mode, priority}); rule: [title:|class:][re:]pattern
     
     paste_delay: float = 0.5  # Seconds to wait before pasting (allows focus restore)
+    llm_streaming: bool = True # Type AI output as it streams in (paste modes with paste_method "type")
+    llm_cache_enabled: bool = True # Reuse responses for identical prompt + text
+    llm_cache_ttl_hours: float = 168.0
+    llm_cache_max_entries: int = 500
+    llm_providers: list = None # Ordered LLM backends to race, e.g. ["groq", "openai"]; empty = transcription_provider
+    llm_api_keys: dict = None # Dict[str, str] (Provider -> API key); falls back to the provider's env var
+    llm_hedge_ms: int = 800 # Start the next provider if no first token arrived within this time
+    local_llm_model_path: str = None # GGUF model for offline AI prompts (provider "llama", needs llama-cpp-python)
+    local_llm_context: int = 2048
+    local_llm_threads: int = 0 # 0 = half the CPU cores
+    clean_fast_path: bool = True # Serve the "clean" prompt with local rules unless the utterance is complex
+    clean_max_words: int = 40 # Longer utterances are escalated to the LLM
+    latency_budget: float = 0.0 # Seconds from end of recording to output; slow stages degrade (0 = no limit)
+    request_timeout: float = 30.0 # Timeout for every cloud API request
+    provider_base_urls: dict = None # Dict[str, str] (Provider -> API endpoint override, e.g. a local proxy or stub)
 
     # Privacy / Permissions
     allow_clipboard_access: bool = True
+    clipboard_primary: bool = False # Also set the PRIMARY selection (middle-click paste) on X11
     
     # History
     history_size: int = 20
@@ -76,40 +102,369 @@ class AppConfig:
             self.snippets = {}
         if self.app_profiles is None:
             self.app_profiles = {}
+        if self.llm_providers is None:
+            self.llm_providers = []
+        if self.llm_api_keys is None:
+            self.llm_api_keys = {}
+        if self.provider_base_urls is None:
+            self.provider_base_urls = {}
+
+class FrozenDict(dict):
+    """dict that refuses changes; copies of it (copy/deepcopy) are plain, editable dicts."""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Config snapshots are read-only; edit a copy from ConfigManager.edit()")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+class FrozenList(list):
+    """list that refuses changes; copies of it are plain lists."""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Config snapshots are read-only; edit a copy from ConfigManager.edit()")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(value, memo) for value in self]
+
+def _freeze(value):
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(_freeze(item) for item in value)
+    return value
+
+class ConfigSnapshot(AppConfig):
+    """
+    Read-only AppConfig, as returned by ConfigManager.get(). A reader keeps
+    the snapshot it started with, so e.g. a dictation sees one consistent
+    config even if the settings change meanwhile.
+
+    version counts committed changes; field_versions maps each field to the
+    version in which it last changed, so derived state (compiled matchers,
+    clients) can tell whether a field it depends on is different.
+    """
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config snapshots are read-only (tried to set '{name}'); use ConfigManager.update()")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Config snapshots are read-only (tried to delete '{name}')")
+
+    def changed_in(self, field: str) -> int:
+        """Version in which `field` last changed (0 = never since startup)."""
+        return self.field_versions.get(field, 0)
+
+    def edit(self) -> AppConfig:
+        """A mutable deep copy, to be committed with ConfigManager.update()."""
+        return AppConfig(**{f.name: copy.deepcopy(getattr(self, f.name)) for f in fields(AppConfig)})
+
+def make_snapshot(values: dict, version: int = 0, field_versions: dict = None) -> ConfigSnapshot:
+    """Freezes AppConfig field values (name -> value) into a ConfigSnapshot."""
+    snapshot = object.__new__(ConfigSnapshot)
+    for f in fields(AppConfig):
+        object.__setattr__(snapshot, f.name, _freeze(values[f.name]))
+    object.__setattr__(snapshot, "version", version)
+    object.__setattr__(snapshot, "field_versions", FrozenDict(field_versions or {}))
+    return snapshot
+
+def _values(config) -> dict:
+    return {f.name: getattr(config, f.name) for f in fields(AppConfig)}
+
+def _persisted(value):
+    """value as it survives a round trip through TOML, which has no null (None entries are dropped)."""
+    if isinstance(value, dict):
+        return {key: _persisted(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_persisted(item) for item in value]
+    return value
+
+# Tables that can grow to tens of thousands of entries live in their own files
+# next to config.toml, so changing a small setting doesn't rewrite them
+SIDECAR_FIELDS = ("dictionary", "snippets")
+# Saves requested within this many seconds are written once
+SAVE_DEBOUNCE = 0.5
+
+def atomic_write(path: str, text: str):
+    """Writes text to a temp file, fsyncs it and renames it over path, so a crash never leaves a half-written file."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
 
 class ConfigManager:
+    """
+    Owns the configuration. get() returns an immutable ConfigSnapshot; changes
+    are committed as a whole new snapshot with update(), which notifies the
+    subscribers of the fields that actually changed. With watch(), edits made
+    to config.toml outside the app are loaded the same way.
+
+    Saving is debounced and done on a background thread with atomic writes;
+    the dictionary and snippets are stored in sidecar files (dictionary.toml,
+    snippets.toml) that are only rewritten when they changed.
+    """
     def __init__(self):
         self.config_dir = os.path.join(
             os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config")),
             "vocalis"
         )
         self.config_file = os.path.join(self.config_dir, "config.toml")
-        self.config = AppConfig()
+        self.sidecar_files = {field: os.path.join(self.config_dir, f"{field}.toml") for field in SIDECAR_FIELDS}
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock() # One writer at a time (debounce timer, flush)
+        self._subscribers = []
+        self._snapshot = make_snapshot(_values(AppConfig()))
+        self._file_texts = {} # path -> text as last read or written, so our own saves aren't reloaded
+        self._sidecar_versions = {} # field -> version of the field its sidecar file holds
+        self._save_timer = None
+        self._watcher = None
         self.load()
 
-    def load(self):
-        if not os.path.exists(self.config_file):
-            self.save()  # Create default
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def get(self) -> ConfigSnapshot:
+        return self._snapshot
+
+    def edit(self) -> AppConfig:
+        """A mutable copy of the current config, e.g. for the settings dialog."""
+        return self._snapshot.edit()
+
+    def update(self, config: AppConfig = None, save: bool = True, **changes) -> set:
+        """
+        Commits a new snapshot: all fields of `config` (an edited copy), and/or
+        single fields given as keywords. Saves it unless save=False. Returns the
+        names of the fields that changed.
+        """
+        with self._lock:
+            values = _values(config if config is not None else self._snapshot)
+            unknown = set(changes) - set(values)
+            if unknown:
+                raise AttributeError(f"Unknown config fields: {', '.join(sorted(unknown))}")
+            values.update(changes)
+            changed = self._commit(values)
+            if changed and save:
+                self.save()
+        self._notify(changed)
+        return changed
+
+    def merge(self, base: ConfigSnapshot, edited: AppConfig) -> set:
+        """
+        Commits only what was changed in `edited`, a copy of the snapshot `base`
+        (e.g. the settings dialog's). Whatever else changed since base was taken
+        (config.toml edited outside the app, a mode switch) is kept. Tables are
+        merged per entry. Returns the names of the fields that changed.
+        """
+        with self._lock:
+            current = self._snapshot
+            values = _values(current)
+            for name, old in _values(base).items():
+                new = getattr(edited, name)
+                if _persisted(old) == _persisted(new):
+                    continue
+                if isinstance(old, dict) and isinstance(new, dict) and isinstance(values[name], dict):
+                    merged = copy.deepcopy(values[name])
+                    for key in old.keys() - new.keys():
+                        merged.pop(key, None)
+                    for key, value in new.items():
+                        if key not in old or _persisted(old[key]) != _persisted(value):
+                            merged[key] = value
+                    values[name] = merged
+                else:
+                    values[name] = new
+            changed = self._commit(values)
+            if changed:
+                self.save()
+        self._notify(changed)
+        return changed
+
+    def subscribe(self, callback, fields=None):
+        """
+        Calls callback(snapshot, changed_fields) after every change to one of
+        `fields` (None = any field). It runs on the thread that made the change:
+        the settings dialog's, or the file watcher's for external edits.
+        Returns a function that unsubscribes.
+        """
+        entry = (callback, frozenset(fields) if fields else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def _commit(self, values: dict) -> set:
+        current = self._snapshot
+        changed = {name for name, value in values.items()
+                   if value is not getattr(current, name) and _persisted(value) != _persisted(getattr(current, name))}
+        if changed:
+            # Unchanged fields keep their frozen values (and identity)
+            values = {name: value if name in changed else getattr(current, name) for name, value in values.items()}
+            version = current.version + 1
+            field_versions = dict(current.field_versions)
+            field_versions.update(dict.fromkeys(changed, version))
+            self._snapshot = make_snapshot(values, version, field_versions)
+        return changed
+
+    def _notify(self, changed: set):
+        if not changed:
             return
+        snapshot = self._snapshot
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, wanted in subscribers:
+            if wanted is None or wanted & changed:
+                try:
+                    callback(snapshot, frozenset(changed))
+                except Exception as e:
+                    logger.error(f"Config change handler failed: {e}")
 
+    def load(self) -> set:
+        """(Re)reads config.toml and the sidecar files; returns the fields that changed."""
+        if not os.path.exists(self.config_file):
+            self._write()  # Create default
+            return set()
+
+        texts = {}
         try:
             with open(self.config_file, "r") as f:
-                data = toml.load(f)
-                # Update config with loaded values, ignore unknown keys
-                # This is a simple merge
-                for key, value in data.items():
-                    if hasattr(self.config, key):
-                        setattr(self.config, key, value)
+                texts[self.config_file] = f.read()
+            data = toml.loads(texts[self.config_file])
         except Exception as e:
             logger.error(f"Failed to load config: {e}")
+            return set()
+
+        # Older configs keep the dictionary/snippets in config.toml; a sidecar file wins over that
+        migrate = False
+        for field, path in self.sidecar_files.items():
+            if not os.path.exists(path):
+                migrate = migrate or bool(data.get(field))
+                continue
+            try:
+                with open(path, "r") as f:
+                    texts[path] = f.read()
+                data[field] = toml.loads(texts[path])
+            except Exception as e:
+                logger.error(f"Failed to load {os.path.basename(path)}: {e}")
+                data.pop(field, None)
+
+        with self._lock:
+            self._file_texts.update(texts)
+            # Update config with loaded values, ignore unknown keys
+            # This is a simple merge
+            values = _values(self._snapshot)
+            for key, value in data.items():
+                if key in values:
+                    values[key] = value
+            # Fill in defaults for tables the file sets to nothing
+            values = _values(AppConfig(**values))
+            changed = self._commit(values)
+            for field, path in self.sidecar_files.items():
+                if path in texts:
+                    self._sidecar_versions[field] = self._snapshot.changed_in(field)
+        self._notify(changed)
+        if migrate:
+            logger.info("Moving the dictionary and snippets out of config.toml into their own files")
+            self.save()
+        return changed
 
     def save(self):
-        os.makedirs(self.config_dir, exist_ok=True)
-        try:
-            with open(self.config_file, "w") as f:
-                toml.dump(asdict(self.config), f)
-        except Exception as e:
-            logger.error(f"Failed to save config: {e}")
+        """Schedules a write of the current config; saves within SAVE_DEBOUNCE are written once, off the calling thread."""
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(SAVE_DEBOUNCE, self._write)
+                self._save_timer.name = "vocalis-config-save"
+                self._save_timer.start()
+
+    def flush(self):
+        """Writes a pending save right away (e.g. before quitting)."""
+        with self._lock:
+            timer = self._save_timer
+        if timer is not None:
+            timer.cancel()
+            self._write()
+
+    def _write(self):
+        with self._write_lock:
+            with self._lock:
+                self._save_timer = None
+                snapshot = self._snapshot
+            data = asdict(snapshot.edit())
+            files = {}
+            for field, path in self.sidecar_files.items():
+                table = data.pop(field)
+                with self._lock:
+                    written = self._sidecar_versions.get(field)
+                if written != snapshot.changed_in(field) or not os.path.exists(path):
+                    files[path] = (field, toml.dumps(table))
+            files[self.config_file] = (None, toml.dumps(data))
 
-    def get(self) -> AppConfig:
-        return self.config
+            try:
+                os.makedirs(self.config_dir, exist_ok=True)
+                for path, (field, text) in files.items():
+                    with self._lock:
+                        # Recorded before the rename, so the file watcher recognizes our own write
+                        self._file_texts[path] = text
+                    atomic_write(path, text)
+                    if field:
+                        with self._lock:
+                            self._sidecar_versions[field] = snapshot.changed_in(field)
+            except Exception as e:
+                logger.error(f"Failed to save config: {e}")
+
+    def watch(self):
+        """Reloads config.toml and the sidecar files whenever they are edited outside the app."""
+        if self._watcher is None:
+            self._watcher = FileWatcher([self.config_file, *self.sidecar_files.values()], self._on_file_changed)
+            self._watcher.start()
+
+    def unwatch(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_file_changed(self, path):
+        try:
+            with open(path, "r") as f:
+                if f.read() == self._file_texts.get(path):
+                    return
+        except OSError:
+            return
+        changed = self.load()
+        if changed:
+            logger.info(f"Reloaded {os.path.basename(path)}, changed: {', '.join(sorted(changed))}")
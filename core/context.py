@@ -1,6 +1,7 @@
 import logging
 import shutil
 import subprocess
+import threading
 try:
     import pyperclip
 except ImportError:
@@ -9,20 +10,85 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 class ContextManager:
+    """
+    Supplies context placeholders (currently {clipboard}) to prompt templates.
+
+    The clipboard is kept as a snapshot that is refreshed off the hot path:
+    by the GUI's clipboard change notifications (update_clipboard, only while
+    tracks_clipboard()) and by a sample taken when recording starts
+    (capture_clipboard). Templating then
+    reads the snapshot instead of spawning a clipboard tool after the user
+    has stopped speaking.
+    """
     def __init__(self, config_manager):
         self.config_manager = config_manager
+        self._clipboard = None
+        self._lock = threading.Lock()
+
+    def _allowed(self) -> bool:
+        config = self.config_manager.get()
+        return getattr(config, "allow_clipboard_access", True)
+
+    def tracks_clipboard(self) -> bool:
+        """
+        Whether clipboard changes are worth reading: access is allowed and some
+        prompt template uses {clipboard}. Otherwise change notifications are
+        ignored without touching the clipboard.
+        """
+        config = self.config_manager.get()
+        if not getattr(config, "allow_clipboard_access", True):
+            return False
+        for prompt_data in (config.prompts or {}).values():
+            if isinstance(prompt_data, dict):
+                template = prompt_data.get("template", "")
+            else:
+                template = getattr(prompt_data, "template", "")
+            if "{clipboard}" in (template or ""):
+                return True
+        return False
+
+    def forget_clipboard(self):
+        """Drops the snapshot, e.g. once it is no longer tracked and would go stale."""
+        with self._lock:
+            self._clipboard = None
 
     def get_clipboard(self) -> str:
         """
         Retrieves clipboard content safely.
         Respects 'allow_clipboard_access' config.
-        Tries pyperclip first, then falls back to wl-paste (Wayland).
+        Returns the latest snapshot; reads the clipboard directly only if none was taken yet.
         """
-        config = self.config_manager.get()
-        if not getattr(config, "allow_clipboard_access", True):
+        if not self._allowed():
             logger.info("Clipboard access denied by settings.")
             return "[Clipboard Access Denied]"
 
+        with self._lock:
+            snapshot = self._clipboard
+        if snapshot is not None:
+            return snapshot
+
+        logger.debug("No clipboard snapshot yet, reading clipboard directly.")
+        return self.capture_clipboard()
+
+    def update_clipboard(self, content: str):
+        """Stores clipboard content pushed by a change notification."""
+        if not self._allowed():
+            self.forget_clipboard()
+            return
+        with self._lock:
+            self._clipboard = content or ""
+
+    def capture_clipboard(self) -> str:
+        """Reads the clipboard now (blocking) and stores it as the snapshot."""
+        if not self._allowed():
+            return ""
+        content = self._read_clipboard()
+        with self._lock:
+            self._clipboard = content
+        return content
+
+    def _read_clipboard(self) -> str:
+        """Tries pyperclip first, then falls back to wl-paste (Wayland)."""
         content = ""
         
         # Strategy 1: pyperclip
@@ -1,33 +1,52 @@
 import logging
-import re
+from core.matcher import PhraseMatcher, CompiledCache, BackgroundCache
+from core.fuzzy import FuzzyPhraseIndex
 
 logger = logging.getLogger(__name__)
 
 class DictionaryManager:
     def __init__(self, config_manager):
         self.config_manager = config_manager
+        self._matcher = CompiledCache(config_manager, ["dictionary"], self.compile)
+        # Large dictionaries take a while to index; the pipeline uses the previous index meanwhile
+        self._fuzzy = BackgroundCache(config_manager, ["dictionary", "dictionary_max_edits", "dictionary_fuzzy"],
+                                      self.compile_fuzzy)
+        self._fuzzy.get() # Start indexing now rather than on the first dictation
 
     def apply(self, text: str) -> str:
         """
         Applies personal dictionary replacements to the text.
         Performs case-insensitive matching for keys, preserves case of value.
+        All entries are matched in a single scan, longest phrase first, so
+        "Super App" is never partially replaced by "Super".
+        With fuzzy matching enabled, text left untouched by exact matches is
+        also checked for near-miss spellings of dictionary phrases.
         """
         config = self.config_manager.get()
         if not config.dictionary or not text:
             return text
 
-        # Sort keys by length (descending) to match longest phrases first
-        # This prevents "Super App" being partially replaced by "Super"
-        sorted_keys = sorted(config.dictionary.keys(), key=len, reverse=True)
-
-        processed_text = text
-        for key in sorted_keys:
-            replacement = config.dictionary[key]
-            # Create case-insensitive regex pattern
-            # \b ensures we match whole words (so "cat" doesn't replace inside "concatenation")
-            # However, for some terms user might want partial? Usually whole word is safer.
-            # Using \b for safety.
-            pattern = re.compile(re.escape(key), re.IGNORECASE)
-            processed_text = pattern.sub(replacement, processed_text)
-            
-        return processed_text
+        fuzzy = self.get_fuzzy_index()
+        return self.get_matcher().sub(text, lambda replacement, _matched: replacement,
+                                      gap=fuzzy.apply if fuzzy else None)
+
+    def get_matcher(self) -> PhraseMatcher:
+        """Returns the matcher compiled from the current dictionary (rebuilt only when the dictionary changes)."""
+        return self._matcher.get()
+
+    @staticmethod
+    def compile(config) -> PhraseMatcher:
+        return PhraseMatcher((config.dictionary or {}).items())
+
+    def get_fuzzy_index(self):
+        """Returns the near-miss index, or None when fuzzy matching is disabled or it isn't built yet."""
+        if not getattr(self.config_manager.get(), "dictionary_fuzzy", False):
+            return None
+        return self._fuzzy.get()
+
+    @staticmethod
+    def compile_fuzzy(config) -> FuzzyPhraseIndex:
+        if not getattr(config, "dictionary_fuzzy", False):
+            return None
+        return FuzzyPhraseIndex((config.dictionary or {}).items(),
+                                max_edits=getattr(config, "dictionary_max_edits", 1))
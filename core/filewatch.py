@@ -0,0 +1,124 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len (name follows)
+
+# How often the watcher thread checks whether it should stop
+STOP_CHECK = 0.5
+# Editors may write a file in several steps; changes within this window are reported once
+DEBOUNCE = 0.1
+# mtime polling interval where inotify isn't available (macOS, restricted sandboxes)
+POLL_INTERVAL = 1.0
+
+class FileWatcher:
+    """
+    Calls callback(path) on a background thread whenever one of `paths` (files
+    in the same directory) has been written or replaced. On Linux it uses
+    inotify (through ctypes) on that directory, so editors that save by
+    renaming a temp file over the original are noticed too; elsewhere it
+    polls the files' mtimes.
+    """
+    def __init__(self, paths, callback):
+        self.paths = {os.path.basename(path): os.path.abspath(path) for path in paths}
+        self.directory = os.path.dirname(next(iter(self.paths.values())))
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vocalis-file-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        fd = self._inotify()
+        if fd is None:
+            self._poll()
+            return
+        try:
+            self._watch(fd)
+        finally:
+            os.close(fd)
+
+    def _inotify(self):
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, f"inotify_add_watch failed: {os.strerror(error)}")
+            return fd
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable ({e}), polling {self.directory} instead")
+            return None
+
+    def _watch(self, fd):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd], [], [], STOP_CHECK)
+            changed = self._read_names(fd) & self.paths.keys() if ready else None
+            if not changed:
+                continue
+            # Let a multi-step save finish, then report each file once
+            if self._stop.wait(DEBOUNCE):
+                return
+            changed |= self._read_names(fd) & self.paths.keys()
+            for name in sorted(changed):
+                self._notify(self.paths[name])
+
+    def _read_names(self, fd) -> set:
+        """File names of the pending events (empty when there are none)."""
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def _poll(self):
+        last = {path: self._stat(path) for path in self.paths.values()}
+        while not self._stop.wait(POLL_INTERVAL):
+            for path, previous in last.items():
+                current = self._stat(path)
+                if current != previous:
+                    last[path] = current
+                    self._notify(path)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size, st.st_ino
+        except OSError:
+            return None
+
+    def _notify(self, path):
+        try:
+            self.callback(path)
+        except Exception as e:
+            logger.error(f"File change handler for {path} failed: {e}")
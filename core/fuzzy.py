@@ -0,0 +1,157 @@
+import logging
+import re
+from core.matcher import fold_text
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"\w+")
+
+def levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Edit distance between a and b, giving up early once it exceeds max_distance
+    (returns max_distance + 1 in that case).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(cost)
+            row_min = min(row_min, cost)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[-1], max_distance + 1)
+
+def _segments(length: int, bound: int):
+    """(start, length) of the bound + 1 contiguous segments a phrase of this length is split into."""
+    parts = bound + 1
+    starts = [k * length // parts for k in range(parts + 1)]
+    return [(starts[k], starts[k + 1] - starts[k]) for k in range(parts)]
+
+def normalize(text: str) -> str:
+    """Lowercased words joined by single spaces (punctuation and spacing ignored)."""
+    return " ".join(WORD_RE.findall(fold_text(text)))
+
+class FuzzyPhraseIndex:
+    """
+    Near-miss lookup for dictionary phrases using a pigeonhole segment index.
+
+    A phrase allowed `bound` edits is split into bound + 1 segments. Any text
+    within `bound` edits of it leaves at least one segment untouched, shifted
+    by at most `bound` characters. Each phrase is therefore stored only
+    bound + 1 times, under (length, segment number, segment). A candidate
+    from the text costs a few dozen dict lookups however large the
+    dictionary is, and only phrases sharing a segment are checked with a
+    bounded edit distance.
+    """
+    def __init__(self, entries, max_edits: int = 1, min_length: int = 6):
+        """
+        entries: iterable of (phrase, replacement).
+        Phrases shorter than min_length (after normalization) are never fuzzy-matched;
+        short words have too many legitimate neighbours.
+        """
+        self.max_edits = max(0, int(max_edits))
+        self.min_length = min_length
+        self._segments = {}
+        self._lengths = set()
+        self._word_counts = set()
+        self.max_length = 0
+        self._size = 0
+
+        for phrase, replacement in entries:
+            norm = normalize(phrase)
+            bound = self.edit_bound(norm)
+            if not bound:
+                continue
+            entry = (norm, replacement, bound, normalize(replacement))
+            for k, (start, size) in enumerate(_segments(len(norm), bound)):
+                self._segments.setdefault((len(norm), k, norm[start:start + size]), []).append(entry)
+            self._lengths.add(len(norm))
+            self._word_counts.add(norm.count(" ") + 1)
+            self.max_length = max(self.max_length, len(norm))
+            self._size += 1
+
+        # Try multi-word phrases first so "super app" beats "super"
+        self._word_counts = sorted(self._word_counts, reverse=True)
+
+    def __len__(self):
+        return self._size
+
+    def edit_bound(self, norm: str) -> int:
+        """Allowed edits for a phrase: one per ~4 characters beyond the minimum, capped at max_edits."""
+        return self._bound(len(norm))
+
+    def _bound(self, length: int) -> int:
+        if length < self.min_length:
+            return 0
+        return min(self.max_edits, 1 + (length - self.min_length) // 4)
+
+    def lookup(self, candidate: str):
+        """Returns (replacement, distance) for the closest phrase within its edit bound, or None."""
+        if len(candidate) > self.max_length + self.max_edits:
+            return None
+        best = None
+        seen = set()
+        for entry in self._candidates(candidate):
+            norm, replacement, bound, norm_replacement = entry
+            if norm in seen:
+                continue
+            seen.add(norm)
+            if candidate == norm_replacement:
+                # Already spelled the way the dictionary wants it
+                return None
+            distance = levenshtein(candidate, norm, bound)
+            if distance > bound:
+                continue
+            if best is None or (distance, -len(norm)) < (best[1], -len(best[2])):
+                best = (replacement, distance, norm)
+        return (best[0], best[1]) if best else None
+
+    def _candidates(self, candidate: str):
+        """Entries sharing a segment with candidate at a position their edit bound allows."""
+        size = len(candidate)
+        for length in range(size - self.max_edits, size + self.max_edits + 1):
+            bound = self._bound(length)
+            if length not in self._lengths or abs(length - size) > bound:
+                continue
+            for k, (start, seg_size) in enumerate(_segments(length, bound)):
+                for shifted in range(max(0, start - bound), min(size - seg_size, start + bound) + 1):
+                    yield from self._segments.get((length, k, candidate[shifted:shifted + seg_size]), ())
+
+    def apply(self, text: str) -> str:
+        """Replaces runs of words that are near-misses of a dictionary phrase."""
+        if not self._size or not text:
+            return text
+        words = list(WORD_RE.finditer(text))
+        if not words:
+            return text
+
+        folded = [fold_text(m.group(0)) for m in words]
+        parts = []
+        last = 0
+        i = 0
+        while i < len(words):
+            for count in self._word_counts:
+                if i + count > len(words):
+                    continue
+                found = self.lookup(" ".join(folded[i:i + count]))
+                if found:
+                    start, end = words[i].start(), words[i + count - 1].end()
+                    parts.append(text[last:start])
+                    parts.append(found[0])
+                    last = end
+                    i += count
+                    break
+            else:
+                i += 1
+
+        if not parts:
+            return text
+        parts.append(text[last:])
+        return "".join(parts)
@@ -1,95 +1,215 @@
 import logging
 import os
+import threading
+import time
+from core.local_llm import LOCAL_PROVIDER, get_local_llm
+from core.pipeline import run_in_thread
+from core.ratelimit import get_rate_limiter, http_event_hooks
 
 logger = logging.getLogger(__name__)
 
+PROVIDER_ENV_KEYS = {
+    "openai": "OPENAI_API_KEY",
+    "groq": "GROQ_API_KEY",
+    "deepseek": "DEEPSEEK_API_KEY",
+    "glm": "ZHIPU_API_KEY",
+    "zhipu": "ZHIPU_API_KEY",
+    "claude": "ANTHROPIC_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+PROVIDER_BASE_URLS = {
+    "groq": "https://api.groq.com/openai/v1",
+    "deepseek": "https://api.deepseek.com",
+    "glm": "https://open.bigmodel.cn/api/paas/v4/",
+    "zhipu": "https://open.bigmodel.cn/api/paas/v4/",
+}
+
+def resolve_api_key(provider, api_key=None):
+    """Returns the configured key, falling back to the provider's environment variable."""
+    if api_key:
+        return api_key
+    env_var = PROVIDER_ENV_KEYS.get(provider)
+    return os.environ.get(env_var) if env_var else None
+
+def resolve_base_url(provider, overrides=None):
+    """The provider's API endpoint; `overrides` (config.provider_base_urls) wins, e.g. to point at a local stub server."""
+    if overrides and overrides.get(provider):
+        return overrides[provider]
+    return PROVIDER_BASE_URLS.get(provider)
+
 class LLMClient:
-    def __init__(self, config):
+    """
+    Async client for one LLM provider. All calls are coroutines and must run on
+    the pipeline event loop (see core.pipeline.AsyncRunner), which lets a cancelled
+    dictation abort the HTTP request instead of waiting for it.
+    """
+    def __init__(self, config, provider=None, api_key=None):
         self.config = config
         self.client = None
-        self.provider = self.config.transcription_provider
+        self.provider = provider or self.config.transcription_provider
+        # The configured key belongs to the main provider; others use their env vars
+        if api_key is None and self.provider == self.config.transcription_provider:
+            api_key = self.config.api_key
+        self.api_key = resolve_api_key(self.provider, api_key)
+        self.base_url = resolve_base_url(self.provider, getattr(self.config, "provider_base_urls", None))
+        self._last_warm = 0.0
         self._setup_client()
 
     def _setup_client(self):
-        self.provider = self.config.transcription_provider
-        api_key = self.config.api_key
-        
-        # Resolve API Key based on provider
-        if not api_key:
-            if self.provider == "openai":
-                api_key = os.environ.get("OPENAI_API_KEY")
-            elif self.provider == "groq":
-                api_key = os.environ.get("GROQ_API_KEY")
-            elif self.provider == "deepseek":
-                api_key = os.environ.get("DEEPSEEK_API_KEY")
-            elif self.provider in ["glm", "zhipu"]:
-                api_key = os.environ.get("ZHIPU_API_KEY")
-            elif self.provider in ["claude", "anthropic"]:
-                api_key = os.environ.get("ANTHROPIC_API_KEY")
-             
-        if not api_key:
+        if self.provider == LOCAL_PROVIDER:
+            # In-process llama.cpp model; no key or network involved
+            self.client = get_local_llm(self.config)
+            return
+
+        if not self.api_key:
             return
 
+        # Retries are left to the shared rate limiter, which also reads the
+        # rate-limit headers of every response through the event hooks
         try:
             if self.provider in ["claude", "anthropic"]:
-                from anthropic import Anthropic
-                self.client = Anthropic(api_key=api_key)
+                from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+                self.client = AsyncAnthropic(
+                    api_key=self.api_key, base_url=self.base_url, timeout=self._timeout(), max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(event_hooks=http_event_hooks(self.provider))
+                )
             else:
-                from openai import OpenAI
-                base_url = None
-                if self.provider == "groq":
-                    base_url = "https://api.groq.com/openai/v1"
-                elif self.provider == "deepseek":
-                    base_url = "https://api.deepseek.com"
-                elif self.provider in ["glm", "zhipu"]:
-                    base_url = "https://open.bigmodel.cn/api/paas/v4/"
-                
-                self.client = OpenAI(api_key=api_key, base_url=base_url)
-                
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                self.client = AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, timeout=self._timeout(), max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(event_hooks=http_event_hooks(self.provider))
+                )
+
         except ImportError as e:
             logger.error(f"Failed to import client library for {self.provider}: {e}")
         except Exception as e:
             logger.error(f"Failed to initialize {self.provider} client: {e}")
 
-    def process(self, system_prompt: str, user_text: str, model=None) -> str:
+    def _timeout(self):
+        # Without one the SDKs wait up to 10 minutes on a stalled connection
+        return getattr(self.config, "request_timeout", 30.0)
+
+    async def warm_up(self, min_interval=30.0):
+        """
+        Opens (or refreshes) the HTTP connection with a cheap authenticated request,
+        so the TLS handshake is already done when the real prompt is sent.
+        """
         if not self.client:
-            return user_text 
-            
+            return
+        if self.provider == LOCAL_PROVIDER:
+            # Loading the model is the expensive part; it stays loaded afterwards
+            try:
+                await run_in_thread(self.client.load)
+            except Exception as e:
+                logger.error(f"Failed to load local LLM: {e}")
+            return
+        if time.monotonic() - self._last_warm < min_interval:
+            return
+        self._last_warm = time.monotonic()
+        try:
+            await self.client.models.list()
+            logger.debug(f"LLM connection to {self.provider} warmed up.")
+        except Exception as e:
+            # The handshake still happened even if the endpoint itself is unsupported
+            logger.debug(f"LLM warm-up request failed ({self.provider}): {e}")
+
+    async def process(self, system_prompt: str, user_text: str, model=None) -> str:
+        if not self.client:
+            return user_text
+
         if not model:
-            model = self._get_default_model()
+            model = self.get_default_model()
 
         try:
-            if self.provider in ["claude", "anthropic"]:
-                response = self.client.messages.create(
-                    model=model,
-                    max_tokens=1024,
-                    system=system_prompt,
-                    messages=[
-                        {"role": "user", "content": user_text}
-                    ]
-                )
+            if self.provider == LOCAL_PROVIDER:
+                return await self.client.aprocess(system_prompt, user_text)
+            elif self.provider in ["claude", "anthropic"]:
+                response = await self._request(system_prompt, user_text, model)
                 return response.content[0].text
             else:
                 # OpenAI-compatible providers
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_text}
-                    ]
-                )
+                response = await self._request(system_prompt, user_text, model)
                 return response.choices[0].message.content.strip()
-                
+
         except Exception as e:
             logger.error(f"LLM request failed ({self.provider}): {e}")
             raise
 
-    def _get_default_model(self):
-        if self.config.remote_model_name and self.config.remote_model_name != "whisper-1":
+    async def stream(self, system_prompt: str, user_text: str, model=None):
+        """Yields the completion text in chunks as tokens arrive."""
+        if not self.client:
+            yield user_text
+            return
+
+        if not model:
+            model = self.get_default_model()
+
+        try:
+            if self.provider == LOCAL_PROVIDER:
+                async for text in self.client.astream(system_prompt, user_text):
+                    yield text
+            elif self.provider in ["claude", "anthropic"]:
+                response = await self._request(system_prompt, user_text, model, stream=True)
+                try:
+                    async for event in response:
+                        if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                            if event.delta.text:
+                                yield event.delta.text
+                finally:
+                    await response.close()
+            else:
+                # OpenAI-compatible providers
+                response = await self._request(system_prompt, user_text, model, stream=True)
+                try:
+                    async for chunk in response:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+                finally:
+                    await response.close()
+
+        except Exception as e:
+            logger.error(f"LLM stream failed ({self.provider}): {e}")
+            raise
+
+    async def _request(self, system_prompt, user_text, model, stream=False):
+        """
+        Sends the completion request through the rate limiter. For streams only the
+        request itself is retried: once tokens flow, the answer is committed.
+        """
+        if self.provider in ["claude", "anthropic"]:
+            create = lambda: self.client.messages.create(
+                model=model,
+                max_tokens=1024,
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": user_text}
+                ],
+                stream=stream
+            )
+        else:
+            create = lambda: self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_text}
+                ],
+                stream=stream
+            )
+        return await get_rate_limiter().call(self.provider, create)
+
+    def get_default_model(self):
+        if (self.provider == self.config.transcription_provider
+                and self.config.remote_model_name and self.config.remote_model_name != "whisper-1"):
              # Use configured model if it looks like an LLM model (not the default whisper one)
              return self.config.remote_model_name
 
-        if self.provider == "groq":
+        if self.provider == LOCAL_PROVIDER:
+            return self.client.name if self.client else LOCAL_PROVIDER
+        elif self.provider == "groq":
             return "llama3-70b-8192"
         elif self.provider == "deepseek":
             return "deepseek-chat"
@@ -99,3 +219,39 @@ class LLMClient:
             return "claude-3-5-sonnet-20240620"
         else:
             return "gpt-3.5-turbo"
+
+class LLMClientPool:
+    """
+    Keeps one LLMClient per (provider, api key, base_url) for the lifetime of the app,
+    so the SDK import, key resolution and HTTP connection pool are reused across prompts.
+    """
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, config, provider=None, api_key=None) -> LLMClient:
+        provider = provider or config.transcription_provider
+        if api_key is None and provider == config.transcription_provider:
+            api_key = config.api_key
+        api_key = resolve_api_key(provider, api_key)
+        key = (provider, api_key, resolve_base_url(provider, getattr(config, "provider_base_urls", None)))
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = LLMClient(config, provider=provider, api_key=api_key)
+                self._clients[key] = client
+            else:
+                # Model selection reads the live config
+                client.config = config
+                if provider == LOCAL_PROVIDER:
+                    # The model file may have changed in settings
+                    client._setup_client()
+            return client
+
+    async def prewarm(self, config, provider=None, api_key=None):
+        """Creates the client and opens its connection; failures are only logged."""
+        try:
+            await self.get(config, provider, api_key).warm_up()
+        except Exception as e:
+            logger.debug(f"LLM prewarm failed: {e}")
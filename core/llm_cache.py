@@ -0,0 +1,160 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Hit/miss counters and access times are written in batches, with the next put()
+# or after this many lookups or seconds, rather than on every lookup
+FLUSH_EVERY = 32
+FLUSH_INTERVAL = 60.0
+
+class LLMResponseCache:
+    """
+    On-disk cache of LLM responses keyed by (provider, model, system prompt, user content).
+    Entries expire after `ttl_seconds`; beyond `max_entries` the least recently
+    used ones are evicted. Hit/miss counters are persisted alongside the entries.
+
+    Lookups only read; the bookkeeping they cause is written in batches (see
+    flush()). Errors, including an unwritable cache directory, are logged and
+    treated as misses, so the cache never breaks a dictation. Calls block on
+    disk, so the pipeline makes them through run_in_thread.
+    """
+    def __init__(self, path: str = None, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 500):
+        if path is None:
+            cache_dir = os.path.join(
+                os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                "vocalis"
+            )
+            path = os.path.join(cache_dir, "llm_cache.sqlite3")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        # Pending bookkeeping: counter increments, key -> last access, expired keys
+        self._counts = {}
+        self._accessed = {}
+        self._expired = set()
+        self._lookups = 0
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(provider: str, model: str, system_prompt: str, user_content: str) -> str:
+        payload = json.dumps([provider, model, system_prompt, user_content], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached response, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"LLM cache read failed: {e}")
+                return None
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._expired.add(key)
+                row = None
+            if row:
+                self._accessed[key] = now
+            name = "hits" if row else "misses"
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._lookups += 1
+            if self._lookups >= FLUSH_EVERY or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+                self._flush()
+            return row[0] if row else None
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                self._write_pending(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                if self.max_entries:
+                    conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"LLM cache write failed: {e}")
+
+    def flush(self):
+        """Writes the pending counters and access times."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not (self._counts or self._accessed or self._expired):
+            return
+        try:
+            conn = self._connect()
+            self._write_pending(conn)
+            conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"LLM cache write failed: {e}")
+
+    def _write_pending(self, conn):
+        """Adds the pending bookkeeping to the current transaction (dropped even if it fails)."""
+        counts, accessed, expired = self._counts, self._accessed, self._expired
+        self._counts, self._accessed, self._expired = {}, {}, set()
+        self._lookups = 0
+        self._flushed_at = time.monotonic()
+        for name, count in counts.items():
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, count)
+            )
+        conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                         [(when, key) for key, when in accessed.items()])
+        conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in expired])
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush()
+            try:
+                conn = self._connect()
+                counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+                entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"LLM cache stats failed: {e}")
+                return {}
+        return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0), "entries": entries}
+
+    def clear(self):
+        with self._lock:
+            self._counts, self._accessed, self._expired = {}, {}, set()
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses")
+                conn.execute("DELETE FROM counters")
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"LLM cache clear failed: {e}")
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from core.local_llm import LOCAL_PROVIDER
+from core.ratelimit import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """Rolling win/latency statistics for one LLM provider."""
+    def __init__(self, window=100):
+        self.attempts = 0
+        self.wins = 0
+        self.errors = 0
+        self.first_token_ms = deque(maxlen=window)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.first_token_ms)
+        return {
+            "attempts": self.attempts,
+            "wins": self.wins,
+            "errors": self.errors,
+            "win_rate": self.wins / self.attempts if self.attempts else 0.0,
+            "p50_first_token_ms": latencies[len(latencies) // 2] if latencies else None,
+        }
+
+class _Attempt:
+    """One provider's request within a race, run as an asyncio task."""
+    def __init__(self, client):
+        self.client = client
+        self.provider = client.provider
+        self.task = None
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.outcome = "pending"
+
+    async def run(self, system_prompt, user_content, results):
+        try:
+            async for chunk in self.client.stream(system_prompt, user_content):
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                results.put_nowait(("token", self, chunk))
+            results.put_nowait(("done", self, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            results.put_nowait(("error", self, e))
+
+    def first_token_ms(self):
+        if self.first_token_at is None:
+            return None
+        return round((self.first_token_at - self.started_at) * 1000, 1)
+
+class LLMRouter:
+    """
+    Sends a prompt to an ordered list of LLM providers with a hedged race:
+    the primary gets the request first; if it hasn't produced a first token
+    within the hedge delay (or fails), the next provider is started too.
+    The first provider to stream a token wins and the others are cancelled,
+    which closes their HTTP streams.
+    """
+    def __init__(self, client_pool):
+        self.client_pool = client_pool
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def clients(self, config) -> list:
+        """Usable clients for the configured providers, in priority order."""
+        providers = list(getattr(config, "llm_providers", None) or []) or [config.transcription_provider]
+        api_keys = getattr(config, "llm_api_keys", None) or {}
+        limiter = get_rate_limiter()
+        clients = []
+        throttled = False
+        for provider in providers:
+            if provider != LOCAL_PROVIDER and not limiter.available(provider):
+                logger.info(f"LLM provider '{provider}' skipped (throttling, circuit open)")
+                throttled = True
+                continue
+            client = self.client_pool.get(config, provider=provider, api_key=api_keys.get(provider))
+            if client.client:
+                clients.append(client)
+            else:
+                logger.debug(f"LLM provider '{provider}' skipped (no API key or client library)")
+
+        fallback = throttled or not getattr(config, "llm_providers", None)
+        if not clients and fallback and getattr(config, "local_llm_model_path", None):
+            # No usable cloud provider: fall back to the in-process model
+            client = self.client_pool.get(config, provider=LOCAL_PROVIDER)
+            if client.client:
+                clients.append(client)
+        return clients
+
+    async def stream(self, config, system_prompt: str, user_content: str, trace=None):
+        """Yields the winning provider's completion in chunks."""
+        clients = self.clients(config)
+        if not clients:
+            raise RuntimeError("No LLM provider is configured")
+
+        hedge_delay = max(0, getattr(config, "llm_hedge_ms", 800)) / 1000.0
+        results = asyncio.Queue()
+        attempts = []
+        winner = None
+        last_error = None
+
+        def launch():
+            attempt = _Attempt(clients[len(attempts)])
+            attempts.append(attempt)
+            self._stats(attempt.provider).attempts += 1
+            logger.info(f"LLM request sent to '{attempt.provider}'")
+            attempt.task = asyncio.create_task(attempt.run(system_prompt, user_content, results))
+            return time.perf_counter() + hedge_delay
+
+        hedge_at = launch()
+        try:
+            while True:
+                can_hedge = winner is None and len(attempts) < len(clients)
+                timeout = max(0.0, hedge_at - time.perf_counter()) if can_hedge else None
+                try:
+                    kind, attempt, payload = await asyncio.wait_for(results.get(), timeout)
+                except asyncio.TimeoutError:
+                    logger.info(f"No first token after {hedge_delay * 1000:.0f} ms, hedging")
+                    hedge_at = launch()
+                    continue
+
+                if winner is None:
+                    if kind == "token":
+                        winner = attempt
+                        self._record_win(winner, attempts)
+                        yield payload
+                        continue
+
+                    # Failed (or empty) before producing anything
+                    attempt.outcome = "error"
+                    self._stats(attempt.provider).errors += 1
+                    last_error = payload if kind == "error" else RuntimeError(f"{attempt.provider} returned no output")
+                    logger.warning(f"LLM provider '{attempt.provider}' failed: {last_error}")
+                    if len(attempts) < len(clients):
+                        hedge_at = launch()
+                    elif all(a.outcome == "error" for a in attempts):
+                        raise last_error
+                    continue
+
+                if attempt is not winner:
+                    continue
+                if kind == "token":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            # Covers the winner if the consumer stopped early, and losers of an unfinished race
+            for attempt in attempts:
+                attempt.task.cancel()
+                if attempt.outcome == "pending":
+                    attempt.outcome = "cancelled"
+            if trace:
+                trace.set("llm", {
+                    "winner": winner.provider if winner else None,
+                    "attempts": [
+                        {"provider": a.provider, "outcome": a.outcome, "first_token_ms": a.first_token_ms()}
+                        for a in attempts
+                    ],
+                })
+
+    async def process(self, config, system_prompt: str, user_content: str, trace=None) -> str:
+        clients = self.clients(config)
+        if len(clients) == 1:
+            # Nothing to race against: a plain request avoids the streaming overhead
+            return await clients[0].process(system_prompt, user_content)
+        chunks = [chunk async for chunk in self.stream(config, system_prompt, user_content, trace=trace)]
+        return "".join(chunks).strip()
+
+    def stats_snapshot(self) -> dict:
+        with self._lock:
+            return {provider: stats.to_dict() for provider, stats in self.stats.items()}
+
+    def _stats(self, provider) -> ProviderStats:
+        with self._lock:
+            return self.stats.setdefault(provider, ProviderStats())
+
+    def _record_win(self, winner, attempts):
+        stats = self._stats(winner.provider)
+        stats.wins += 1
+        latency = winner.first_token_ms()
+        if latency is not None:
+            stats.first_token_ms.append(latency)
+        winner.outcome = "won"
+        for attempt in attempts:
+            if attempt is winner:
+                continue
+            # Stop the losers now rather than when the winner's stream ends
+            attempt.task.cancel()
+            if attempt.outcome == "pending":
+                attempt.outcome = "cancelled"
+        logger.info(f"LLM race won by '{winner.provider}' (first token after {latency} ms)")
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import threading
+from core.pipeline import run_in_thread
+
+try:
+    import llama_cpp
+except ImportError:
+    llama_cpp = None
+
+logger = logging.getLogger(__name__)
+
+# Provider id of the in-process backend, usable in llm_providers
+LOCAL_PROVIDER = "llama"
+
+class LocalLLM:
+    """
+    A quantized GGUF model run in-process on the CPU with llama.cpp.
+
+    The model is loaded once and kept until its settings change. Evaluated
+    prompt states are kept in a RAM cache, so the shared system prompt of a
+    mode is not re-evaluated on every dictation. llama.cpp contexts are not
+    thread-safe, so generations are serialized.
+    """
+    def __init__(self, model_path: str, n_ctx: int = 2048, n_threads: int = 0, cache_bytes: int = 256 * 1024 * 1024):
+        self.model_path = os.path.expanduser(model_path)
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads or max(1, (os.cpu_count() or 2) // 2)
+        self.cache_bytes = cache_bytes
+        self._llm = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.model_path)
+
+    def load(self):
+        """Loads the model if needed (blocking, can take a few seconds)."""
+        with self._lock:
+            if self._llm is not None:
+                return self._llm
+            if self._closed:
+                raise RuntimeError(f"Local LLM {self.name} was replaced by a new configuration")
+            logger.info(f"Loading local LLM {self.name} ({self.n_threads} threads)...")
+            self._llm = llama_cpp.Llama(model_path=self.model_path, n_ctx=self.n_ctx,
+                                        n_threads=self.n_threads, verbose=False)
+            self._llm.set_cache(llama_cpp.LlamaRAMCache(capacity_bytes=self.cache_bytes))
+            logger.info("Local LLM loaded.")
+            return self._llm
+
+    def close(self):
+        """Frees the model; waits for a generation in progress to finish first."""
+        with self._lock:
+            llm, self._llm = self._llm, None
+            self._closed = True
+        if llm is not None:
+            close = getattr(llm, "close", None)
+            if close:
+                close()
+            logger.info(f"Local LLM {self.name} unloaded.")
+
+    def _messages(self, system_prompt, user_text):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_text}
+        ]
+
+    def complete(self, system_prompt: str, user_text: str, max_tokens: int = 1024) -> str:
+        llm = self.load()
+        with self._lock:
+            response = llm.create_chat_completion(messages=self._messages(system_prompt, user_text),
+                                                  max_tokens=max_tokens, temperature=0.2)
+        return response["choices"][0]["message"]["content"].strip()
+
+    def generate(self, system_prompt: str, user_text: str, max_tokens: int = 1024, stop_event=None):
+        """Yields completion chunks; stops early once stop_event is set."""
+        llm = self.load()
+        with self._lock:
+            for chunk in llm.create_chat_completion(messages=self._messages(system_prompt, user_text),
+                                                    max_tokens=max_tokens, temperature=0.2, stream=True):
+                if stop_event is not None and stop_event.is_set():
+                    break
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+
+    async def astream(self, system_prompt: str, user_text: str, max_tokens: int = 1024):
+        """
+        Async wrapper around generate(): tokens are produced on an executor thread
+        and handed to the event loop; cancelling the consumer stops generation
+        at the next token.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        stop_event = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.generate(system_prompt, user_text, max_tokens, stop_event):
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+                loop.call_soon_threadsafe(chunks.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+            if not producer.done():
+                # Don't leave an unretrieved result behind
+                producer.add_done_callback(lambda f: f.exception())
+
+    async def aprocess(self, system_prompt: str, user_text: str, max_tokens: int = 1024) -> str:
+        return await run_in_thread(self.complete, system_prompt, user_text, max_tokens)
+
+_models = {}
+_models_lock = threading.Lock()
+# get_local_llm() runs on every request; each problem is logged once per process
+_reported = set()
+
+def _report_once(log, message):
+    if message not in _reported:
+        _reported.add(message)
+        log(message)
+
+def get_local_llm(config):
+    """
+    Returns the shared LocalLLM for config.local_llm_model_path, or None when no
+    model is configured, the file is missing or llama-cpp-python isn't installed.
+    The model itself is only loaded on first use (or warm-up).
+    """
+    model_path = getattr(config, "local_llm_model_path", None)
+    if not model_path:
+        return None
+    if llama_cpp is None:
+        _report_once(logger.warning, "local_llm_model_path is set but llama-cpp-python is not installed "
+                                     "(pip install llama-cpp-python)")
+        return None
+    model_path = os.path.expanduser(model_path)
+    if not os.path.exists(model_path):
+        _report_once(logger.error, f"Local LLM model not found: {model_path}")
+        return None
+
+    key = (model_path, config.local_llm_context, config.local_llm_threads)
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+        model = LocalLLM(model_path, n_ctx=config.local_llm_context, n_threads=config.local_llm_threads)
+        # Only one model is configured at a time: free the one loaded for the previous
+        # path, context size or thread count instead of keeping gigabytes of weights around
+        replaced = list(_models.values())
+        _models.clear()
+        _models[key] = model
+    for old in replaced:
+        # close() waits for a generation in progress, so it doesn't hold up this caller
+        threading.Thread(target=old.close, name="vocalis-llm-close", daemon=True).start()
+    return model
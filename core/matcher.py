@@ -0,0 +1,247 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+def _fold(char: str) -> str:
+    lowered = char.lower()
+    return lowered if len(lowered) == 1 else char
+
+def fold_text(text: str) -> str:
+    """
+    Lowercases text without changing its length (e.g. 'İ'.lower() is 2 chars),
+    so positions in the folded text map 1:1 onto the original text.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(map(_fold, text))
+
+class _Matcher:
+    def sub(self, text: str, repl, gap=None) -> str:
+        """
+        Replaces every match in a single scan.
+        repl(payload, matched_text) returns the replacement string.
+        gap(segment), if given, transforms the unmatched text between matches.
+        """
+        parts = []
+        last = 0
+        for start, end, payload in self.finditer(text):
+            if start > last:
+                parts.append(gap(text[last:start]) if gap else text[last:start])
+            parts.append(repl(payload, text[start:end]))
+            last = end
+        if not parts:
+            return gap(text) if gap else text
+        if last < len(text):
+            parts.append(gap(text[last:]) if gap else text[last:])
+        return "".join(parts)
+
+class PhraseMatcher(_Matcher):
+    """
+    Case-insensitive phrase matcher compiled into a character trie.
+
+    Scanning is leftmost-longest: at each position the longest phrase starting
+    there wins, matched text is consumed and scanning resumes after it. The
+    cost of a scan depends on the text length and the longest phrase, not on
+    the number of phrases, so it stays flat for dictionaries with tens of
+    thousands of entries.
+    """
+    _END = ""  # Trie key holding the payload of a phrase that ends at this node
+
+    def __init__(self, phrases=()):
+        """
+        phrases: iterable of (phrase, payload). If the same phrase (ignoring case)
+        appears more than once, the first payload wins.
+        """
+        self._root = {}
+        self._size = 0
+        self.max_length = 0
+        for phrase, payload in phrases:
+            self.add(phrase, payload)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, phrase: str, payload) -> bool:
+        if not phrase:
+            return False
+        node = self._root
+        for char in fold_text(phrase):
+            node = node.setdefault(char, {})
+        if self._END in node:
+            return False
+        node[self._END] = payload
+        self._size += 1
+        self.max_length = max(self.max_length, len(phrase))
+        return True
+
+    def _longest(self, folded: str, start: int):
+        node = self._root
+        best = None
+        for i in range(start, len(folded)):
+            node = node.get(folded[i])
+            if node is None:
+                break
+            if self._END in node:
+                best = (i + 1, node[self._END])
+        return best
+
+    def find_all(self, text: str):
+        """Yields (start, end, payload) for every occurrence of every phrase, overlapping ones included."""
+        if not self._size or not text:
+            return
+        root = self._root
+        folded = fold_text(text)
+        length = len(folded)
+        for start in range(length):
+            node = root.get(folded[start])
+            end = start + 1
+            while node is not None:
+                if self._END in node:
+                    yield start, end, node[self._END]
+                if end == length:
+                    break
+                node = node.get(folded[end])
+                end += 1
+
+    def finditer(self, text: str):
+        """Yields (start, end, payload) for non-overlapping leftmost-longest matches."""
+        if not self._size or not text:
+            return
+        root = self._root
+        folded = fold_text(text)
+        i = 0
+        length = len(folded)
+        while i < length:
+            # Cheap first-character check before walking the trie
+            if folded[i] in root:
+                found = self._longest(folded, i)
+                if found:
+                    end, payload = found
+                    yield i, end, payload
+                    i = end
+                    continue
+            i += 1
+
+class PhraseScanner:
+    """
+    Leftmost-longest scan over text that arrives in pieces, e.g. the output of
+    an earlier rewrite while it is being produced. feed() returns the text
+    that is final so far; together with flush() the result is the same as
+    PhraseMatcher.sub over the whole text.
+
+    Only a phrase that could still grow past the end of the text seen so far
+    is held back, so at most the longest phrase is buffered.
+    """
+    def __init__(self, matcher: PhraseMatcher, repl):
+        self._root = matcher._root
+        self._end_key = matcher._END
+        self.repl = repl
+        self._text = ""
+        self._folded = ""
+
+    def feed(self, text: str) -> str:
+        self._text += text
+        self._folded += fold_text(text)
+        return self._scan(final=False)
+
+    def flush(self) -> str:
+        return self._scan(final=True)
+
+    def _scan(self, final):
+        text, folded, root = self._text, self._folded, self._root
+        parts = []
+        last = i = 0
+        length = len(folded)
+        while i < length:
+            if folded[i] in root:
+                found, open_ended = self._longest(folded, i)
+                if open_ended and not final:
+                    break # A longer phrase may follow in the next piece
+                if found:
+                    end, payload = found
+                    parts.append(text[last:i])
+                    parts.append(self.repl(payload, text[i:end]))
+                    last = i = end
+                    continue
+            i += 1
+        parts.append(text[last:i])
+        self._text, self._folded = text[i:], folded[i:]
+        return "".join(parts)
+
+    def _longest(self, folded: str, start: int):
+        """(end, payload) of the longest phrase at `start` (or None), and whether one could continue past the text."""
+        node = self._root
+        best = None
+        for i in range(start, len(folded)):
+            node = node.get(folded[i])
+            if node is None:
+                return best, False
+            if self._end_key in node:
+                best = (i + 1, node[self._end_key])
+        return best, len(node) > (self._end_key in node)
+
+class CompiledCache:
+    """
+    Holds an object compiled from one or more config fields (e.g. a PhraseMatcher
+    built from config.dictionary). It is rebuilt only when one of those fields
+    has changed, going by the per-field versions of the config snapshot.
+    """
+    def __init__(self, config_manager, fields, build):
+        self.config_manager = config_manager
+        self.fields = tuple(fields)
+        self.build = build
+        self._lock = threading.Lock()
+        self._value = None
+        self._stamp = None
+
+    def get(self):
+        config = self.config_manager.get()
+        stamp = tuple(config.changed_in(field) for field in self.fields)
+        with self._lock:
+            if self._value is None or stamp != self._stamp:
+                logger.info(f"Compiling {'/'.join(self.fields)} matcher...")
+                self._value = self.build(config)
+                self._stamp = stamp
+            return self._value
+
+class BackgroundCache(CompiledCache):
+    """
+    CompiledCache whose rebuilds run on a worker thread, for objects too slow
+    to build on the dictation path. get() never waits: it returns the last
+    built object (None before the first build is done) and starts a rebuild
+    when one of the fields has changed. Rebuilds also start right when the
+    config changes, if the config manager supports subscribe().
+    """
+    def __init__(self, config_manager, fields, build):
+        super().__init__(config_manager, fields, build)
+        self._building = None # Stamp of the build in progress
+        subscribe = getattr(config_manager, "subscribe", None)
+        if subscribe:
+            subscribe(lambda config, changed: self.get(), fields=self.fields)
+
+    def get(self):
+        config = self.config_manager.get()
+        stamp = tuple(config.changed_in(field) for field in self.fields)
+        with self._lock:
+            if stamp != self._stamp and stamp != self._building:
+                self._building = stamp
+                threading.Thread(target=self._rebuild, args=(config, stamp),
+                                 name="vocalis-compile", daemon=True).start()
+            return self._value
+
+    def _rebuild(self, config, stamp):
+        logger.info(f"Compiling {'/'.join(self.fields)} matcher in the background...")
+        try:
+            value = self.build(config)
+        except Exception as e:
+            logger.error(f"Compiling {'/'.join(self.fields)} matcher failed: {e}")
+            value = None
+        with self._lock:
+            if self._building == stamp:
+                self._building = None
+            # A build started later may have finished first; never go back to older fields
+            if self._stamp is None or all(new >= old for new, old in zip(stamp, self._stamp)):
+                self._value = value
+                self._stamp = stamp
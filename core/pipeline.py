@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class AsyncRunner:
+    """
+    Owns the asyncio event loop the dictation pipeline runs on, in a background
+    thread so the GUI thread never blocks. Blocking work (audio capture, local
+    decoding, typing) goes to the runner's executor via run_in_thread().
+    """
+    def __init__(self, max_workers: int = 4):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vocalis-worker")
+        self.loop.set_default_executor(self.executor)
+        self._thread = threading.Thread(target=self._run, name="vocalis-pipeline", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+async def run_in_thread(func, *args, cleanup=None):
+    """
+    Runs a blocking call in the loop's executor and awaits it.
+
+    A running thread can't be interrupted, so when the awaiting task is
+    cancelled the call is left to finish on its own (callers make it return
+    early through a stop flag or event) and `cleanup(result)` is invoked on
+    whatever it eventually returns, e.g. to delete a temp file.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if cleanup:
+            def _discard(done):
+                if not done.cancelled() and done.exception() is None:
+                    try:
+                        cleanup(done.result())
+                    except Exception as e:
+                        logger.debug(f"Cleanup after cancel failed: {e}")
+            future.add_done_callback(_discard)
+        raise
+
+class LatencyBudget:
+    """
+    A mode's latency budget, counted from the end of recording, split across the
+    stages that follow it. Each stage may run until its cumulative share of the
+    budget is used up, so time saved by an early stage carries over to later ones.
+    """
+    STAGE_SHARES = {"transcribe": 0.5, "prompt": 0.5}
+
+    def __init__(self, total: float, shares: dict = None):
+        self.total = total
+        self.shares = shares or self.STAGE_SHARES
+        self.started = time.monotonic()
+
+    def remaining(self, stage: str):
+        """Seconds the stage may still take, or None for an unlimited budget."""
+        if not self.total:
+            return None
+        cutoff = 0.0
+        for name, share in self.shares.items():
+            cutoff += share
+            if name == stage:
+                break
+        return max(0.0, self.started + self.total * cutoff - time.monotonic())
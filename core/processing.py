@@ -1,22 +1,30 @@
 import logging
 from core.dictionary import DictionaryManager
 from core.snippets import SnippetManager
+from core.rewrite import RewriteEngine
+from core.tracing import span
 
 logger = logging.getLogger(__name__)
 
+async def _once(text):
+    yield text
+
 class TextProcessor:
     def __init__(self, config_manager, prompt_engine):
         self.config_manager = config_manager
         self.prompt_engine = prompt_engine
         self.dictionary_manager = DictionaryManager(config_manager)
         self.snippet_manager = SnippetManager(config_manager)
+        self.rewrite_engine = RewriteEngine(self.dictionary_manager, self.snippet_manager)
 
-    def process(self, text: str, mode_data: dict) -> str:
+    async def process(self, text: str, mode_data: dict, trace=None, timeout=None) -> str:
         """
         Runs the full text processing pipeline:
         1. AI Prompt (if configured)
         2. Personal Dictionary (Replacements)
         3. Snippets (Expansion)
+        Each stage is recorded as a span on `trace` when one is given.
+        `timeout` is the AI prompt's share of the mode's latency budget.
         """
         processed_text = text
         
@@ -24,19 +32,63 @@ class TextProcessor:
         prompt_id = mode_data.get("prompt_id")
         if prompt_id:
             logger.info(f"Applying AI Prompt: {prompt_id}")
-            processed_text = self.prompt_engine.process(processed_text, prompt_id)
+            with span(trace, "text.prompt", prompt_id=prompt_id):
+                processed_text = await self.prompt_engine.process(processed_text, prompt_id, trace=trace, timeout=timeout)
             
-        # 2. Dictionary
+        # 2 + 3. Dictionary and Snippets, fused into one scan
         # We perform dictionary replacements *after* AI, assuming AI fixes grammar 
         # but might mishandle specific proper nouns if not context-aware. 
-        # Or should we do it before? Doing it after ensures our custom terms override AI output.
-        logger.info("Applying Personal Dictionary...")
-        processed_text = self.dictionary_manager.apply(processed_text)
-        
-        # 3. Snippets
+        # Doing it after ensures our custom terms override AI output.
         # Snippets should definitely be last, as they expand into formatted text 
-        # that shouldn't be altered by AI.
-        logger.info("Checking for Snippets...")
-        processed_text = self.snippet_manager.process(processed_text)
+        # that shouldn't be altered by AI. Snippet triggers see the dictionary's output.
+        logger.info("Applying Personal Dictionary and Snippets...")
+        with span(trace, "text.rewrite"):
+            processed_text = self.rewrite_engine.apply(processed_text)
         
         return processed_text
+
+    async def process_stream(self, text: str, mode_data: dict, on_output, trace=None, timeout=None) -> str:
+        """
+        Streaming variant of process(): AI output is rewritten (dictionary +
+        snippets) incrementally and handed to the coroutine on_output(piece) as
+        soon as it is final. Returns the complete processed text.
+        """
+        prompt_id = mode_data.get("prompt_id")
+        if prompt_id:
+            logger.info(f"Streaming AI Prompt: {prompt_id}")
+            chunks = self.prompt_engine.stream(text, prompt_id, trace=trace, timeout=timeout)
+        else:
+            chunks = _once(text)
+
+        rewriter = self.rewrite_engine.stream()
+        output = []
+        # Whitespace is held back until more text follows, so a trailing
+        # newline from the model is never typed (process() strips it too)
+        pending_space = ""
+
+        async def emit(piece):
+            nonlocal pending_space
+            if not output:
+                piece = piece.lstrip()
+            body = piece.rstrip()
+            if not body:
+                pending_space += piece
+                return
+            body = pending_space + body
+            pending_space = piece[len(piece.rstrip()):]
+            if not output and trace:
+                trace.add_span("output.first_char", started, trace.now())
+            output.append(body)
+            await on_output(body)
+
+        started = trace.now() if trace else None
+        with span(trace, "text.prompt_stream", prompt_id=prompt_id):
+            first = True
+            async for chunk in chunks:
+                if first and trace:
+                    trace.add_span("text.first_token", started, trace.now())
+                first = False
+                await emit(rewriter.feed(chunk))
+            await emit(rewriter.flush())
+
+        return "".join(output)
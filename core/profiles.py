@@ -1,19 +1,138 @@
 import logging
+import re
 import subprocess
 import shutil
 import sys
+from collections import namedtuple
+from core.matcher import CompiledCache, PhraseMatcher
+from core.x11 import get_window_tracker
 
 logger = logging.getLogger(__name__)
 
+FIELDS = ("title", "class")
+
+# field: "title", "class" or None (either); priority: higher wins; order: position in config.app_profiles
+ProfileRule = namedtuple("ProfileRule", ["rule", "mode_id", "field", "pattern", "is_regex", "priority", "order"])
+
+def parse_rule(rule: str, value, order: int = 0) -> ProfileRule:
+    """
+    Parses one config.app_profiles entry. The rule is a case-insensitive
+    substring of the window title or class, optionally prefixed with
+    "title:" or "class:" to match only that field, then "re:" for a regular
+    expression (e.g. "class:re:^(code|codium)$"). The value is a mode id, or
+    a table {mode = "...", priority = N} to outrank other matching rules.
+    """
+    if isinstance(value, dict):
+        mode_id, priority = value.get("mode"), int(value.get("priority", 0))
+    else:
+        mode_id, priority = value, 0
+    field, pattern = None, rule
+    for name in FIELDS:
+        if pattern.lower().startswith(name + ":"):
+            field, pattern = name, pattern[len(name) + 1:]
+            break
+    is_regex = pattern.lower().startswith("re:")
+    if is_regex:
+        pattern = pattern[3:]
+    return ProfileRule(rule, mode_id, field, pattern, is_regex, priority, order)
+
+class ProfileIndex:
+    """
+    config.app_profiles compiled for lookup. Title and class each get a
+    PhraseMatcher over all their literal rules and one combined regex that
+    pre-filters their regex rules, so a lookup scans each field once however
+    many rules there are.
+
+    When several rules match, the highest priority wins, then the rule that
+    matched the longest text (the most specific one, e.g. "visual studio code"
+    over "code"), then the one listed first.
+    """
+    def __init__(self, profiles: dict):
+        rules = []
+        for order, (rule, value) in enumerate((profiles or {}).items()):
+            parsed = parse_rule(rule, value, order)
+            if not parsed.pattern or not parsed.mode_id:
+                continue
+            if parsed.is_regex:
+                try:
+                    parsed = parsed._replace(pattern=re.compile(parsed.pattern, re.IGNORECASE))
+                except re.error as e:
+                    logger.warning(f"Ignoring app profile '{rule}': invalid regex: {e}")
+                    continue
+            rules.append(parsed)
+        self.size = len(rules)
+
+        # Best rule first, so when two rules share a phrase the better one is kept
+        rules.sort(key=lambda r: (-r.priority, r.order))
+        self._literals = {}
+        self._regexes = {}
+        for field in FIELDS:
+            applicable = [r for r in rules if r.field in (None, field)]
+            self._literals[field] = PhraseMatcher((r.pattern, r) for r in applicable if not r.is_regex)
+            regexes = [r for r in applicable if r.is_regex]
+            self._regexes[field] = (self._combine(regexes), regexes)
+
+    @staticmethod
+    def _combine(regexes):
+        if not regexes:
+            return None
+        try:
+            return re.compile("|".join(f"(?:{r.pattern.pattern})" for r in regexes), re.IGNORECASE)
+        except re.error:
+            # e.g. numbered backreferences shift once the patterns are joined; test each one instead
+            return None
+
+    def match(self, title: str, wm_class: str = None):
+        """
+        Returns the best matching ProfileRule, or None. With wm_class None the
+        title is a single identifier of unknown kind (from a fallback detector)
+        and is matched as both title and class.
+        """
+        if wm_class is None:
+            wm_class = title
+        best = None
+        for field, text in (("title", title), ("class", wm_class)):
+            if not text:
+                continue
+            for start, end, rule in self._literals[field].find_all(text):
+                best = self._better(best, rule, end - start)
+            combined, regexes = self._regexes[field]
+            if combined is not None and not combined.search(text):
+                continue
+            for rule in regexes:
+                found = rule.pattern.search(text)
+                if found:
+                    best = self._better(best, rule, found.end() - found.start())
+        return best[1] if best else None
+
+    @staticmethod
+    def _better(best, rule, length):
+        rank = (rule.priority, length, -rule.order)
+        return (rank, rule) if best is None or rank > best[0] else best
+
 class ProfileManager:
     def __init__(self, config_manager):
         self.config_manager = config_manager
+        # On X11 the focused window is tracked in the background, so lookups spawn nothing
+        self.tracker = get_window_tracker()
+        self._index = CompiledCache(config_manager, ["app_profiles"], lambda config: ProfileIndex(config.app_profiles))
+        self._gdbus_refused = False # GNOME Shell won't Eval (or isn't running); don't ask again
+
+    def active_window(self):
+        """The focused window (id, title, wm_class) as tracked on X11, or None."""
+        return self.tracker.current() if self.tracker else None
 
     def detect_active_app(self) -> str:
         """
         Attempts to detect the active application/window title.
         Returns a lowercase string identifier or None.
         """
+        window = self.active_window()
+        if window is not None:
+            # Title first, then class (often better for identifying apps like 'code')
+            return (window.title or window.wm_class).lower() or None
+
+        # No tracker (macOS, Wayland) or it hasn't seen a window yet: ask the system
         if sys.platform == "darwin":
              try:
                  script = 'tell application "System Events" to get name of first application process whose frontmost is true'
@@ -49,12 +168,10 @@ class ProfileManager:
             except Exception:
                 pass
 
-            except Exception:
-                pass
-
         # 3. GNOME Shell Wayland (try gdbus)
-        # Requires 'unsafe-mode' often, but worth a try for some setups
-        if shutil.which("gdbus"):
+        # Eval needs 'unsafe-mode' on GNOME 41+; once the shell refuses (or isn't
+        # there), gdbus is not started again on every dictation
+        if not self._gdbus_refused and shutil.which("gdbus"):
             try:
                 # Returns (true, 'Code') or similar
                 cmd = "global.display.focus_window ? global.display.focus_window.get_wm_class() : ''"
@@ -68,40 +185,34 @@ class ProfileManager:
                     parts = res.stdout.split("'")
                     if len(parts) >= 2:
                         return parts[1].lower()
-            except Exception:
-                pass
-
-        # 4. KDE Plasma (try qdbus)
-        if shutil.which("qdbus"):
-            try:
-                res = subprocess.run(
-                    ["qdbus", "org.kde.KWin", "/KWin", "org.kde.KWin.activeWindow"],
-                    capture_output=True, text=True, check=False
-                )
-                # Returns window ID, we'd need to query it. Complex. 
-                # Simpler: org.kde.KWin /Scripting org.kde.KWin.Scripting.loadScript ...
-                pass
+                else:
+                    logger.info("GNOME Shell doesn't report the focused window; app profiles need X11 here")
+                    self._gdbus_refused = True
             except Exception:
                 pass
 
         return None
 
-    def get_profile(self, app_identifier: str):
+    def detect_window(self):
         """
-        Checks if the detected app identifier matches any configured rules.
-        Returns the mode_id or None.
+        Returns (title, wm_class) of the focused window. wm_class is None when
+        only a single identifier could be detected (see detect_active_app).
         """
-        if not app_identifier:
-            return None
+        window = self.active_window()
+        if window is not None and (window.title or window.wm_class):
+            return window.title, window.wm_class
+        return self.detect_active_app(), None
 
-        config = self.config_manager.get()
-        if not config.app_profiles:
-            return None
+    def get_index(self) -> ProfileIndex:
+        """Returns the rule index compiled from config.app_profiles (rebuilt when it changes)."""
+        return self._index.get()
 
-        # profiles is Dict[rule_string, mode_id]
-        # We check if rule_string is in app_identifier
-        for rule, mode_id in config.app_profiles.items():
-            if rule.lower() in app_identifier:
-                return mode_id
-        
-        return None
+    def get_profile(self, title: str, wm_class: str = None):
+        """
+        Checks if the window (title, class) matches any configured rules.
+        Returns the mode_id or None.
+        """
+        if not title and not wm_class:
+            return None
+        rule = self.get_index().match(title or "", wm_class)
+        return rule.mode_id if rule else None
@@ -1,16 +1,30 @@
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-from core.llm import LLMClient
+from core.llm import LLMClientPool
+from core.llm_cache import LLMResponseCache
+from core.llm_router import LLMRouter
 from core.context import ContextManager
+from core.cleaner import TextCleaner
+from core.pipeline import run_in_thread
 
 class PromptEngine:
     def __init__(self, config_manager):
         self.config_manager = config_manager
         self.context_manager = ContextManager(config_manager)
+        self.client_pool = LLMClientPool()
+        self.router = LLMRouter(self.client_pool)
+        self.cleaner = TextCleaner()
+        self._response_cache = None
 
-    def process(self, text: str, prompt_id: str) -> str:
+    async def process(self, text: str, prompt_id: str, trace=None, timeout=None, clean_locally=None) -> str:
+        """
+        Applies the prompt to text. If the LLM doesn't answer within `timeout`
+        seconds the raw transcript is returned instead (recorded on the trace).
+        `clean_locally` passes on a fast-path decision already made by stream().
+        """
         config = self.config_manager.get()
         prompts = config.prompts
         
@@ -18,35 +32,37 @@ class PromptEngine:
             return text
         
         prompt_data = prompts[prompt_id]
-        
-        # Determine template content
-        if isinstance(prompt_data, dict):
-            template = prompt_data.get("template", "{text}")
-            system_prompt = prompt_data.get("system_prompt", "You are a helpful assistant.")
-        else:
-             # If dataclass (future proofing)
-            template = getattr(prompt_data, "template", "{text}")
-            system_prompt = getattr(prompt_data, "system_prompt", "You are a helpful assistant.")
-            
+        template, system_prompt = self._prepare(prompt_data)
         logger.info(f"Applying prompt '{prompt_id}'")
-        
-        # Context Substitution
-        if "{clipboard}" in template:
-            clipboard_content = self.context_manager.get_clipboard()
-            template = template.replace("{clipboard}", clipboard_content)
 
         # Check if we should use AI
-        # If we have an API key, we should use the LLM for prompts that require intelligence.
-        # This enables "Hybrid Mode": Local Whisper for transcription + OpenAI/Groq for processing.
-        use_llm = bool(config.api_key and config.api_key.strip())
+        use_llm = self._uses_llm(config)
+
+        if clean_locally is None:
+            clean_locally = self._clean_locally(config, prompt_id, text, use_llm, trace)
+        if clean_locally:
+            return template.replace("{text}", self.cleaner.clean(text))
         
         if use_llm:
             try:
                 # Prepare the user message part
                 user_content = template.replace("{text}", text)
                 
-                client = LLMClient(config)
-                return client.process(system_prompt, user_content)
+                cache, cache_key = self._cache_lookup(config, prompt_data, system_prompt, user_content)
+                if cache_key:
+                    cached = await run_in_thread(cache.get, cache_key)
+                    if cached is not None:
+                        logger.info(f"LLM cache hit for prompt '{prompt_id}'")
+                        return cached
+
+                result = await asyncio.wait_for(
+                    self.router.process(config, system_prompt, user_content, trace=trace), timeout
+                )
+                if cache_key:
+                    await run_in_thread(cache.put, cache_key, result)
+                return result
+            except asyncio.TimeoutError:
+                return self._over_budget(prompt_id, text, timeout, trace)
             except Exception as e:
                 logger.error(f"AI Prompting failed: {e}")
                 # Fallback to simple replace
@@ -66,5 +82,168 @@ class PromptEngine:
                 logger.error(f"Prompt processing failed: {e}")
                 return text
 
+    async def stream(self, text: str, prompt_id: str, trace=None, timeout=None):
+        """
+        Like process(), but yields the LLM output in chunks as tokens arrive.
+        Prompts that don't go to the LLM yield their complete result once.
+        `timeout` bounds the wait for the first token.
+        """
+        config = self.config_manager.get()
+        prompts = config.prompts
+
+        if not prompt_id or prompt_id not in prompts:
+            yield text
+            return
+
+        use_llm = self._uses_llm(config)
+        clean_locally = self._clean_locally(config, prompt_id, text, use_llm, trace)
+        if not use_llm or clean_locally:
+            yield await self.process(text, prompt_id, trace=trace, timeout=timeout, clean_locally=clean_locally)
+            return
+
+        prompt_data = prompts[prompt_id]
+        template, system_prompt = self._prepare(prompt_data)
+        logger.info(f"Streaming prompt '{prompt_id}'")
+        user_content = template.replace("{text}", text)
+
+        started = False
+        try:
+            cache, cache_key = self._cache_lookup(config, prompt_data, system_prompt, user_content)
+            if cache_key:
+                cached = await run_in_thread(cache.get, cache_key)
+                if cached is not None:
+                    logger.info(f"LLM cache hit for prompt '{prompt_id}'")
+                    yield cached
+                    return
+
+            stream = self.router.stream(config, system_prompt, user_content, trace=trace)
+            try:
+                first = await asyncio.wait_for(anext(stream), timeout)
+            except StopAsyncIteration:
+                first = ""
+            except asyncio.TimeoutError:
+                await stream.aclose()
+                yield self._over_budget(prompt_id, text, timeout, trace)
+                return
+
+            started = True
+            chunks = [first]
+            yield first
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+            if cache_key:
+                await run_in_thread(cache.put, cache_key, "".join(chunks).strip())
+        except Exception as e:
+            logger.error(f"AI Prompting failed: {e}")
+            # Text already emitted can't be taken back; otherwise fall back to simple replace
+            if not started:
+                yield user_content
+
+    def _over_budget(self, prompt_id, text, timeout, trace):
+        logger.warning(f"Prompt '{prompt_id}' exceeded its {timeout:.1f}s budget, using the raw transcript")
+        if trace:
+            trace.degrade("prompt", "raw_transcript", reason=f"no answer within {timeout:.1f}s")
+        return text
+
+    def _fields(self, prompt_data):
+        """Returns the raw (template, system_prompt) of a prompt."""
+        if isinstance(prompt_data, dict):
+            template = prompt_data.get("template", "{text}")
+            system_prompt = prompt_data.get("system_prompt", "You are a helpful assistant.")
+        else:
+             # If dataclass (future proofing)
+            template = getattr(prompt_data, "template", "{text}")
+            system_prompt = getattr(prompt_data, "system_prompt", "You are a helpful assistant.")
+        return template, system_prompt
+
+    def _prepare(self, prompt_data):
+        """Returns (template, system_prompt) with context placeholders filled in."""
+        template, system_prompt = self._fields(prompt_data)
+
+        # Context Substitution
+        if "{clipboard}" in template:
+            clipboard_content = self.context_manager.get_clipboard()
+            template = template.replace("{clipboard}", clipboard_content)
+
+        return template, system_prompt
+
+    def _cache_lookup(self, config, prompt_data, system_prompt, user_content):
+        """
+        Returns (cache, key) for this request, or (None, None) when caching is
+        disabled globally or for this prompt (prompt "cache": false).
+        Raced requests are keyed on the primary provider; any winner's answer is reused.
+        """
+        if not getattr(config, "llm_cache_enabled", True):
+            return None, None
+        clients = self.router.clients(config)
+        if not clients:
+            return None, None
+        client = clients[0]
+        if isinstance(prompt_data, dict):
+            allowed = prompt_data.get("cache", True)
+        else:
+            allowed = getattr(prompt_data, "cache", True)
+        if not allowed:
+            return None, None
+
+        cache = self.get_response_cache()
+        cache.ttl_seconds = getattr(config, "llm_cache_ttl_hours", 168) * 3600
+        cache.max_entries = getattr(config, "llm_cache_max_entries", 500)
+        key = cache.make_key(client.provider, client.get_default_model(), system_prompt, user_content)
+        return cache, key
+
+    def get_response_cache(self) -> LLMResponseCache:
+        if self._response_cache is None:
+            self._response_cache = LLMResponseCache()
+        return self._response_cache
+
+    def _clean_locally(self, config, prompt_id, text, use_llm, trace=None) -> bool:
+        """
+        Whether the "clean" prompt is served by the rule-based cleaner instead of
+        the LLM: always when no LLM is available, otherwise unless the complexity
+        heuristic asks for escalation (long or self-correcting utterances).
+        """
+        if prompt_id != "clean" or not getattr(config, "clean_fast_path", True):
+            return False
+        reason = self.cleaner.escalation_reason(text, getattr(config, "clean_max_words", 40)) if use_llm else None
+        if reason:
+            logger.info(f"Clean prompt escalated to the LLM ({reason})")
+        else:
+            logger.info("Clean prompt handled by local rules")
+        if trace:
+            trace.set("clean_path", "llm" if reason else "rules")
+        return reason is None
+
+    def _uses_llm(self, config) -> bool:
+        # If we have an API key, we should use the LLM for prompts that require intelligence.
+        # This enables "Hybrid Mode": Local Whisper for transcription + OpenAI/Groq for processing.
+        if config.api_key and config.api_key.strip():
+            return True
+        # Explicitly configured LLM providers may bring their own keys; a local model needs none
+        return bool(config.llm_providers or config.local_llm_model_path) and bool(self.router.clients(config))
+
+    async def prewarm(self, prompt_id: str):
+        """
+        Called when recording starts, to get this prompt's inputs ready while the
+        user is still speaking: a clipboard snapshot if the template uses {clipboard},
+        and, if the prompt will go to the LLM, connected pooled clients.
+        """
+        config = self.config_manager.get()
+        if not prompt_id or prompt_id not in (config.prompts or {}):
+            return
+        tasks = []
+        template, _ = self._fields(config.prompts[prompt_id])
+        if "{clipboard}" in template:
+            tasks.append(run_in_thread(self.context_manager.capture_clipboard))
+        if self._uses_llm(config):
+            api_keys = config.llm_api_keys or {}
+            # Warm every racer: a hedged request may go to any of them
+            tasks.extend(
+                self.client_pool.prewarm(config, provider, api_keys.get(provider))
+                for provider in config.llm_providers or [None]
+            )
+        await asyncio.gather(*tasks)
+
     def update_prompts(self, new_prompts: dict):
         self.prompts = new_prompts
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Throttling / overload responses worth retrying
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+# Responses that mean "slow down" and count towards opening the circuit
+THROTTLE_STATUS = {429, 503, 529}
+
+# (limit, remaining, reset) header triples: OpenAI-compatible providers, then Anthropic
+LIMIT_HEADERS = [
+    ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+    ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+    ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+]
+
+# How often a request held back by an exhausted bucket re-checks it
+BUCKET_POLL = 0.05
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+class RateLimited(Exception):
+    """The provider is throttling us (retries exhausted or circuit open); use another path."""
+    def __init__(self, provider: str, retry_after: float = None):
+        self.provider = provider
+        self.retry_after = retry_after
+        hint = f", retry in {retry_after:.1f}s" if retry_after else ""
+        super().__init__(f"{provider} is rate limiting requests{hint}")
+
+def parse_reset(value: str):
+    """
+    Seconds until a rate-limit window resets. Accepts OpenAI-style durations
+    ("1s", "6m0s", "20ms"), plain seconds and RFC 3339 / HTTP dates.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def parse_retry_after(headers) -> float:
+    if not headers:
+        return None
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+    return parse_reset(headers.get("retry-after"))
+
+class TokenBucket:
+    """
+    A provider's request allowance as last reported by its rate-limit headers.
+    Requests made since the last report are subtracted locally, so a burst
+    doesn't overrun the limit before the next response comes back, and once
+    the window resets the bucket refills to the advertised limit.
+    """
+    def __init__(self):
+        self.limit = None
+        self.remaining = None  # None = unknown, don't hold requests back
+        self.reset_at = None
+        self.refilled_at = 0.0
+
+    def update(self, headers):
+        now = time.monotonic()
+        found = None
+        for limit_header, remaining_header, reset_header in LIMIT_HEADERS:
+            try:
+                remaining = int(float(headers.get(remaining_header)))
+            except (TypeError, ValueError):
+                continue
+            try:
+                limit = int(float(headers.get(limit_header)))
+            except (TypeError, ValueError):
+                limit = None
+            reset = parse_reset(headers.get(reset_header)) or 0.0
+            # The tightest window decides
+            if found is None or remaining < found[1]:
+                found = (limit, remaining, now + reset)
+        if found is None:
+            return
+        limit, remaining, reset_at = found
+        in_window = self.remaining is not None and (self.reset_at is None or now < self.reset_at)
+        if in_window:
+            # The report doesn't know about requests still in flight
+            remaining = min(remaining, self.remaining)
+        self.limit, self.remaining, self.reset_at = limit, remaining, reset_at
+
+    def wait_time(self) -> float:
+        """Seconds until a request may be sent (0 = now)."""
+        if self.remaining is None or self.remaining > 0:
+            return 0.0
+        now = time.monotonic()
+        if self.reset_at is None:
+            if now - self.refilled_at < 1.0:
+                # Refilled allowance already used up, wait for a response to report back
+                return BUCKET_POLL
+        elif now < self.reset_at:
+            return self.reset_at - now
+        elif self.limit:
+            # Window is over: refill; the next response brings the real numbers
+            self.remaining, self.reset_at, self.refilled_at = self.limit, None, now
+            return 0.0
+        self.remaining = None
+        return 0.0
+
+    def consume(self):
+        if self.remaining is not None:
+            self.remaining -= 1
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive requests that stayed throttled through
+    their retries (or one with a long Retry-After) and rejects requests until the cooldown ends. Then a single
+    probe request is let through; its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.open_until or self.probing
+
+    def allow(self) -> bool:
+        if time.monotonic() < self.open_until or self.probing:
+            return False
+        if self.failures >= self.threshold:
+            self.probing = True  # Half-open: this request is the probe
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.probing = False
+
+    def record_throttle(self, retry_after: float = None):
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.threshold or (retry_after or 0) > self.cooldown:
+            self.open_until = time.monotonic() + max(self.cooldown, retry_after or 0)
+            self.failures = max(self.failures, self.threshold)
+
+class RateLimiter:
+    """
+    Schedules remote ASR and LLM requests per provider: holds requests back when
+    the provider's bucket is empty, retries throttled ones with jittered
+    exponential backoff (or the server's Retry-After) and opens a circuit
+    breaker when a provider keeps throttling, so callers can fall back to
+    local processing. Buckets are fed by observe(), hooked into the SDKs'
+    HTTP clients (see http_event_hooks).
+    """
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, max_wait: float = 10.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, provider) -> TokenBucket:
+        with self._lock:
+            return self._buckets.setdefault(provider, TokenBucket())
+
+    def breaker(self, provider) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(provider, CircuitBreaker())
+
+    def available(self, provider) -> bool:
+        """False while the provider's circuit is open."""
+        return not self.breaker(provider).is_open
+
+    def observe(self, provider, status: int, headers):
+        self.bucket(provider).update(headers)
+        if status in THROTTLE_STATUS:
+            logger.warning(f"{provider} responded {status} (throttled)")
+
+    async def call(self, provider, request):
+        """
+        Awaits request() (a zero-argument coroutine function) under the provider's
+        limits. Raises RateLimited when the provider won't take it in time.
+        """
+        breaker = self.breaker(provider)
+        bucket = self.bucket(provider)
+        # Asked once per call: a half-open probe keeps its slot through its own retries
+        if not breaker.allow():
+            raise RateLimited(provider, breaker.open_until - time.monotonic())
+        for attempt in range(self.max_retries + 1):
+            if attempt and time.monotonic() < breaker.open_until:
+                # Opened by another request while this one was backing off
+                raise RateLimited(provider, breaker.open_until - time.monotonic())
+
+            await self._wait_for_bucket(provider, bucket, breaker)
+            bucket.consume()
+
+            try:
+                result = await request()
+            except asyncio.CancelledError:
+                breaker.probing = False
+                raise
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                if status not in RETRYABLE_STATUS:
+                    breaker.probing = False
+                    raise
+                retry_after = parse_retry_after(getattr(getattr(e, "response", None), "headers", None))
+                throttled = status in THROTTLE_STATUS
+                if attempt == self.max_retries or (retry_after or 0) > self.max_wait:
+                    if throttled:
+                        breaker.record_throttle(retry_after)
+                    else:
+                        breaker.probing = False
+                    raise RateLimited(provider, retry_after) from e
+
+                if retry_after is not None:
+                    # Honour the server, with a little jitter so clients sharing a key don't stampede
+                    delay = retry_after + random.uniform(0, min(1.0, retry_after * 0.1 + 0.05))
+                else:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logger.info(f"{provider} returned {status}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
+
+    async def _wait_for_bucket(self, provider, bucket, breaker):
+        deadline = time.monotonic() + self.max_wait
+        wait = bucket.wait_time()
+        if wait > self.max_wait:
+            breaker.record_throttle(wait)
+            raise RateLimited(provider, wait)
+        if wait:
+            logger.info(f"{provider} request budget exhausted, waiting {wait:.2f}s")
+        while wait:
+            if time.monotonic() + wait > deadline:
+                breaker.probing = False
+                raise RateLimited(provider, wait)
+            await asyncio.sleep(wait)
+            wait = bucket.wait_time()
+
+_rate_limiter = RateLimiter()
+
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide limiter shared by transcription and LLM clients."""
+    return _rate_limiter
+
+def http_event_hooks(provider):
+    """httpx event hooks that feed every response's rate-limit headers to the limiter."""
+    async def on_response(response):
+        _rate_limiter.observe(provider, response.status_code, response.headers)
+    return {"response": [on_response]}
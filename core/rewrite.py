@@ -0,0 +1,159 @@
+import logging
+import threading
+from core.matcher import PhraseScanner
+
+logger = logging.getLogger(__name__)
+
+class RewriteMatcher:
+    """
+    The personal dictionary and the snippet triggers compiled together, applied
+    in a single scan over the text.
+
+    The scan walks the text with the dictionary trie, and everything it
+    produces (replacements and the text between them, after fuzzy matching)
+    is fed straight into an online snippet scan (PhraseScanner). Snippet
+    triggers therefore match the dictionary's output, exactly as if the
+    dictionary had been applied first, without building the intermediate
+    text: with github -> GitHub, the trigger "my github" still fires, and
+    with sig -> signature, "sig" reaches the "signature" snippet.
+    """
+    def __init__(self, dictionary, snippets):
+        self.dictionary = dictionary
+        self.snippets = snippets
+
+    def __len__(self):
+        return len(self.dictionary) + len(self.snippets)
+
+    def sub(self, text: str, expand, fuzzy=None) -> str:
+        """
+        expand(snippet, matched_text) returns a snippet's expansion; fuzzy(segment),
+        if given, rewrites near-miss dictionary phrases in text no exact phrase matched.
+        """
+        scanner = PhraseScanner(self.snippets, expand) if len(self.snippets) else None
+        parts = []
+        for piece in self._dictionary_pieces(text, fuzzy):
+            parts.append(scanner.feed(piece) if scanner else piece)
+        if scanner:
+            parts.append(scanner.flush())
+        return "".join(parts)
+
+    def stream(self, expand, fuzzy=None) -> "StreamRewriter":
+        dictionary = None
+        if len(self.dictionary) or fuzzy:
+            dictionary = StreamStage(self.dictionary, lambda replacement, _matched: replacement, gap=fuzzy)
+        scanner = PhraseScanner(self.snippets, expand) if len(self.snippets) else None
+        return StreamRewriter(dictionary, scanner)
+
+    def _dictionary_pieces(self, text, fuzzy):
+        last = 0
+        for start, end, replacement in self.dictionary.finditer(text):
+            if start > last:
+                yield fuzzy(text[last:start]) if fuzzy else text[last:start]
+            yield replacement
+            last = end
+        if last < len(text):
+            yield fuzzy(text[last:]) if fuzzy else text[last:]
+
+class RewriteEngine:
+    """
+    Applies personal dictionary replacements and snippet expansion with one
+    RewriteMatcher. It reuses the managers' compiled matchers, so it is only
+    rebuilt when the dictionary or the snippets change, and one engine is
+    shared by every mode.
+    """
+    def __init__(self, dictionary_manager, snippet_manager):
+        self.dictionary_manager = dictionary_manager
+        self.snippet_manager = snippet_manager
+        self._lock = threading.Lock()
+        self._matcher = None
+
+    def get_matcher(self) -> RewriteMatcher:
+        dictionary = self.dictionary_manager.get_matcher()
+        snippets = self.snippet_manager.get_matcher()
+        with self._lock:
+            matcher = self._matcher
+            if matcher is None or matcher.dictionary is not dictionary or matcher.snippets is not snippets:
+                matcher = self._matcher = RewriteMatcher(dictionary, snippets)
+            return matcher
+
+    def apply(self, text: str) -> str:
+        if not text:
+            return text
+        matcher = self.get_matcher()
+        fuzzy = self.dictionary_manager.get_fuzzy_index()
+        if not len(matcher) and not fuzzy:
+            return text
+        # Snippet placeholders are evaluated once per call
+        return matcher.sub(text, self.snippet_manager.new_expander(), fuzzy=fuzzy.apply if fuzzy else None)
+
+    def stream(self) -> "StreamRewriter":
+        """Returns a StreamRewriter for one utterance."""
+        fuzzy = self.dictionary_manager.get_fuzzy_index()
+        return self.get_matcher().stream(self.snippet_manager.new_expander(), fuzzy=fuzzy.apply if fuzzy else None)
+
+class StreamRewriter:
+    """Incremental version of RewriteEngine.apply: a dictionary StreamStage feeding a snippet PhraseScanner."""
+    def __init__(self, dictionary, snippets):
+        self.dictionary = dictionary
+        self.snippets = snippets
+
+    def feed(self, chunk: str) -> str:
+        if self.dictionary:
+            chunk = self.dictionary.feed(chunk)
+        return self.snippets.feed(chunk) if self.snippets else chunk
+
+    def flush(self) -> str:
+        text = self.dictionary.flush() if self.dictionary else ""
+        if self.snippets:
+            text = self.snippets.feed(text) + self.snippets.flush()
+        return text
+
+class StreamStage:
+    """
+    The dictionary pass over text that arrives in chunks (e.g. streamed LLM
+    tokens).
+
+    Text is only released once no rule could still match across it: anything
+    within the longest rule length of the end of the buffer is held back, and
+    cuts are made at match boundaries and, in plain text, after whitespace.
+    The released output is identical to rewriting the whole text at once
+    (apart from fuzzy phrases that straddle a cut).
+    """
+    def __init__(self, matcher, replacer, gap=None):
+        self.matcher = matcher
+        self.replacer = replacer
+        self.gap = gap
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        cut = self._safe_cut()
+        if cut <= 0:
+            return ""
+        ready, self.buffer = self.buffer[:cut], self.buffer[cut:]
+        return self.matcher.sub(ready, self.replacer, gap=self.gap)
+
+    def flush(self) -> str:
+        ready, self.buffer = self.buffer, ""
+        if not ready:
+            return ""
+        return self.matcher.sub(ready, self.replacer, gap=self.gap)
+
+    def _safe_cut(self) -> int:
+        # A rule can only start matching before `safe` if it ends inside the buffer
+        safe = len(self.buffer) - self.matcher.max_length
+        if safe <= 0:
+            return 0
+
+        last_end = 0
+        for start, end, _payload in self.matcher.finditer(self.buffer):
+            if start >= safe:
+                break
+            if end >= safe:
+                # Match straddles the safe point; it is complete, so cut right after it
+                return end
+            last_end = end
+
+        # Cut inside plain text after the last whitespace, so words aren't split
+        space = max(self.buffer.rfind(" ", last_end, safe), self.buffer.rfind("\n", last_end, safe))
+        return space + 1 if space >= 0 else last_end
@@ -1,51 +1,76 @@
 import logging
-import re
 from datetime import datetime
+from core.matcher import PhraseMatcher, CompiledCache
 
 logger = logging.getLogger(__name__)
 
+# Placeholders that depend on the moment of expansion
+DYNAMIC_PLACEHOLDERS = ("{date}", "{time}")
+
 class SnippetManager:
     def __init__(self, config_manager):
         self.config_manager = config_manager
+        self._matcher = CompiledCache(config_manager, ["snippets"], self.compile)
 
     def process(self, text: str) -> str:
         """
         Scans text for snippet trigger phrases and replaces them with expanded text.
         Supports placeholders: {date}, {time}, {cursor} (though cursor is just kept as text for now).
+        Triggers are matched case-insensitively in a single scan, longest trigger first.
         """
         config = self.config_manager.get()
         if not config.snippets or not text:
             return text
 
-        # Sort triggers by length (descending)
-        sorted_triggers = sorted(config.snippets.keys(), key=len, reverse=True)
-
-        processed_text = text
-        
-        # We need to handle dynamic replacements (date/time) at the moment of expansion
-        for trigger in sorted_triggers:
-            if trigger.lower() in processed_text.lower():
-                raw_snippet = config.snippets[trigger]
-                expanded_snippet = self._expand_placeholders(raw_snippet)
-                
-                # Case-insensitive replacement
-                pattern = re.compile(re.escape(trigger), re.IGNORECASE)
-                processed_text = pattern.sub(expanded_snippet, processed_text)
-
-        return processed_text
-
-    def _expand_placeholders(self, snippet: str) -> str:
-        now = datetime.now()
-        
+        return self.get_matcher().sub(text, self.new_expander())
+
+    def get_matcher(self) -> PhraseMatcher:
+        """Returns the trigger matcher compiled from config.snippets (rebuilt only when the snippets change)."""
+        return self._matcher.get()
+
+    @staticmethod
+    def compile(config) -> PhraseMatcher:
+        # Static placeholders are resolved once here; the payload keeps the
+        # template so dynamic ones can be filled in at expansion time.
+        return PhraseMatcher(
+            (trigger, snippet.replace("{cursor}", ""))
+            for trigger, snippet in (config.snippets or {}).items()
+        )
+
+    def new_expander(self):
+        """
+        Returns a repl(snippet, matched_text) callable for one utterance.
+        Dynamic placeholders are evaluated lazily, at most once per utterance,
+        and each distinct snippet is expanded only once.
+        """
+        expanded = {}
+        moment = []
+
+        def expand(snippet, _matched):
+            if snippet not in expanded:
+                if any(p in snippet for p in DYNAMIC_PLACEHOLDERS):
+                    if not moment:
+                        moment.append(datetime.now())
+                    expanded[snippet] = self._expand_placeholders(snippet, moment[0])
+                else:
+                    expanded[snippet] = snippet
+            return expanded[snippet]
+
+        return expand
+
+    def _expand_placeholders(self, snippet: str, now: datetime = None) -> str:
+        if now is None:
+            now = datetime.now()
+
         # Simple string replacements
         snippet = snippet.replace("{date}", now.strftime("%Y-%m-%d"))
         snippet = snippet.replace("{time}", now.strftime("%H:%M"))
-        
-        # {cursor} is special - usually we might split the string or just remove it 
-        # for simple text paste. For now, let's just remove it or handle it in OutputAction 
+
+        # {cursor} is special - usually we might split the string or just remove it
+        # for simple text paste. For now, let's just remove it or handle it in OutputAction
         # if we get fancy. Given current architecture, let's keep it clean:
-        # If output action is 'type', maybe we can simulate arrow keys? 
+        # If output action is 'type', maybe we can simulate arrow keys?
         # For Phase 1, we will just remove the marker so it doesn't show up in text.
-        snippet = snippet.replace("{cursor}", "") 
-        
+        snippet = snippet.replace("{cursor}", "")
+
         return snippet
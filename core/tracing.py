@@ -0,0 +1,219 @@
+import json
+import os
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class DictationTrace:
+    """
+    Collects timing spans for a single dictation session.
+    Spans are recorded relative to the moment the trace was created.
+    """
+    def __init__(self, mode: str = None):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.timestamp = datetime.now().isoformat()
+        self.status = "ok"
+        self.error = None
+        self.attributes = {}
+        self.spans = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Times the enclosed block and records it as a span called `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), **attributes)
+
+    def add_span(self, name: str, start: float, end: float, **attributes):
+        """Records a span from explicit perf_counter() timestamps (for waits that cross threads/timers)."""
+        span = {
+            "name": name,
+            "start_ms": round((start - self._origin) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        if attributes:
+            span["attributes"] = attributes
+        with self._lock:
+            self.spans.append(span)
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def degrade(self, stage: str, action: str, reason: str = None):
+        """Records that `stage` fell back to `action` (e.g. skipped the LLM) to stay within budget."""
+        entry = {"stage": stage, "action": action}
+        if reason:
+            entry["reason"] = reason
+        self.attributes.setdefault("degraded", []).append(entry)
+
+    def fail(self, error: str):
+        self.status = "error"
+        self.error = error
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "session_id": self.session_id,
+            "timestamp": self.timestamp,
+            "mode": self.mode,
+            "status": self.status,
+            "error": self.error,
+            "total_ms": round((time.perf_counter() - self._origin) * 1000, 3),
+            "attributes": self.attributes,
+            "spans": spans,
+        }
+
+def span(trace, name: str, **attributes):
+    """Returns trace.span(name) or a no-op context when tracing is not active."""
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, **attributes)
+
+def percentile(values, pct: float) -> float:
+    """Linear-interpolated percentile of an unsorted list (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * (pct / 100.0)
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+class TraceLog:
+    """
+    Append-only JSON Lines log of dictation traces (one session per line).
+    The file is rotated once it grows past max_bytes.
+    """
+    def __init__(self, path: str = None, max_bytes: int = 5 * 1024 * 1024):
+        if path is None:
+            data_dir = os.path.join(
+                os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")),
+                "vocalis"
+            )
+            path = os.path.join(data_dir, "traces.jsonl")
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def write(self, trace: DictationTrace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except Exception as e:
+                logger.error(f"Failed to write trace: {e}")
+
+    def read_recent(self, limit: int = 50) -> list:
+        if not os.path.exists(self.path):
+            return []
+        sessions = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except Exception as e:
+            logger.error(f"Failed to read traces: {e}")
+            return []
+
+        for line in lines[-limit:] if limit else lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                sessions.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return sessions
+
+    def stage_stats(self, limit: int = 50) -> dict:
+        """
+        Aggregates span durations per stage over the last `limit` sessions.
+        Returns {stage: {"count", "p50", "p95", "p99"}} plus a "total" entry.
+        """
+        durations = {}
+        for session in self.read_recent(limit):
+            for s in session.get("spans", []):
+                durations.setdefault(s["name"], []).append(s["duration_ms"])
+            if "total_ms" in session:
+                durations.setdefault("total", []).append(session["total_ms"])
+
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in durations.items()
+        }
+
+    def provider_stats(self, limit: int = 50) -> dict:
+        """
+        Aggregates LLM races recorded by the router over the last `limit` sessions.
+        Returns {provider: {"attempts", "wins", "errors", "win_rate", "p50"}} where
+        p50 is the winning first-token latency.
+        """
+        providers = {}
+        for session in self.read_recent(limit):
+            race = session.get("attributes", {}).get("llm")
+            if not race:
+                continue
+            for attempt in race.get("attempts", []):
+                row = providers.setdefault(attempt["provider"], {"attempts": 0, "wins": 0, "errors": 0, "latencies": []})
+                row["attempts"] += 1
+                if attempt.get("outcome") == "won":
+                    row["wins"] += 1
+                    if attempt.get("first_token_ms") is not None:
+                        row["latencies"].append(attempt["first_token_ms"])
+                elif attempt.get("outcome") == "error":
+                    row["errors"] += 1
+
+        for row in providers.values():
+            latencies = row.pop("latencies")
+            row["win_rate"] = row["wins"] / row["attempts"]
+            row["p50"] = percentile(latencies, 50) if latencies else None
+        return providers
+
+def format_provider_stats(stats: dict) -> str:
+    if not stats:
+        return ""
+    width = max(len(name) for name in stats)
+    lines = ["LLM provider races",
+             f"{'provider'.ljust(width)}  {'tries':>5}  {'wins':>5}  {'errors':>6}  {'win %':>6}  {'p50 ttft':>9}"]
+    for name, row in sorted(stats.items(), key=lambda item: -item[1]["wins"]):
+        p50 = f"{row['p50']:>9.1f}" if row["p50"] is not None else f"{'-':>9}"
+        lines.append(f"{name.ljust(width)}  {row['attempts']:>5}  {row['wins']:>5}  {row['errors']:>6}  "
+                     f"{100 * row['win_rate']:>5.0f}%  {p50}")
+    return "\n".join(lines)
+
+def format_stats(stats: dict, sessions: int) -> str:
+    if not stats:
+        return "No dictation traces recorded yet."
+
+    width = max(len(name) for name in stats)
+    lines = [f"Stage timings over the last {sessions} session(s) (ms)",
+             f"{'stage'.ljust(width)}  {'count':>5}  {'p50':>9}  {'p95':>9}  {'p99':>9}"]
+    # Stages are listed in the order they first appeared (pipeline order), total last
+    for name in sorted(stats, key=lambda n: n == "total"):
+        row = stats[name]
+        lines.append(f"{name.ljust(width)}  {row['count']:>5}  {row['p50']:>9.1f}  {row['p95']:>9.1f}  {row['p99']:>9.1f}")
+    return "\n".join(lines)
@@ -1,15 +1,25 @@
 import os
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from faster_whisper import WhisperModel
+from core.ratelimit import get_rate_limiter, http_event_hooks
 
 logger = logging.getLogger(__name__)
 
 class TranscriberBase(ABC):
     @abstractmethod
-    def transcribe(self, audio_path: str, language: str = None) -> str:
+    def transcribe(self, audio_path: str, language: str = None, cancel_event=None) -> str:
         pass
 
+    async def atranscribe(self, audio_path: str, language: str = None, cancel_event=None) -> str:
+        """
+        Awaitable transcription for the pipeline event loop. By default the blocking
+        transcribe() runs in the loop's executor; set cancel_event to make it stop early.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.transcribe, audio_path, language, cancel_event)
+
 class LocalTranscriber(TranscriberBase):
     def __init__(self, model_preset="balanced", model_size=None, device="auto", compute_type="default"):
         self.model_preset = model_preset
@@ -48,7 +58,7 @@ class LocalTranscriber(TranscriberBase):
             logger.error(f"Failed to load model: {e}")
             raise
 
-    def transcribe(self, audio_path: str, language: str = None) -> str:
+    def transcribe(self, audio_path: str, language: str = None, cancel_event=None) -> str:
         if not self.model:
             raise RuntimeError("Model not loaded")
             
@@ -57,17 +67,23 @@ class LocalTranscriber(TranscriberBase):
         
         logger.info(f"Detected language '{info.language}' with probability {info.language_probability}")
         
+        # Segments are decoded lazily, so a cancel takes effect between segments
         text_segments = []
         for segment in segments:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("Transcription cancelled.")
+                break
             text_segments.append(segment.text)
             
         return "".join(text_segments).strip()
 
 class RemoteTranscriber(TranscriberBase):
-    def __init__(self, provider="openai", api_key=None, model_name="whisper-1"):
+    def __init__(self, provider="openai", api_key=None, model_name="whisper-1", timeout=30.0, base_url=None):
         self.provider = provider
         self.api_key = api_key
         self.model_name = model_name
+        self.timeout = timeout
+        self.base_url = base_url
         
         if not self.api_key:
              # Try env var
@@ -76,18 +92,20 @@ class RemoteTranscriber(TranscriberBase):
         if not self.api_key:
             raise ValueError(f"API Key required for {provider}")
 
-    def transcribe(self, audio_path: str, language: str = None) -> str:
+    def _client_args(self):
+        base_url = self.base_url
+        if self.provider == "groq":
+            base_url = base_url or "https://api.groq.com/openai/v1"
+            if not self.model_name: self.model_name = "distil-whisper-large-v3-en"
+        return {"api_key": self.api_key, "base_url": base_url, "timeout": self.timeout}
+
+    def transcribe(self, audio_path: str, language: str = None, cancel_event=None) -> str:
         logger.info(f"Transcribing via {self.provider} ({self.model_name})...")
         
         try:
             from openai import OpenAI
             
-            base_url = None
-            if self.provider == "groq":
-                base_url = "https://api.groq.com/openai/v1"
-                if not self.model_name: self.model_name = "distil-whisper-large-v3-en"
-            
-            client = OpenAI(api_key=self.api_key, base_url=base_url)
+            client = OpenAI(**self._client_args())
             
             with open(audio_path, "rb") as audio_file:
                 transcript = client.audio.transcriptions.create(
@@ -104,10 +122,51 @@ class RemoteTranscriber(TranscriberBase):
             logger.error(f"Remote transcription failed: {e}")
             raise
 
+    async def atranscribe(self, audio_path: str, language: str = None, cancel_event=None) -> str:
+        """
+        Uploads with the async client, so cancelling the task aborts the request.
+        Goes through the shared rate limiter, which raises RateLimited when the
+        provider keeps throttling us.
+        """
+        logger.info(f"Transcribing via {self.provider} ({self.model_name})...")
+
+        try:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        except ImportError:
+            raise ImportError("openai package is required for remote transcription. Install it with: pip install openai")
+
+        client = AsyncOpenAI(**self._client_args(), max_retries=0,
+                             http_client=DefaultAsyncHttpxClient(event_hooks=http_event_hooks(self.provider)))
+
+        async def upload():
+            # Reopened per attempt, a retry must send the whole file again
+            with open(audio_path, "rb") as audio_file:
+                return await client.audio.transcriptions.create(
+                    model=self.model_name,
+                    file=audio_file,
+                    language=language
+                )
+
+        try:
+            transcript = await get_rate_limiter().call(self.provider, upload)
+            return transcript.text
+        except asyncio.CancelledError:
+            logger.info("Remote transcription cancelled.")
+            raise
+        except Exception as e:
+            logger.error(f"Remote transcription failed: {e}")
+            raise
+        finally:
+            await client.close()
+
 class TranscriberFactory:
     @staticmethod
     def get_transcriber(config):
-        if config.transcription_provider == "local":
+        provider = config.transcription_provider
+        if provider != "local" and not get_rate_limiter().available(provider):
+            logger.warning(f"{provider} is throttling requests, transcribing locally until it recovers")
+            return TranscriberFactory.get_fallback_transcriber(config)
+        if provider == "local":
             return LocalTranscriber(
                 model_preset=config.model_preset,
                 model_size=config.model_size,
@@ -118,5 +177,12 @@ class TranscriberFactory:
             return RemoteTranscriber(
                 provider=config.transcription_provider,
                 api_key=config.api_key,
-                model_name=config.remote_model_name
+                model_name=config.remote_model_name,
+                timeout=getattr(config, "request_timeout", 30.0),
+                base_url=(getattr(config, "provider_base_urls", None) or {}).get(provider)
             )
+
+    @staticmethod
+    def get_fallback_transcriber(config):
+        """The smallest local model, used when cloud transcription is too slow or throttled."""
+        return LocalTranscriber(model_preset="fast", device=config.device)
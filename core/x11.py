@@ -0,0 +1,442 @@
+import logging
+import os
+import select
+import sys
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from Xlib import X, XK, display as xdisplay
+except ImportError:
+    X = None
+
+logger = logging.getLogger(__name__)
+
+# How often the clipboard owner is re-checked (ownership changes send no events without XFixes)
+OWNER_POLL = 0.01
+
+# Characters sent per round trip to the server
+TYPE_BATCH = 256
+# ... while characters are bound to spare keycodes, so clients never get far behind
+REMAP_BATCH = 16
+# Time given to clients to pick up a keyboard mapping change before keys are sent
+REMAP_SETTLE = 0.02
+# Clients look keys up when they process them, after the server has; before a temporary
+# binding is reverted or reused, they get this long per key sent with it (capped)
+REMAP_SETTLE_PER_KEY = 0.002
+REMAP_SETTLE_MAX = 1.0
+
+SPECIAL_KEYSYMS = {"\n": 0xff0d, "\r": 0xff0d, "\t": 0xff09} # Return, Tab
+
+# How often the window tracker thread checks whether it should stop, and waits before reconnecting
+TRACKER_POLL = 0.5
+TRACKER_RECONNECT = 5.0
+
+ActiveWindow = namedtuple("ActiveWindow", ["id", "title", "wm_class"])
+
+def available() -> bool:
+    """True on an X11 session with python-xlib installed."""
+    return (X is not None and sys.platform.startswith("linux")
+            and os.environ.get("XDG_SESSION_TYPE") != "wayland"
+            and bool(os.environ.get("DISPLAY")))
+
+class FocusWatcher:
+    """
+    Waits for window-manager state instead of sleeping a fixed time: until a
+    window has the input focus again (_NET_ACTIVE_WINDOW on the root window)
+    or the clipboard has a new owner. Every wait is bounded by a timeout.
+
+    python-xlib connections aren't thread-safe, so each thread gets its own
+    persistent connection. All methods return None when X11 state can't be
+    observed (Wayland, macOS, no python-xlib); callers then sleep instead.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self.enabled = available()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            d = xdisplay.Display()
+            conn = (d, d.screen().root, d.intern_atom("_NET_ACTIVE_WINDOW"), d.intern_atom("CLIPBOARD"))
+            self._local.conn = conn
+        return conn
+
+    def _reset(self, e):
+        logger.debug(f"X11 query failed: {e}")
+        self._local.conn = None
+
+    def active_window(self):
+        """Id of the focused top-level window, or None."""
+        if not self.enabled:
+            return None
+        try:
+            d, root, active_atom, _ = self._conn()
+            return self._active(root, active_atom)
+        except Exception as e:
+            self._reset(e)
+            return None
+
+    def _active(self, root, active_atom):
+        prop = root.get_full_property(active_atom, X.AnyPropertyType)
+        return prop.value[0] if prop and len(prop.value) else None
+
+    def _owner(self, d, clipboard_atom):
+        owner = d.get_selection_owner(clipboard_atom)
+        return getattr(owner, "id", owner) or 0
+
+    def clipboard_owner(self):
+        """Window currently owning the CLIPBOARD selection (0 = none), or None."""
+        if not self.enabled:
+            return None
+        try:
+            d, _, _, clipboard_atom = self._conn()
+            return self._owner(d, clipboard_atom)
+        except Exception as e:
+            self._reset(e)
+            return None
+
+    def wait_for_window(self, window_id, timeout: float):
+        """
+        Blocks until window_id is the active window, for at most `timeout` seconds.
+        Returns True when it is, False on timeout, None when focus can't be observed.
+        """
+        if not self.enabled or not window_id:
+            return None
+        try:
+            d, root, active_atom, _ = self._conn()
+            # Only listen while waiting, so events don't pile up between pastes
+            root.change_attributes(event_mask=X.PropertyChangeMask)
+            try:
+                return self._wait(d, lambda: self._active(root, active_atom) == window_id, timeout)
+            finally:
+                root.change_attributes(event_mask=X.NoEventMask)
+                d.flush()
+        except Exception as e:
+            self._reset(e)
+            return None
+
+    def wait_for_clipboard_owner(self, previous, timeout: float):
+        """
+        Blocks until the clipboard is owned by a window other than `previous`
+        (the owner before we copied), i.e. the copy has landed.
+        Returns True/False (timeout), or None when ownership can't be observed.
+        """
+        if not self.enabled or previous is None:
+            return None
+        try:
+            d, _, _, clipboard_atom = self._conn()
+            owned = lambda: self._owner(d, clipboard_atom) not in (0, previous)
+            return self._wait(d, owned, timeout, poll=OWNER_POLL)
+        except Exception as e:
+            self._reset(e)
+            return None
+
+    def _wait(self, d, condition, timeout, poll=None):
+        deadline = time.monotonic() + timeout
+        while True:
+            while d.pending_events():
+                d.next_event()
+            if condition():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Woken by the next event (e.g. PropertyNotify on the root window)
+            select.select([d.fileno()], [], [], min(remaining, poll or remaining))
+
+def char_to_keysym(char: str) -> int:
+    if char in SPECIAL_KEYSYMS:
+        return SPECIAL_KEYSYMS[char]
+    code = ord(char)
+    # Latin-1 keysyms equal their code point; everything else uses the Unicode keysym range
+    if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+        return code
+    return 0x01000000 + code
+
+class XTestTyper:
+    """
+    Types text in-process through the XTEST extension, instead of spawning
+    xdotool for every paste. Uses one persistent display connection and sends
+    the key events of a whole batch before a single round trip.
+
+    Characters missing from the current layout (emoji, most non-Latin text)
+    are bound temporarily to spare keycodes, like xdotool does, and the
+    mapping is reverted once the text is typed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._display = None
+
+    def _connect(self):
+        if self._display is None:
+            d = xdisplay.Display()
+            if not d.has_extension("XTEST"):
+                d.close()
+                raise RuntimeError("X server has no XTEST extension")
+            self._display = d
+        return self._display
+
+    def ready(self) -> bool:
+        """True when the X server accepts XTEST input."""
+        with self._lock:
+            try:
+                self._connect()
+                return True
+            except Exception as e:
+                logger.debug(f"XTEST unavailable: {e}")
+                self._close()
+                return False
+
+    def _keymap(self, d):
+        """Current layout: keysym -> (keycode, shift level), plus the keycodes with nothing bound."""
+        first = d.display.info.min_keycode
+        count = d.display.info.max_keycode - first + 1
+        keymap, spare = {}, []
+        for offset, syms in enumerate(d.get_keyboard_mapping(first, count)):
+            keycode = first + offset
+            if not any(syms):
+                spare.append(keycode)
+                continue
+            # Only the plain and shifted levels; AltGr levels depend on the layout's modifier setup
+            for level, keysym in enumerate(syms[:2]):
+                if keysym and keysym not in keymap:
+                    keymap[keysym] = (keycode, level)
+        return keymap, spare
+
+    def type_text(self, text: str):
+        """Types text into the focused window. Raises when XTEST can't be used."""
+        if not text:
+            return
+        with self._lock:
+            try:
+                self._type(self._connect(), text)
+            except Exception:
+                self._close()
+                raise
+
+    def key_combo(self, *keysym_names):
+        """Presses keys together, e.g. key_combo("Control_L", "v")."""
+        with self._lock:
+            try:
+                d = self._connect()
+                keycodes = [d.keysym_to_keycode(XK.string_to_keysym(name)) for name in keysym_names]
+                if not all(keycodes):
+                    raise RuntimeError(f"No keycode for {'+'.join(keysym_names)}")
+                for keycode in keycodes:
+                    d.xtest_fake_input(X.KeyPress, keycode)
+                for keycode in reversed(keycodes):
+                    d.xtest_fake_input(X.KeyRelease, keycode)
+                d.sync()
+            except Exception:
+                self._close()
+                raise
+
+    def _type(self, d, text):
+        keymap, spare = self._keymap(d)
+        shift = keymap.get(XK.XK_Shift_L, (None,))[0]
+        remapped = {}
+        bound = set() # Every keycode bound during this call, reverted at the end
+        events, binds = [], []
+        in_flight = 0 # Keys sent since the current temporary bindings were made
+
+        def flush():
+            nonlocal events, binds, in_flight
+            self._bind(d, binds)
+            self._send(d, events, shift)
+            if remapped:
+                in_flight += len(events)
+            events, binds = [], []
+
+        try:
+            for char in text:
+                keysym = char_to_keysym(char)
+                key = keymap.get(keysym) or remapped.get(keysym)
+                if key is None:
+                    if not spare and remapped:
+                        # Out of spare keycodes: type what uses the current bindings, then recycle them
+                        flush()
+                        self._settle(in_flight)
+                        in_flight = 0
+                        spare.extend(keycode for keycode, _ in remapped.values())
+                        remapped.clear()
+                    if not spare:
+                        logger.warning(f"Can't type {char!r}: no spare keycode to bind it to")
+                        continue
+                    keycode = spare.pop()
+                    binds.append((keycode, keysym))
+                    bound.add(keycode)
+                    key = remapped[keysym] = (keycode, 0)
+                events.append(key)
+                if len(events) >= (REMAP_BATCH if remapped else TYPE_BATCH):
+                    flush()
+            flush()
+        finally:
+            if bound:
+                self._settle(in_flight + len(events))
+                self._bind(d, [(keycode, X.NoSymbol) for keycode in sorted(bound)], settle=False)
+
+    @staticmethod
+    def _settle(keys):
+        """Waits until clients have probably looked up the `keys` last sent."""
+        time.sleep(min(REMAP_SETTLE + keys * REMAP_SETTLE_PER_KEY, REMAP_SETTLE_MAX))
+
+    def _bind(self, d, binds, settle=True):
+        if not binds:
+            return
+        for keycode, keysym in binds:
+            d.change_keyboard_mapping(keycode, [(keysym, keysym)])
+        d.sync()
+        if settle:
+            time.sleep(REMAP_SETTLE)
+
+    def _send(self, d, events, shift):
+        for keycode, level in events:
+            shifted = level == 1 and shift
+            if shifted:
+                d.xtest_fake_input(X.KeyPress, shift)
+            d.xtest_fake_input(X.KeyPress, keycode)
+            d.xtest_fake_input(X.KeyRelease, keycode)
+            if shifted:
+                d.xtest_fake_input(X.KeyRelease, shift)
+        d.sync()
+
+    def _close(self):
+        if self._display is not None:
+            try:
+                self._display.close()
+            except Exception:
+                pass
+            self._display = None
+
+class ActiveWindowTracker:
+    """
+    Keeps the focused window's id, title and class in memory. A background
+    thread listens for PropertyNotify on _NET_ACTIVE_WINDOW (focus changes)
+    and on the focused window's name (e.g. a browser switching tabs), so
+    reading the current window costs nothing.
+    """
+    def __init__(self):
+        self._window = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vocalis-window-tracker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self):
+        """The focused window as an ActiveWindow, or None when not known (yet)."""
+        return self._window
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._watch(xdisplay.Display())
+            except Exception as e:
+                logger.warning(f"Window tracker lost the X connection: {e}")
+            self._window = None
+            self._stop.wait(TRACKER_RECONNECT)
+
+    def _watch(self, d):
+        try:
+            root = d.screen().root
+            atoms = {name: d.intern_atom(name) for name in ("_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "WM_NAME", "UTF8_STRING")}
+            name_atoms = (atoms["_NET_WM_NAME"], atoms["WM_NAME"])
+            root.change_attributes(event_mask=X.PropertyChangeMask)
+            window = self._focus(d, root, atoms, None)
+            while not self._stop.is_set():
+                if not d.pending_events():
+                    select.select([d.fileno()], [], [], TRACKER_POLL)
+                    continue
+                event = d.next_event()
+                if event.type != X.PropertyNotify:
+                    continue
+                if event.window == root and event.atom == atoms["_NET_ACTIVE_WINDOW"]:
+                    window = self._focus(d, root, atoms, window)
+                elif window is not None and event.window == window and event.atom in name_atoms:
+                    self._window = self._window._replace(title=self._title(window, atoms))
+        finally:
+            d.close()
+
+    def _focus(self, d, root, atoms, previous):
+        """Reads the newly focused window and follows its title changes instead of the previous one's."""
+        prop = root.get_full_property(atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+        window_id = prop.value[0] if prop and len(prop.value) else 0
+        if previous is not None and previous.id != window_id:
+            # The previous window may be gone already; ignore the error
+            previous.change_attributes(event_mask=X.NoEventMask, onerror=lambda *args: None)
+        if not window_id:
+            self._window = ActiveWindow(0, "", "")
+            return None
+        window = d.create_resource_object("window", window_id)
+        try:
+            if previous is None or previous.id != window_id:
+                window.change_attributes(event_mask=X.PropertyChangeMask)
+            wm_class = window.get_wm_class()
+            self._window = ActiveWindow(window_id, self._title(window, atoms), wm_class[1] if wm_class else "")
+        except Exception as e:
+            # Closed while we looked at it; the next focus change corrects this
+            logger.debug(f"Could not read window {window_id:#x}: {e}")
+            self._window = ActiveWindow(window_id, "", "")
+        return window
+
+    def _title(self, window, atoms):
+        try:
+            prop = window.get_full_property(atoms["_NET_WM_NAME"], atoms["UTF8_STRING"])
+            if prop and prop.value:
+                value = prop.value
+            else:
+                value = window.get_wm_name() or ""
+            return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+        except Exception:
+            return ""
+
+_watcher = FocusWatcher()
+_typer = None
+_typer_lock = threading.Lock()
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_xtest_typer():
+    """The shared XTestTyper, or None when not on X11 or python-xlib is missing."""
+    global _typer
+    if not available():
+        return None
+    with _typer_lock:
+        if _typer is None:
+            _typer = XTestTyper()
+        return _typer
+
+def get_focus_watcher() -> FocusWatcher:
+    return _watcher
+
+def get_window_tracker():
+    """The shared, running ActiveWindowTracker, or None when not on X11 or python-xlib is missing."""
+    global _tracker
+    if not available():
+        return None
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ActiveWindowTracker()
+            _tracker.start()
+        return _tracker
+
+def wait_for_focus(window_id, timeout: float) -> str:
+    """
+    Waits until window_id has the focus again, at most `timeout` seconds. Falls
+    back to sleeping the full timeout when focus can't be observed. Returns
+    "focused", "timeout" or "fixed_delay".
+    """
+    if timeout <= 0:
+        return "timeout"
+    result = _watcher.wait_for_window(window_id, timeout)
+    if result is None:
+        time.sleep(timeout)
+        return "fixed_delay"
+    return "focused" if result else "timeout"
@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+import pytest
+
+@pytest.fixture
+def config_manager():
+    """
+    Builds a stand-in for ConfigManager that serves one real ConfigSnapshot:
+    the AppConfig defaults with the given fields applied. Nothing is read
+    from or written to disk.
+    """
+    pytest.importorskip("toml")
+    from core.config import AppConfig, make_snapshot
+
+    def make(version=1, **values):
+        snapshot = make_snapshot(vars(AppConfig(**values)), version, dict.fromkeys(values, version))
+        return SimpleNamespace(get=lambda: snapshot)
+    return make
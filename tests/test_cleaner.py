@@ -0,0 +1,55 @@
+import pytest
+
+from core.cleaner import TextCleaner
+
+@pytest.fixture
+def cleaner():
+    return TextCleaner()
+
+@pytest.mark.parametrize("text", [
+    'He said "hello there"',
+    "c++ is great",
+    "fix #123 now",
+    "use --force",
+    "it was 'like' that",
+    "$5 - maybe",
+])
+def test_literal_symbols_pass_through_and_escalate(cleaner, text):
+    assert cleaner.clean(text) == text
+    assert cleaner.escalation_reason(text, 40) == "literal symbols"
+
+@pytest.mark.parametrize("text, expected", [
+    ("e.g. this works", "E.g. this works."),
+    ("Dr. Smith called", "Dr. Smith called."),
+    ("we need milk, eggs, etc.", "We need milk, eggs, etc."),
+])
+def test_abbreviation_period_is_not_a_sentence_end(cleaner, text, expected):
+    assert cleaner.clean(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("bye bye", "Bye bye."),
+    ("the the cat sat", "The cat sat."),
+])
+def test_repeats(cleaner, text, expected):
+    assert cleaner.clean(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("wh- what is this", "What is this."),
+    ("um so we should, uh, go", "So we should go."),
+    ("so, like, it works", "It works."),
+    ("(um hello) there", "(hello) there."),
+    ("i think i'm ready", "I think I'm ready."),
+    ("can you, like, send it?", "Can you send it?"),
+    ("hello. um. world", "Hello. World."),
+    ("is it ready? uh. yes", "Is it ready? Yes."),
+])
+def test_fillers_and_fragments(cleaner, text, expected):
+    assert cleaner.clean(text) == expected
+
+def test_original_whitespace_is_kept(cleaner):
+    assert cleaner.clean("hello   world, well-known example.com") == "Hello   world, well-known example.com."
+
+def test_only_word_fragments_are_dropped(cleaner):
+    # A hyphen needs letters before it to mark an abandoned word
+    assert cleaner.clean("wh- what") == "What."
+    assert cleaner.clean("3- 4 apples") == "3- 4 apples."
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("toml")
+
+from core.config import ConfigManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    manager = ConfigManager()
+    yield manager
+    manager.flush()
+
+def test_merge_keeps_changes_made_while_editing(manager):
+    manager.update(dictionary={"teh": "the"})
+    base = manager.get()
+    edited = base.edit()
+    edited.paste_delay = 1.5
+    edited.dictionary["vocalis"] = "Vocalis"
+
+    # Meanwhile: a mode switch and an external edit of another entry
+    manager.update(current_mode="note", dictionary={"teh": "the", "github": "GitHub"})
+
+    assert manager.merge(base, edited) == {"paste_delay", "dictionary"}
+    config = manager.get()
+    assert config.current_mode == "note"
+    assert config.paste_delay == 1.5
+    assert dict(config.dictionary) == {"teh": "the", "github": "GitHub", "vocalis": "Vocalis"}
+
+def test_merge_applies_removed_entries(manager):
+    manager.update(snippets={"brb": "be right back", "sig": "Best"})
+    base = manager.get()
+    edited = base.edit()
+    del edited.snippets["brb"]
+    manager.merge(base, edited)
+    assert dict(manager.get().snippets) == {"sig": "Best"}
+
+def test_snapshots_are_read_only(manager):
+    with pytest.raises(AttributeError):
+        manager.get().hotkey = "x"
+    with pytest.raises(TypeError):
+        manager.get().modes["quick"]["name"] = "x"
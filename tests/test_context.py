@@ -0,0 +1,21 @@
+from core.context import ContextManager
+
+CLIPBOARD_PROMPT = {"reply": {"id": "reply", "name": "Reply", "description": "", "template": "{clipboard}\n\n{text}"}}
+
+def test_clipboard_is_tracked_only_when_a_prompt_uses_it(config_manager):
+    assert not ContextManager(config_manager()).tracks_clipboard()
+    assert ContextManager(config_manager(prompts=CLIPBOARD_PROMPT)).tracks_clipboard()
+
+def test_clipboard_is_not_tracked_when_access_is_denied(config_manager):
+    context = ContextManager(config_manager(prompts=CLIPBOARD_PROMPT, allow_clipboard_access=False))
+    assert not context.tracks_clipboard()
+    context.update_clipboard("secret")
+    assert context.get_clipboard() == "[Clipboard Access Denied]"
+
+def test_forgotten_snapshot_is_not_served(config_manager, monkeypatch):
+    context = ContextManager(config_manager(prompts=CLIPBOARD_PROMPT))
+    context.update_clipboard("old")
+    assert context.get_clipboard() == "old"
+    context.forget_clipboard()
+    monkeypatch.setattr(context, "_read_clipboard", lambda: "new")
+    assert context.get_clipboard() == "new"
@@ -0,0 +1,55 @@
+import random
+import string
+import threading
+
+import pytest
+
+from core.fuzzy import FuzzyPhraseIndex, levenshtein, normalize
+from core.matcher import BackgroundCache
+
+def _mutate(rng, text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        op, i = rng.randrange(3), rng.randrange(len(chars))
+        if op == 0:
+            chars[i] = rng.choice(string.ascii_lowercase)
+        elif op == 1:
+            del chars[i]
+        else:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+    return "".join(chars)
+
+@pytest.mark.parametrize("max_edits", [1, 2])
+def test_lookup_finds_every_phrase_within_its_bound(max_edits):
+    rng = random.Random(7)
+    words = lambda: " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+                             for _ in range(rng.randint(1, 2)))
+    entries = [(words(), f"R{i}") for i in range(300)]
+    index = FuzzyPhraseIndex(entries, max_edits=max_edits)
+    norms = [normalize(phrase) for phrase, _ in entries]
+    for phrase, _ in rng.sample(entries, 150):
+        candidate = _mutate(rng, normalize(phrase), rng.randint(1, max_edits))
+        expected = any(index.edit_bound(n) and levenshtein(candidate, n, index.edit_bound(n)) <= index.edit_bound(n)
+                       for n in norms)
+        assert (index.lookup(candidate) is not None) == expected
+
+def test_apply_replaces_near_misses():
+    index = FuzzyPhraseIndex([("kubernetes", "Kubernetes"), ("super application", "SuperApp")], max_edits=2)
+    assert index.apply("deploy to kubernetis with the super aplication") == "deploy to Kubernetes with the SuperApp"
+
+def test_background_cache_never_blocks(config_manager):
+    release = threading.Event()
+    built = []
+
+    def build(config):
+        release.wait(5)
+        built.append(config.version)
+        return config.version
+
+    cache = BackgroundCache(config_manager(), ["dictionary"], build)
+    assert cache.get() is None # Build in progress, not waited for
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == "vocalis-compile":
+            thread.join(5)
+    assert cache.get() == 1 and built == [1]
@@ -0,0 +1,36 @@
+import sqlite3
+
+from core.llm_cache import LLMResponseCache, FLUSH_EVERY
+
+def test_lookups_are_counted_in_batches(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("a", "response")
+    assert cache.get("a") == "response"
+    assert cache.get("b") is None
+
+    counters = sqlite3.connect(cache.path).execute("SELECT name, value FROM counters").fetchall()
+    assert counters == []
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+def test_flushes_after_enough_lookups(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"))
+    for _ in range(FLUSH_EVERY):
+        cache.get("missing")
+    counters = dict(sqlite3.connect(cache.path).execute("SELECT name, value FROM counters").fetchall())
+    assert counters == {"misses": FLUSH_EVERY}
+
+def test_expired_entries_miss_and_are_removed(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=1)
+    cache.put("a", "response")
+    sqlite3.connect(cache.path).execute("UPDATE responses SET created_at = 0").connection.commit()
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_unwritable_directory_fails_open(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = LLMResponseCache(str(blocker / "vocalis" / "cache.sqlite3"))
+    cache.put("a", "response")
+    assert cache.get("a") is None
+    assert cache.stats() == {}
+    cache.clear()
@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.llm_router import LLMRouter
+
+class _FakeClient:
+    """Streams `chunks` after `delay`, pausing between them; logs what it sent."""
+    def __init__(self, provider, chunks, delay=0.0, gap=0.01):
+        self.provider = provider
+        self.client = object()
+        self.chunks = chunks
+        self.delay = delay
+        self.gap = gap
+        self.sent = []
+        self.closed = False
+
+    async def stream(self, system_prompt, user_content):
+        try:
+            await asyncio.sleep(self.delay)
+            for chunk in self.chunks:
+                self.sent.append(chunk)
+                yield chunk
+                await asyncio.sleep(self.gap)
+        finally:
+            self.closed = True
+
+class _FakePool:
+    def __init__(self, *clients):
+        self.clients = {client.provider: client for client in clients}
+
+    def get(self, config, provider=None, api_key=None):
+        return self.clients[provider]
+
+def _config(*providers, hedge_ms=0):
+    return SimpleNamespace(llm_providers=list(providers), llm_api_keys={}, llm_hedge_ms=hedge_ms,
+                           transcription_provider=providers[0], local_llm_model_path=None)
+
+def test_losers_are_cancelled_as_soon_as_a_winner_streams():
+    fast = _FakeClient("race-fast", ["a", "b", "c", "d", "e"], delay=0.01)
+    slow = _FakeClient("race-slow", ["x", "y", "z", "w", "v"], delay=0.03)
+    router = LLMRouter(_FakePool(fast, slow))
+
+    async def run():
+        chunks = []
+        async for chunk in router.stream(_config("race-fast", "race-slow"), "system", "text"):
+            if chunk == "a":
+                # Give the loser time to start streaming if it were still running
+                await asyncio.sleep(0.05)
+                assert slow.closed
+            chunks.append(chunk)
+        return chunks
+
+    assert asyncio.run(run()) == fast.chunks
+    assert slow.sent == []
+    stats = router.stats_snapshot()
+    assert stats["race-fast"]["wins"] == 1
+    assert stats["race-slow"]["wins"] == 0
+
+def test_hedges_to_the_next_provider_when_the_primary_fails():
+    class _Failing(_FakeClient):
+        async def stream(self, system_prompt, user_content):
+            raise RuntimeError("boom")
+            yield
+
+    broken = _Failing("hedge-broken", [])
+    backup = _FakeClient("hedge-backup", ["ok"])
+    router = LLMRouter(_FakePool(broken, backup))
+    assert asyncio.run(router.process(_config("hedge-broken", "hedge-backup", hedge_ms=1000), "s", "t")) == "ok"
+    assert router.stats_snapshot()["hedge-broken"]["errors"] == 1
@@ -0,0 +1,44 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import core.local_llm as local_llm
+
+class _FakeLlama:
+    def __init__(self, **kwargs):
+        self.closed = False
+
+    def set_cache(self, cache):
+        pass
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def model_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_llm, "llama_cpp", SimpleNamespace(Llama=_FakeLlama, LlamaRAMCache=lambda capacity_bytes: None))
+    monkeypatch.setattr(local_llm, "_models", {})
+    path = tmp_path / "model.gguf"
+    path.write_bytes(b"")
+    return str(path)
+
+def _config(path, context=2048, threads=0):
+    return SimpleNamespace(local_llm_model_path=path, local_llm_context=context, local_llm_threads=threads)
+
+def test_model_is_shared_while_the_settings_stay(model_file):
+    model = local_llm.get_local_llm(_config(model_file))
+    assert local_llm.get_local_llm(_config(model_file)) is model
+
+def test_changed_settings_unload_the_previous_model(model_file):
+    old = local_llm.get_local_llm(_config(model_file))
+    weights = old.load()
+    new = local_llm.get_local_llm(_config(model_file, context=4096))
+    assert new is not old
+    for thread in threading.enumerate():
+        if thread.name == "vocalis-llm-close":
+            thread.join(5)
+    assert weights.closed
+    assert list(local_llm._models.values()) == [new]
+    with pytest.raises(RuntimeError):
+        old.load()
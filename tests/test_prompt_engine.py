@@ -0,0 +1,26 @@
+import asyncio
+
+from core.prompt_engine import PromptEngine
+
+class _Trace:
+    def __init__(self):
+        self.attributes = []
+
+    def set(self, key, value):
+        self.attributes.append((key, value))
+
+def test_stream_decides_the_clean_fast_path_once(config_manager, monkeypatch, caplog):
+    engine = PromptEngine(config_manager(api_key="test-key")) # An LLM is available, the rules still win
+    calls = []
+    clean = engine.cleaner.clean
+    monkeypatch.setattr(engine.cleaner, "clean", lambda text: calls.append(text) or clean(text))
+    trace = _Trace()
+
+    async def run():
+        return [chunk async for chunk in engine.stream("um so it works", "clean", trace=trace)]
+
+    with caplog.at_level("INFO", logger="core.prompt_engine"):
+        assert asyncio.run(run()) == ["So it works."]
+    assert [r.message for r in caplog.records].count("Clean prompt handled by local rules") == 1
+    assert calls == ["um so it works"]
+    assert trace.attributes == [("clean_path", "rules")]
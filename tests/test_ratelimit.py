@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from core.ratelimit import CircuitBreaker, RateLimited, RateLimiter, TokenBucket, parse_reset
+
+class _Throttled(Exception):
+    def __init__(self, status_code=429):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def _limiter(**kwargs):
+    kwargs.setdefault("max_retries", 2)
+    kwargs.setdefault("base_delay", 0.0)
+    return RateLimiter(**kwargs)
+
+def _responses(*outcomes):
+    """A request() that raises or returns the given outcomes in turn."""
+    outcomes = list(outcomes)
+    async def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return request
+
+def _open_circuit(limiter, provider):
+    breaker = limiter.breaker(provider)
+    breaker.failures = breaker.threshold
+    breaker.open_until = time.monotonic() - 1  # Cooldown over: next call is the probe
+    return breaker
+
+def test_parse_reset_formats():
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert parse_reset("1.5") == 1.5
+    assert parse_reset("soon") is None
+
+def test_bucket_holds_requests_until_the_window_resets():
+    bucket = TokenBucket()
+    bucket.update({"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "1",
+                   "x-ratelimit-reset-requests": "2s"})
+    assert bucket.wait_time() == 0
+    bucket.consume()
+    assert 0 < bucket.wait_time() <= 2
+
+def test_retries_throttled_requests():
+    limiter = _limiter()
+    result = asyncio.run(limiter.call("p", _responses(_Throttled(), _Throttled(503), "ok")))
+    assert result == "ok"
+    assert limiter.available("p")
+
+def test_breaker_opens_after_repeated_throttling():
+    limiter = _limiter(max_retries=0)
+    for _ in range(CircuitBreaker().threshold):
+        with pytest.raises(RateLimited):
+            asyncio.run(limiter.call("p", _responses(_Throttled())))
+    assert not limiter.available("p")
+    with pytest.raises(RateLimited):
+        asyncio.run(limiter.call("p", _responses("ok")))
+
+def test_probe_retries_and_closes_the_circuit():
+    limiter = _limiter()
+    _open_circuit(limiter, "p")
+    assert asyncio.run(limiter.call("p", _responses(_Throttled(), "ok"))) == "ok"
+    assert limiter.available("p")
+
+def test_failed_probe_reopens_then_recovers():
+    limiter = _limiter()
+    breaker = _open_circuit(limiter, "p")
+    with pytest.raises(RateLimited):
+        asyncio.run(limiter.call("p", _responses(_Throttled(), _Throttled(), _Throttled())))
+    assert not breaker.probing
+    assert not limiter.available("p")
+
+    breaker.open_until = time.monotonic() - 1
+    assert asyncio.run(limiter.call("p", _responses("ok"))) == "ok"
+    assert limiter.available("p")
+
+def test_non_retryable_errors_release_the_probe():
+    limiter = _limiter()
+    breaker = _open_circuit(limiter, "p")
+    with pytest.raises(_Throttled):
+        asyncio.run(limiter.call("p", _responses(_Throttled(400))))
+    assert not breaker.probing
+    assert limiter.available("p")
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from core.dictionary import DictionaryManager
+from core.rewrite import RewriteEngine
+from core.snippets import SnippetManager
+
+@pytest.fixture
+def make_engine(config_manager):
+    def make(dictionary, snippets):
+        manager = config_manager(dictionary=dictionary, snippets=snippets)
+        return RewriteEngine(DictionaryManager(manager), SnippetManager(manager))
+    return make
+
+@pytest.mark.parametrize("dictionary, snippets, text, expected", [
+    ({"github": "GitHub"}, {"my github": "https://github.com/me"}, "here is my github link", "here is https://github.com/me link"),
+    ({"sig": "signature"}, {"signature": "Best regards"}, "add sig", "add Best regards"),
+    ({"teh": "the"}, {"the end": "FIN"}, "teh end", "FIN"),
+    ({"super app": "SuperApp"}, {"brb": "be right back"}, "super app brb", "SuperApp be right back"),
+])
+def test_snippets_see_dictionary_output(make_engine, dictionary, snippets, text, expected):
+    assert make_engine(dictionary, snippets).apply(text) == expected
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_stream_matches_apply(make_engine, chunk_size):
+    engine = make_engine({"github": "GitHub", "teh": "the"}, {"my github": "[gh]", "the end": "FIN"})
+    text = "so here is my github and teh end of it, my github again"
+    rewriter = engine.stream()
+    out = "".join(rewriter.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size))
+    assert out + rewriter.flush() == engine.apply(text)
+
+def test_single_scan_matches_dictionary_then_snippets(config_manager):
+    rng = random.Random(3)
+    words = ["a", "ab", "b", "ba", "c", "a b", "b c"]
+    for _ in range(500):
+        dictionary = {rng.choice(words): rng.choice(words + ["X", "Y Z"]) for _ in range(rng.randint(0, 4))}
+        snippets = {rng.choice(words + ["x", "y z"]): f"<{i}>" for i in range(rng.randint(0, 4))}
+        manager = config_manager(dictionary=dictionary, snippets=snippets)
+        dictionary_manager, snippet_manager = DictionaryManager(manager), SnippetManager(manager)
+        engine = RewriteEngine(dictionary_manager, snippet_manager)
+        text = " ".join(rng.choices(words + ["x", "y", "z"], k=rng.randint(0, 8)))
+        assert engine.apply(text) == snippet_manager.process(dictionary_manager.apply(text))
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("Xlib")
+
+from Xlib import X, XK
+from core import x11
+
+SHIFT = 8
+LETTERS = {9 + i: (ord(c), ord(c.upper())) for i, c in enumerate("abcdefghijklmnopqrstuvwxyz ")}
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class SlowClientDisplay:
+    """
+    A display whose focused client handles one key every `per_key` seconds and
+    looks the keycode up in the mapping in force at that moment, like a real
+    client behind a MappingNotify.
+    """
+    def __init__(self, clock, spare, per_key):
+        self.clock = clock
+        self.per_key = per_key
+        self.mapping = {SHIFT: (XK.XK_Shift_L, 0), **LETTERS}
+        last = max(LETTERS) + spare
+        self.mapping.update({keycode: (0, 0) for keycode in range(max(LETTERS) + 1, last + 1)})
+        self.display = SimpleNamespace(info=SimpleNamespace(min_keycode=SHIFT, max_keycode=last))
+        self.changes = [] # (time, keycode, keysyms)
+        self.presses = [] # (time handled, keycode, shifted)
+        self.busy_until = 0.0
+        self.shifted = False
+
+    def get_keyboard_mapping(self, first, count):
+        return [list(self.mapping[keycode]) for keycode in range(first, first + count)]
+
+    def change_keyboard_mapping(self, keycode, keysyms):
+        self.changes.append((self.clock.now, keycode, keysyms[0]))
+
+    def xtest_fake_input(self, kind, keycode):
+        if keycode == SHIFT:
+            self.shifted = kind == X.KeyPress
+        elif kind == X.KeyPress:
+            self.busy_until = max(self.busy_until, self.clock.now) + self.per_key
+            self.presses.append((self.busy_until, keycode, self.shifted))
+
+    def sync(self):
+        pass
+
+    def typed(self):
+        text = []
+        for when, keycode, shifted in self.presses:
+            keysyms = self.mapping[keycode]
+            for changed, bound, new in self.changes:
+                if bound == keycode and changed <= when:
+                    keysyms = new
+            keysym = keysyms[1 if shifted else 0]
+            text.append(chr(keysym - 0x01000000 if keysym > 0x01000000 else keysym))
+        return "".join(text)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(x11, "time", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+def test_types_more_unmapped_characters_than_spare_keycodes(clock):
+    d = SlowClientDisplay(clock, spare=16, per_key=0.0015)
+    text = "привет мир, Съешь же ещё этих мягких французских булок " * 3
+    text = text.replace(",", "")
+    x11.XTestTyper()._type(d, text)
+    assert d.typed() == text
+    # Every temporary binding is reverted
+    assert {keycode: keysyms for _, keycode, keysyms in d.changes if keycode > max(LETTERS)} == \
+        {keycode: (X.NoSymbol, X.NoSymbol) for keycode in range(max(LETTERS) + 1, max(LETTERS) + 17)}
+
+def test_mapped_text_uses_large_batches_and_no_remap(clock):
+    d = SlowClientDisplay(clock, spare=4, per_key=0.0015)
+    x11.XTestTyper()._type(d, "Hello World")
+    assert d.typed() == "Hello World"
+    assert d.changes == []
+    assert clock.now == 0.0